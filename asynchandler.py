@@ -0,0 +1,226 @@
+"""
+#!/usr/bin/env python3
+asyncio interface to the query and data handlers
+progression_tracker_OOP_V2/asynchandler.py
+"""
+import asyncio
+import weakref
+import threading
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from queries import QueryData
+from handler import DataHandler
+
+
+class AsyncQueryData:
+    """
+    Awaitable wrapper of QueryData.
+    sqlite work runs on one dedicated thread owning the sqlite connection,
+    mariadb work runs on a thread pool the size of the connection pool.
+    A semaphore bounds the operations in flight on each event loop.
+    """
+
+    # operations allowed to wait for or run on the executors at once, per event loop
+    max_pending = 64
+
+    __executors = {}
+    __executors_lock = threading.Lock()
+    __semaphores = weakref.WeakKeyDictionary()
+
+    def __init__(self, db_con: QueryData, executor: ThreadPoolExecutor):
+        self.__db_con = db_con
+        self.__executor = executor
+        self.__lock = asyncio.Lock()
+
+    @property
+    def backend(self) -> str:
+        return self.__db_con.backend
+
+    @classmethod
+    def executor(cls, backend: str) -> ThreadPoolExecutor:
+        """
+        returns the process-wide executor of a backend, creating it on first use
+        :param backend: sqlite or mariadb
+        :return: thread pool executor
+        """
+        with cls.__executors_lock:
+            if backend not in cls.__executors:
+                if backend == "mariadb":
+                    cls.__executors[backend] = ThreadPoolExecutor(max_workers=QueryData.pool_size,
+                                                                  thread_name_prefix="MariaDBWorker")
+                else:
+                    cls.__executors[backend] = ThreadPoolExecutor(max_workers=1, thread_name_prefix="SQLiteWorker")
+            return cls.__executors[backend]
+
+    @classmethod
+    def shutdown(cls) -> None:
+        """waits for and stops every executor of the process"""
+        with cls.__executors_lock:
+            for executor in cls.__executors.values():
+                executor.shutdown(wait=True)
+            cls.__executors.clear()
+
+    @classmethod
+    def semaphore(cls) -> asyncio.Semaphore:
+        """returns the semaphore bounding the operations in flight on the running event loop"""
+        loop = asyncio.get_running_loop()
+        if loop not in cls.__semaphores:
+            cls.__semaphores[loop] = asyncio.Semaphore(cls.max_pending)
+        return cls.__semaphores[loop]
+
+    @classmethod
+    async def run_in(cls, executor: ThreadPoolExecutor, function, *args, **kwargs) -> any:
+        """
+        runs a blocking function on an executor once a slot is free
+        :param executor: executor to run the function on
+        :param function: blocking callable
+        :return: result of the function
+        """
+        async with cls.semaphore():
+            return await asyncio.get_running_loop().run_in_executor(executor,
+                                                                    functools.partial(function, *args, **kwargs))
+
+    @classmethod
+    async def resolve_backend(cls, choice: str = "local") -> str:
+        """
+        finds the backend a choice resolves to, foreign choices fall back to sqlite when mariadb is unavailable
+        :param choice: local or foreign
+        :return: sqlite or mariadb
+        """
+        if choice == "local":
+            return "sqlite"
+
+        def probe() -> str:
+            with QueryData(choice=choice) as db_con:
+                return db_con.backend
+
+        return await cls.run_in(cls.executor("mariadb"), probe)
+
+    @classmethod
+    async def connect(cls, choice: str = "local", **kwargs) -> "AsyncQueryData":
+        """
+        opens a QueryData on the executor of its backend
+        :param choice: local or foreign
+        :param kwargs: QueryData arguments
+        :return: AsyncQueryData
+        """
+        backend = await cls.resolve_backend(choice)
+        db_con = await cls.run_in(cls.executor(backend), QueryData, choice=choice, **kwargs)
+
+        if db_con.backend != backend:
+            # mariadb went away after the probe, the sqlite connection belongs to the sqlite thread
+            await cls.run_in(cls.executor(backend), db_con.close)
+            backend = db_con.backend
+            db_con = await cls.run_in(cls.executor(backend), QueryData, choice=choice, **kwargs)
+
+        return cls(db_con, cls.executor(backend))
+
+    async def run(self, function, *args, **kwargs) -> any:
+        """
+        runs a blocking function using this connection on its executor, one at a time
+        :param function: blocking callable
+        :return: result of the function
+        """
+        async with self.__lock:
+            return await AsyncQueryData.run_in(self.__executor, function, *args, **kwargs)
+
+    async def execute(self, func: any = None, output: bool = False, params: tuple = None, commit: bool = True) -> list:
+        """awaitable QueryData.execute"""
+        return await self.run(self.__db_con.execute, func=func, output=output, params=params, commit=commit)
+
+    async def execute_many(self, func: str = None, data: list = None, commit: bool = True) -> int:
+        """awaitable QueryData.execute_many"""
+        return await self.run(self.__db_con.execute_many, func=func, data=data, commit=commit)
+
+    async def commit(self) -> None:
+        """commits the current transaction"""
+        await self.run(self.__db_con.commit)
+
+    async def rollback(self) -> None:
+        """rolls back the current transaction"""
+        await self.run(self.__db_con.rollback)
+
+    async def close(self) -> None:
+        """returns the connection to the pool"""
+        await self.run(self.__db_con.close)
+
+    async def __aenter__(self) -> "AsyncQueryData":
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback) -> None:
+        await self.close()
+
+
+class AsyncDataHandler:
+    """
+    Awaitable wrapper of DataHandler, every call runs on the executor of the handler's database backend.
+    """
+
+    def __init__(self, handler: DataHandler, executor: ThreadPoolExecutor):
+        self.__handler = handler
+        self.__executor = executor
+        self.__lock = asyncio.Lock()
+
+    @property
+    def validity(self) -> bool:
+        return self.__handler.validity
+
+    @property
+    def authentication(self) -> bool:
+        return self.__handler.authentication
+
+    @classmethod
+    async def create(cls, name: str, pass_marks: int = None, defer_marks: int = None, fail_marks: int = None,
+                     password: str = "root", database: str = "local") -> "AsyncDataHandler":
+        """
+        creates a DataHandler on the executor of its database backend
+        :param name: username
+        :param pass_marks: pass marks
+        :param defer_marks: defer marks
+        :param fail_marks: fail marks
+        :param password: user password
+        :param database: local or foreign
+        :return: AsyncDataHandler
+        """
+        executor = AsyncQueryData.executor(await AsyncQueryData.resolve_backend(database))
+        handler = await AsyncQueryData.run_in(executor, DataHandler, name=name, pass_marks=pass_marks,
+                                              defer_marks=defer_marks, fail_marks=fail_marks, password=password,
+                                              database=database)
+        return cls(handler, executor)
+
+    async def run(self, function, *args, **kwargs) -> any:
+        """
+        runs a blocking handler method on the handler's executor, one at a time
+        :param function: blocking callable
+        :return: result of the function
+        """
+        async with self.__lock:
+            return await AsyncQueryData.run_in(self.__executor, function, *args, **kwargs)
+
+    async def data_entry(self) -> list:
+        """awaitable DataHandler.data_entry"""
+        return await self.run(self.__handler.data_entry)
+
+    async def get_output(self) -> str:
+        """awaitable DataHandler.get_output"""
+        return await self.run(self.__handler.get_output)
+
+    async def get_progress(self, use_snapshot: bool = False, last: int = None, limit: int = None, offset: int = 0,
+                           since: float = None) -> str:
+        """awaitable DataHandler.get_progress"""
+        return await self.run(self.__handler.get_progress, use_snapshot=use_snapshot, last=last, limit=limit,
+                              offset=offset, since=since)
+
+    async def get_user_data(self) -> str:
+        """awaitable DataHandler.get_user_data"""
+        return await self.run(self.__handler.get_user_data)
+
+    async def close(self) -> None:
+        """returns the handler's database connection to the pool"""
+        await self.run(self.__handler.close)
+
+    async def __aenter__(self) -> "AsyncDataHandler":
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback) -> None:
+        await self.close()
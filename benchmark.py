@@ -0,0 +1,926 @@
+"""
+#!/usr/bin/env python3
+performance benchmarks
+progression_tracker_OOP_V2/benchmark.py
+"""
+import os
+import sys
+import time
+import uuid
+import random
+import asyncio
+import sqlite3
+import tempfile
+import tracemalloc
+import subprocess
+import click
+from contextlib import contextmanager, nullcontext
+from pool import ConnectionPool
+from queries import QueryData
+from keystore import KeyStore
+from daemon import DaemonClient
+
+
+def populate_legacy_database(path: str, users: int) -> list:
+    """
+    creates an unmigrated (version 0) sqlite database with one progression entry per user
+    :param path: path of the sqlite database file
+    :param users: number of users to create
+    :return: list of (name, uid) pairs
+    """
+    connect = sqlite3.connect(path)
+    cursor = connect.cursor()
+    cursor.execute(QueryData.default_user_setup())
+    cursor.execute(QueryData.default_user_progression_setup())
+    cursor.execute(QueryData.default_user_statistics_setup())
+
+    user_list = [(f"user_{index}", str(uuid.uuid4())) for index in range(users)]
+    cursor.executemany(QueryData.create_rows_query(table_name='user_data', column_count=3),
+                       ((uid, name, "root") for name, uid in user_list))
+    cursor.executemany(QueryData.create_rows_query(table_name='user_progression', column_count=5),
+                       ((uid, '120', '0', '0', 'Progress') for _, uid in user_list))
+    connect.commit()
+    connect.close()
+
+    return user_list
+
+
+def time_lookups(cursor, samples: list) -> tuple:
+    """
+    measures the mean latency of the name -> uid and uid -> progression lookups
+    :param cursor: database cursor
+    :param samples: list of (name, uid) pairs to look up
+    :return: mean latencies in microseconds
+    """
+    before = time.perf_counter()
+    for name, _ in samples:
+        cursor.execute(QueryData.read_user_specific_field(column='uid', table_name='user_data',
+                                                          filter_expression="name=?"), (name,))
+        cursor.fetchall()
+    name_latency = (time.perf_counter() - before) / len(samples) * 1e6
+
+    before = time.perf_counter()
+    for _, uid in samples:
+        cursor.execute(QueryData.read_user_specific_field(column='pass_marks, defer_marks, fail_marks, outcome',
+                                                          table_name='user_progression',
+                                                          filter_expression="uid=?"), (uid,))
+        cursor.fetchall()
+    uid_latency = (time.perf_counter() - before) / len(samples) * 1e6
+
+    return name_latency, uid_latency
+
+
+def measure_progression(path: str, compact: bool) -> tuple:
+    """
+    measures the on-disk size of the user_progression table and the cost of fetching all of its entries
+    :param path: path of the sqlite database file
+    :param compact: hold the fetched entries in ProgressRecords instead of a list of tuples
+    :return: (table bytes, rows per second, bytes held by the fetched entries) tuple
+    """
+    from records import ProgressRecords
+
+    connect = sqlite3.connect(path)
+    connect.execute("VACUUM;")
+    try:
+        size = connect.execute("SELECT SUM(pgsize) FROM dbstat WHERE name = 'user_progression';").fetchone()[0]
+    except sqlite3.OperationalError:
+        # sqlite built without the dbstat table, the file also holds the other tables and indexes
+        size = os.path.getsize(path)
+    query = QueryData.read_user_data_fields(table_name='user_progression',
+                                            columns='pass_marks, defer_marks, fail_marks, outcome')
+
+    before = time.perf_counter()
+    rows = connect.execute(query).fetchall()
+    rate = len(rows) / (time.perf_counter() - before)
+
+    tracemalloc.start()
+    rows = connect.execute(query).fetchall()
+    held = ProgressRecords(rows) if compact else rows
+    if compact:
+        del rows
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del held
+
+    connect.close()
+    return size, rate, memory
+
+
+def write_bins(directory: str, size: int, record_size: int = 64) -> tuple:
+    """
+    writes a single blob (version 1) and a chunked (version 2) data bin of about size bytes of plaintext
+    :param directory: directory of the bins
+    :param size: plaintext bytes
+    :param record_size: plaintext bytes per record of the chunked bin
+    :return: (blob bin path, chunked bin path, key) tuple
+    """
+    from cryptohandler import CryptoHandler
+
+    writer = CryptoHandler(availability=False, password="root", logger_name="BenchmarkCryptoLogger")
+    writer.assign_salt()
+    writer.generate_key()
+
+    blob_path = os.path.join(directory, f"blob_{size}.bin")
+    writer.write_to_bin(blob_path, writer.encrypt(b"x" * size))
+
+    records_path = os.path.join(directory, f"records_{size}.bin")
+    record = "x" * (record_size - 1) + "\n"
+    writer.write_records(records_path, (record for _ in range(max(size // record_size, 1))))
+
+    return blob_path, records_path, writer.key
+
+
+def resident_memory() -> tuple:
+    """
+    reads the resident set size of this process from /proc (Linux)
+    :return: (current, peak) resident bytes
+    """
+    with open("/proc/self/status") as file:
+        status = dict(line.split(":", 1) for line in file)
+    return int(status["VmRSS"].split()[0]) * 1024, int(status["VmHWM"].split()[0]) * 1024
+
+
+def read_bin_rss(path: str, key: bytes, streamed: bool) -> int:
+    """
+    decrypts and decodes a data bin, run in a fresh process so that its peak RSS only reflects this read
+    :param path: path of the data bin
+    :param key: derived key of the bin
+    :param streamed: decrypt from a memory map chunk by chunk instead of the whole bin at once
+    :return: growth of the peak resident set size in bytes
+    """
+    import codecs
+    from cryptohandler import CryptoHandler
+
+    reader = CryptoHandler(availability=True, key=key, logger_name="BenchmarkCryptoLogger")
+    version = reader.read_bin_version(path)
+
+    # resets the peak to the current RSS, ru_maxrss would also keep the peak of the parent process
+    with open("/proc/self/clear_refs", "w") as file:
+        file.write("5")
+    before, _ = resident_memory()
+
+    if streamed:
+        decoder = codecs.getincrementaldecoder("utf-8")()
+        blocks = reader.iter_records(path) if version == 2 else reader.iter_blob(path)
+        characters = sum(len(decoder.decode(block)) for block in blocks)
+    elif version == 2:
+        characters = len(b"".join(reader.read_records(path)).decode())
+    else:
+        characters = len(reader.decrypt(reader.read_from_bin(path)).decode())
+
+    if characters == 0:
+        raise Exception(f"{path} decrypted to nothing")
+    return resident_memory()[1] - before
+
+
+def startup_import_time(module: str = "main") -> tuple:
+    """
+    imports a module in a fresh interpreter with python -X importtime
+    :param module: module to import
+    :return: total import time in milliseconds and dictionary of imported module -> cumulative microseconds
+    """
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+    if result.returncode != 0:
+        raise Exception(f"import {module} failed -> {result.stderr.splitlines()[-1:]}")
+
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+
+        _, cumulative, name = line[len("import time:"):].split("|")
+        modules[name.strip()] = int(cumulative)
+
+    return modules[module] / 1000, modules
+
+
+def check_startup(target_ms: float = 150.0, module: str = "main", lazy_modules: tuple = ("mariadb", "Crypto")) -> list:
+    """
+    checks the startup cost of a module against a target
+    :param target_ms: maximum import time in milliseconds
+    :param module: module to import
+    :param lazy_modules: top level packages that must not be imported at startup
+    :return: list of failures, empty if the startup is within the target
+    """
+    total, modules = startup_import_time(module)
+    failures = [f"{name} imported at startup" for name in modules if name.split(".")[0] in lazy_modules]
+
+    if total > target_ms:
+        failures.append(f"import {module} took {total:.1f} ms, target is {target_ms:.1f} ms")
+
+    return failures
+
+
+def percentiles(samples: list, points: tuple = (50, 95, 99)) -> dict:
+    """
+    nearest-rank percentiles of a list of samples
+    :param samples: list of measurements
+    :param points: percentiles to compute
+    :return: dictionary of percentile -> sample
+    """
+    ordered = sorted(samples)
+    return {point: ordered[min(len(ordered) - 1, max(0, -(-point * len(ordered) // 100) - 1))] for point in points}
+
+
+def start_daemon(directory: str, timeout: float = 10.0) -> tuple:
+    """
+    starts a daemon serving a fresh local database in a working directory
+    :param directory: working directory of the daemon
+    :param timeout: seconds to wait for the socket
+    :return: (daemon process, socket path) pair
+    """
+    socket_path = os.path.join(directory, "progression.sock")
+    main_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")
+    process = subprocess.Popen([sys.executable, main_path, "serve", "--socket", socket_path], cwd=directory,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    deadline = time.monotonic() + timeout
+    while not DaemonClient(socket_path).running():
+        if process.poll() is not None or time.monotonic() > deadline:
+            process.kill()
+            raise Exception("daemon did not start")
+        time.sleep(0.05)
+
+    return process, socket_path
+
+
+def time_requests(client: DaemonClient, op: str, requests: int, **args) -> list:
+    """
+    measures the round trip latency of repeated daemon requests
+    :param client: connected daemon client
+    :param op: operation name
+    :param requests: number of requests
+    :param args: operation arguments
+    :return: list of latencies in microseconds
+    """
+    latencies = []
+    for _ in range(requests):
+        before = time.perf_counter()
+        client.request(op, **args)
+        latencies.append((time.perf_counter() - before) * 1e6)
+    return latencies
+
+
+@contextmanager
+def workspace():
+    """
+    runs the enclosed benchmark in a temporary working directory holding its own local database and data bins
+    :return: path of the working directory
+    """
+    from handler import DataHandler
+
+    cwd = os.getcwd()
+    paths = DataHandler.salt_path, DataHandler.data_path
+
+    with tempfile.TemporaryDirectory() as directory:
+        # the local database is opened relative to the working directory
+        os.chdir(directory)
+        DataHandler.salt_path = os.path.join(directory, "user_keys/")
+        DataHandler.data_path = os.path.join(directory, "user_data/")
+        os.makedirs(DataHandler.salt_path)
+        os.makedirs(DataHandler.data_path)
+
+        try:
+            yield directory
+        finally:
+            ConnectionPool.close_all()
+            KeyStore.close_all()
+            DataHandler.salt_path, DataHandler.data_path = paths
+            os.chdir(cwd)
+
+
+@contextmanager
+def benchmark_schema():
+    """
+    points the foreign database at a freshly created <database>_benchmark schema on the same mariadb server for the
+    enclosed benchmark and drops it afterwards, so that its entries and summary counters never reach the configured
+    database
+    :return: name of the benchmark schema
+    """
+    import mariadb
+
+    settings = QueryData.alt_query
+    schema = f"{settings['database']}_benchmark"
+    connection = mariadb.connect(host=settings["host"], user=settings["user"], password=settings["password"])
+
+    try:
+        cursor = connection.cursor()
+        cursor.execute(f"DROP DATABASE IF EXISTS `{schema}`;")
+        cursor.execute(f"CREATE DATABASE `{schema}`;")
+        QueryData.alt_query = {**settings, "database": schema}
+
+        try:
+            yield schema
+        finally:
+            QueryData.alt_query = settings
+            ConnectionPool.close_all()
+            cursor.execute(f"DROP DATABASE IF EXISTS `{schema}`;")
+    finally:
+        connection.close()
+
+
+def time_inserts(profile: str, operations: int) -> float:
+    """
+    measures the add_marks throughput of a sqlite profile on a fresh database
+    :param profile: name of a QueryData.sqlite_profiles entry
+    :param operations: add_marks operations to time
+    :return: operations per second
+    """
+    from handler import DataHandler
+
+    default_profile = QueryData.sqlite_profile
+    QueryData.sqlite_profile = profile
+
+    try:
+        with workspace():
+            with DataHandler(name="benchmark", password="root"):
+                pass
+
+            before = time.perf_counter()
+            for _ in range(operations):
+                with DataHandler(name="benchmark", pass_marks=100, defer_marks=20, fail_marks=0,
+                                 password="root") as user:
+                    user.data_entry()
+            return operations / (time.perf_counter() - before)
+
+    finally:
+        QueryData.sqlite_profile = default_profile
+
+
+async def time_add_marks(names: list, concurrent: bool, database: str = "local") -> float:
+    """
+    measures the wall time of one add_marks operation per user through AsyncDataHandler
+    :param names: list of existing usernames
+    :param concurrent: run the operations concurrently instead of one after another
+    :param database: local or foreign
+    :return: elapsed seconds
+    """
+    from asynchandler import AsyncDataHandler
+
+    async def add_marks(name: str) -> None:
+        async with await AsyncDataHandler.create(name=name, pass_marks=100, defer_marks=20, fail_marks=0,
+                                                 password="root", database=database) as user:
+            await user.data_entry()
+
+    before = time.perf_counter()
+    if concurrent:
+        await asyncio.gather(*(add_marks(name) for name in names))
+    else:
+        for name in names:
+            await add_marks(name)
+    return time.perf_counter() - before
+
+
+def summarize(samples: list) -> dict:
+    """
+    summarizes the latencies of a benchmark
+    :param samples: list of latencies in microseconds
+    :return: dictionary of run count, minimum, mean and percentile latencies
+    """
+    points = percentiles(samples)
+    return {
+        "runs": len(samples),
+        "min_us": round(min(samples), 3),
+        "mean_us": round(sum(samples) / len(samples), 3),
+        "p50_us": round(points[50], 3),
+        "p95_us": round(points[95], 3),
+        "max_us": round(max(samples), 3)
+    }
+
+
+def time_calls(function, repeats: int) -> list:
+    """
+    measures the latency of repeated calls
+    :param function: callable without arguments
+    :param repeats: number of calls
+    :return: list of latencies in microseconds
+    """
+    samples = []
+    for _ in range(repeats):
+        before = time.perf_counter_ns()
+        function()
+        samples.append((time.perf_counter_ns() - before) / 1e3)
+    return samples
+
+
+def populate_progression(db_con: QueryData, uid: str, entries: int, seed: int = 0) -> None:
+    """
+    inserts random valid progression entries of a user
+    :param db_con: QueryData connection
+    :param uid: user id owning the entries
+    :param entries: number of entries
+    :param seed: random seed, the same seed inserts the same entries
+    """
+    from outcomes import OutcomeTable
+
+    triples = OutcomeTable.valid_triples()
+    generator = random.Random(seed)
+    start = time.time() - entries
+    db_con.execute_many(func=QueryData.create_rows_query(table_name='user_progression', column_count=6),
+                        data=[(uid, *generator.choice(triples), start + index) for index in range(entries)])
+
+
+def suite_backend(database: str, sizes: list, repeats: int) -> list:
+    """
+    runs every DataHandler benchmark at each table size against one backend, which it writes to:
+    run it in a workspace and, for the foreign database, a benchmark_schema
+    :param database: local or foreign
+    :param sizes: progression entries of the benchmarked user
+    :param repeats: calls timed per benchmark
+    :return: list of result dictionaries
+    """
+    from handler import DataHandler
+
+    results = []
+    for size in sizes:
+        name = f"benchmark_{size}_{uuid.uuid4().hex[:8]}"
+        with DataHandler(name=name, password="root", database=database) as user:
+            uid = user.read_user_record()[0]
+
+        with QueryData(choice=database) as db_con:
+            backend = db_con.backend
+            populate_progression(db_con, uid, size)
+
+            def construct() -> None:
+                DataHandler(name=name, password="root", database=database).close()
+
+            # a handler reads the user record once, the lookup it pays is QueryData.read_user
+            def check_user_availability() -> None:
+                db_con.read_user(name)
+
+            with DataHandler(name=name, pass_marks=100, defer_marks=20, fail_marks=0, password="root",
+                             database=database) as user:
+                benchmarks = [
+                    ("DataHandler", construct),
+                    ("check_user_availability", check_user_availability),
+                    ("update_progression_stats", lambda: user.update_progression_stats(progress=1)),
+                    ("generate_str", user.generate_str),
+                    ("dump_to_bin", user.dump_to_bin),
+                    ("load_from_bin", user.load_from_bin),
+                    # entries grow the table, so they are timed last
+                    ("data_entry", user.data_entry)
+                ]
+                for benchmark, function in benchmarks:
+                    results.append({"name": benchmark, "backend": backend, "size": size,
+                                    **summarize(time_calls(function, repeats))})
+
+    return results
+
+
+def suite_kdf(repeats: int) -> list:
+    """
+    measures the PBKDF2 key derivation of every supported hash, bypassing the key cache
+    :param repeats: derivations timed per hash
+    :return: list of result dictionaries
+    """
+    from cryptohandler import CryptoHandler
+
+    results = []
+    salt = os.urandom(32)
+    for hash_name in CryptoHandler.kdf_hashes.values():
+        def derive() -> None:
+            user = CryptoHandler(availability=True, password="root", hash_name=hash_name)
+            user.assign_salt(salt)
+            user.generate_key()
+
+        results.append({"name": f"PBKDF2-{hash_name}", "backend": None, "size": CryptoHandler.kdf_iterations,
+                        **summarize(time_calls(derive, repeats))})
+
+    return results
+
+
+def compare_suites(results: list, baseline: list, tolerance: float) -> list:
+    """
+    compares the median latencies of two suite runs
+    :param results: result dictionaries of the current run
+    :param baseline: result dictionaries of a previous run
+    :param tolerance: allowed relative slowdown
+    :return: list of regression messages
+    """
+    previous = {(result["name"], result["backend"], result["size"]): result for result in baseline}
+    regressions = []
+
+    for result in results:
+        before = previous.get((result["name"], result["backend"], result["size"]))
+        if before is None or before["p50_us"] <= 0:
+            continue
+
+        ratio = result["p50_us"] / before["p50_us"]
+        if ratio > 1 + tolerance:
+            regressions.append(f"{result['name']} [{result['backend']}, {result['size']}] p50 "
+                               f"{before['p50_us']:.1f} us -> {result['p50_us']:.1f} us ({ratio:.2f}x)")
+
+    return regressions
+
+
+@click.group()
+def benchmark_method():
+    pass
+
+
+@click.command()
+@click.option("--sizes", "-s", help="comma separated user counts", type=str,
+              default="10000,100000,1000000", show_default=True)
+@click.option("--lookups", "-l", help="lookups timed per size", type=int, default=200, show_default=True)
+def lookup(sizes: str, lookups: int) -> None:
+    """
+    compares sqlite lookup latency before and after the schema migrations
+    :param sizes: comma separated user counts
+    :param lookups: lookups timed per size
+    """
+    print(f"\n{'users':>10} | {'name lookup (us)':>25} | {'uid lookup (us)':>25}")
+    print(f"{'':>10} | {'before':>12} {'after':>12} | {'before':>12} {'after':>12}")
+
+    for users in [int(size) for size in sizes.split(",")]:
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "benchmark.db")
+            user_list = populate_legacy_database(path, users)
+            samples = random.sample(user_list, min(lookups, users))
+
+            connect = sqlite3.connect(path)
+            before = time_lookups(connect.cursor(), samples)
+            connect.close()
+
+            with QueryData(local_database=path) as db_con:
+                after = time_lookups(db_con.cursor, samples)
+            ConnectionPool.close_all()
+
+        print(f"{users:>10} | {before[0]:>12.1f} {after[0]:>12.1f} | {before[1]:>12.1f} {after[1]:>12.1f}")
+
+
+@click.command()
+@click.option("--target", "-t", help="maximum import time in milliseconds", type=float, default=150.0,
+              show_default=True)
+@click.option("--runs", "-r", help="fresh interpreters to measure", type=int, default=5, show_default=True)
+@click.option("--top", help="slowest imports to list", type=int, default=10, show_default=True)
+def startup(target: float, runs: int, top: int) -> None:
+    """
+    measures the import cost of the CLI with python -X importtime
+    :param target: maximum import time in milliseconds
+    :param runs: fresh interpreters to measure
+    :param top: slowest imports to list
+    """
+    timings = [startup_import_time("main") for _ in range(runs)]
+    totals = sorted(total for total, _ in timings)
+    modules = timings[-1][1]
+
+    print(f"\nimport main: median {totals[len(totals) // 2]:.1f} ms, min {totals[0]:.1f} ms over {runs} runs\n")
+    for name, cumulative in sorted(modules.items(), key=lambda item: item[1], reverse=True)[:top]:
+        print(f"{cumulative / 1000:>10.1f} ms  {name}")
+
+    failures = check_startup(target_ms=target)
+    for failure in failures:
+        print(failure)
+    if len(failures) > 0:
+        sys.exit(1)
+    print(f"\nStartup within {target:.1f} ms target !\n")
+
+
+@click.command()
+@click.option("--requests", "-r", help="requests timed per operation", type=int, default=2000, show_default=True)
+@click.option("--target", "-t", help="maximum p50 latency in microseconds", type=float, default=1000.0,
+              show_default=True)
+def daemon(requests: int, target: float) -> None:
+    """
+    load tests a daemon serving a fresh sqlite database over one persistent connection,
+    progress is read for a user with a fixed history of 20 entries
+    :param requests: requests timed per operation
+    :param target: maximum p50 latency in microseconds
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        process, socket_path = start_daemon(directory)
+
+        try:
+            with DaemonClient(socket_path) as client:
+                client.request("add_user", name="benchmark", password="root", database="local")
+                client.request("add_user", name="reader", password="root", database="local")
+                for _ in range(20):
+                    client.request("add_marks", name="reader", pass_marks=120, defer_marks=0, fail_marks=0,
+                                   password="root", database="local")
+
+                results = {
+                    "add_marks": time_requests(client, "add_marks", requests, name="benchmark", pass_marks=100,
+                                               defer_marks=20, fail_marks=0, password="root", database="local"),
+                    "get_progress": time_requests(client, "get_progress", requests, name="reader", password="root",
+                                                  database="local"),
+                    "get_stats": time_requests(client, "get_stats", requests, database="local")
+                }
+        finally:
+            process.terminate()
+            process.wait()
+
+    print(f"\n{'operation':>14} | {'p50 (us)':>10} {'p95 (us)':>10} {'p99 (us)':>10} | {'req/sec':>10}")
+    failures = []
+    for op, latencies in results.items():
+        points = percentiles(latencies)
+        print(f"{op:>14} | {points[50]:>10.1f} {points[95]:>10.1f} {points[99]:>10.1f} | "
+              f"{len(latencies) / (sum(latencies) / 1e6):>10.1f}")
+        if points[50] > target:
+            failures.append(f"{op} p50 latency {points[50]:.1f} us, target is {target:.1f} us")
+
+    for failure in failures:
+        print(failure)
+    if len(failures) > 0:
+        sys.exit(1)
+    print(f"\nRequest latency within {target:.1f} us target !\n")
+
+
+@click.command()
+@click.option("--operations", "-n", help="add_marks operations per run", type=int, default=200, show_default=True)
+@click.argument("database", type=click.Choice(["local", "foreign"]), default="local", required=False)
+def concurrent(operations: int, database: str) -> None:
+    """
+    compares N concurrent add_marks operations against the same operations run one after another
+    :param operations: add_marks operations per run
+    :param database: local or foreign
+    """
+    from asynchandler import AsyncDataHandler, AsyncQueryData
+
+    async def add_users(names: list) -> None:
+        for name in names:
+            async with await AsyncDataHandler.create(name=name, password="root", database=database):
+                pass
+
+    with workspace(), (benchmark_schema() if database == "foreign" else nullcontext()):
+        try:
+            names = [f"user_{index}_{uuid.uuid4().hex[:8]}" for index in range(operations)]
+            asyncio.run(add_users(names))
+            serial = asyncio.run(time_add_marks(names, concurrent=False, database=database))
+            parallel = asyncio.run(time_add_marks(names, concurrent=True, database=database))
+        finally:
+            AsyncQueryData.shutdown()
+
+    print(f"\n{'mode':>12} | {'seconds':>10} | {'ops/sec':>10}")
+    print(f"{'serial':>12} | {serial:>10.3f} | {operations / serial:>10.1f}")
+    print(f"{'concurrent':>12} | {parallel:>10.3f} | {operations / parallel:>10.1f}")
+    print(f"\n{operations} concurrent add_marks took {parallel / serial:.2f}x the serial time.\n")
+
+
+@click.command()
+@click.option("--operations", "-n", help="add_marks operations per profile", type=int, default=500, show_default=True)
+def profiles(operations: int) -> None:
+    """
+    compares the add_marks throughput of the sqlite profiles
+    :param operations: add_marks operations per profile
+    """
+    print(f"\n{'profile':>12} | {'inserts/sec':>12}")
+    for profile in QueryData.sqlite_profiles:
+        print(f"{profile:>12} | {time_inserts(profile, operations):>12.1f}")
+    print()
+
+
+@click.command()
+@click.option("--entries", "-e", help="progression entries", type=int, default=200000, show_default=True)
+def encoding(entries: int) -> None:
+    """
+    compares the legacy text encoding of marks and outcomes against the compact integer encoding
+    :param entries: progression entries
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "benchmark.db")
+        populate_legacy_database(path, entries)
+        legacy = measure_progression(path, compact=False)
+
+        QueryData(local_database=path).close()
+        ConnectionPool.close_all()
+        compact = measure_progression(path, compact=True)
+
+    print(f"\n{'encoding':>10} | {'table (KiB)':>12} | {'fetch (rows/sec)':>18} | {'in memory (KiB)':>16}")
+    for label, (size, rate, memory) in (("text", legacy), ("compact", compact)):
+        print(f"{label:>10} | {size / 1024:>12.1f} | {rate:>18.1f} | {memory / 1024:>16.1f}")
+    print()
+
+
+@click.command()
+@click.option("--users", "-u", help="active users", type=int, default=300, show_default=True)
+@click.option("--operations", "-n", help="handlers constructed per run", type=int, default=5000, show_default=True)
+def identities(users: int, operations: int) -> None:
+    """
+    compares DataHandler construction for a working set of active users with and without the identity cache
+    :param users: active users
+    :param operations: handlers constructed per run
+    """
+    from handler import DataHandler
+
+    default = QueryData.cache_identities
+    print(f"\n{'identity cache':>15} | {'handlers/sec':>12} | {'hits':>8} | {'misses':>8}")
+
+    try:
+        with workspace():
+            names = [f"user_{index}" for index in range(users)]
+            for name in names:
+                DataHandler(name=name, password="root").close()
+            samples = [random.choice(names) for _ in range(operations)]
+
+            for enabled in (False, True):
+                QueryData.cache_identities = enabled
+                DataHandler.identities.clear()
+                hits, misses = DataHandler.identities.hits, DataHandler.identities.misses
+
+                before = time.perf_counter()
+                for name in samples:
+                    DataHandler(name=name, password="root").close()
+                rate = operations / (time.perf_counter() - before)
+
+                print(f"{'on' if enabled else 'off':>15} | {rate:>12.1f} | {DataHandler.identities.hits - hits:>8} | "
+                      f"{DataHandler.identities.misses - misses:>8}")
+    finally:
+        QueryData.cache_identities = default
+    print()
+
+
+@click.command()
+@click.option("--scheme", "-p", help="password scheme, both when omitted", type=click.Choice(["scrypt", "pbkdf2-sha256"]),
+              default=None)
+@click.option("--costs", "-c", help="comma separated costs (log2 N for scrypt, iterations for pbkdf2-sha256)",
+              type=str, default=None)
+@click.option("--logins", "-n", help="logins per cost", type=int, default=20, show_default=True)
+def logins(scheme: str, costs: str, logins: int) -> None:
+    """
+    measures logins per second of an existing user at each password hash cost, verifying every login (cold)
+    and within the verified session TTL (warm)
+    :param scheme: password scheme
+    :param costs: comma separated costs
+    :param logins: logins per cost
+    """
+    from handler import DataHandler
+    from passwords import PasswordHasher
+
+    default_costs = {"scrypt": "12,14,15", "pbkdf2-sha256": "100000,300000,600000"}
+    default = PasswordHasher.current
+    print(f"\n{'scheme':>14} | {'cost':>7} | {'cold logins/sec':>15} | {'warm logins/sec':>15}")
+
+    try:
+        with workspace():
+            for name in ([scheme] if scheme is not None else list(default_costs)):
+                for cost in (int(cost) for cost in (costs or default_costs[name]).split(",")):
+                    PasswordHasher.configure(name, cost)
+                    user = f"{name}_{cost}"
+                    DataHandler(name=user, password="root").close()
+
+                    rates = []
+                    for warm in (False, True):
+                        before = time.perf_counter()
+                        for _ in range(logins):
+                            if not warm:
+                                DataHandler.sessions.clear()
+                            with DataHandler(name=user, password="root") as handler:
+                                if not handler.authentication:
+                                    raise Exception(f"{user} login failed")
+                        rates.append(logins / (time.perf_counter() - before))
+
+                    print(f"{name:>14} | {cost:>7} | {rates[0]:>15.1f} | {rates[1]:>15.1f}")
+    finally:
+        PasswordHasher.current = default
+    print()
+
+
+@click.command()
+@click.option("--sizes", "-s", help="comma separated user counts", type=str, default="1000,10000,50000",
+              show_default=True)
+@click.option("--lookups", "-l", help="lookups timed per size", type=int, default=200, show_default=True)
+def salts(sizes: str, lookups: int) -> None:
+    """
+    compares salt lookups scanning a directory of salt bin files against the keystore they are imported into
+    :param sizes: comma separated user counts
+    :param lookups: lookups timed per size
+    """
+    print(f"\n{'users':>10} | {'listdir (us)':>14} | {'keystore (us)':>14} | {'import (s)':>10}")
+
+    for users in [int(size) for size in sizes.split(",")]:
+        with tempfile.TemporaryDirectory() as directory:
+            uids = [str(uuid.uuid4()) for _ in range(users)]
+            for uid in uids:
+                with open(os.path.join(directory, f"{uid}.bin"), 'wb') as file:
+                    file.write(os.urandom(32))
+            samples = random.sample(uids, min(lookups, users))
+
+            before = time.perf_counter()
+            for uid in samples:
+                if f"{uid}.bin" not in os.listdir(directory):
+                    raise Exception(f"{uid} salt bin not found")
+            scan = (time.perf_counter() - before) / len(samples) * 1e6
+
+            before = time.perf_counter()
+            store = KeyStore.shared(directory)
+            imported = time.perf_counter() - before
+
+            before = time.perf_counter()
+            for uid in samples:
+                if not store.contains(uid):
+                    raise Exception(f"{uid} salt not imported")
+            indexed = (time.perf_counter() - before) / len(samples) * 1e6
+            KeyStore.close_all()
+
+        print(f"{users:>10} | {scan:>14.1f} | {indexed:>14.1f} | {imported:>10.2f}")
+    print()
+
+
+@click.command()
+@click.option("--sizes", "-s", help="comma separated plaintext sizes in MiB", type=str, default="1,4,8",
+              show_default=True)
+def bins(sizes: str) -> None:
+    """
+    compares the peak RSS of decrypting whole data bins against streaming them from a memory map
+    :param sizes: comma separated plaintext sizes in MiB
+    """
+    from concurrent.futures import ProcessPoolExecutor
+    from multiprocessing import get_context
+
+    print(f"\n{'bin':>8} | {'size (MiB)':>10} | {'whole (MiB)':>12} | {'streamed (MiB)':>15}")
+    with tempfile.TemporaryDirectory() as directory:
+        for size in [int(size) for size in sizes.split(",")]:
+            blob_path, records_path, key = write_bins(directory, size << 20)
+
+            for label, path in (("blob", blob_path), ("records", records_path)):
+                peaks = []
+                for streamed in (False, True):
+                    with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as executor:
+                        peaks.append(executor.submit(read_bin_rss, path, key, streamed).result())
+
+                print(f"{label:>8} | {os.path.getsize(path) / (1 << 20):>10.1f} | {peaks[0] / (1 << 20):>12.1f} | "
+                      f"{peaks[1] / (1 << 20):>15.1f}")
+    print()
+
+
+@click.command()
+@click.option("--sizes", "-s", help="comma separated progression entries of the benchmarked user", type=str,
+              default="0,1000,10000", show_default=True)
+@click.option("--repeats", "-r", help="calls timed per benchmark", type=int, default=20, show_default=True)
+@click.option("--output", "-o", help="JSON results file, printed if omitted", type=click.Path(dir_okay=False))
+@click.option("--baseline", "-b", help="JSON results file of a previous run to compare against",
+              type=click.Path(exists=True, dir_okay=False))
+@click.option("--tolerance", help="allowed relative p50 slowdown against the baseline", type=float, default=0.25,
+              show_default=True)
+def suite(sizes: str, repeats: int, output: str, baseline: str, tolerance: float) -> None:
+    """
+    times every DataHandler hot path at several table sizes on sqlite, and on mariadb when it is reachable
+    :param sizes: comma separated progression entries of the benchmarked user
+    :param repeats: calls timed per benchmark
+    :param output: JSON results file
+    :param baseline: JSON results file of a previous run
+    :param tolerance: allowed relative p50 slowdown
+    """
+    import json
+    import platform
+    from cryptohandler import CryptoHandler
+
+    sizes = [int(size) for size in sizes.split(",")]
+    results = suite_kdf(repeats)
+
+    with workspace():
+        results.extend(suite_backend("local", sizes, repeats))
+
+        with QueryData(choice="foreign") as db_con:
+            foreign = db_con.backend == "mariadb"
+        if foreign:
+            with benchmark_schema():
+                results.extend(suite_backend("foreign", sizes, repeats))
+
+    report = json.dumps({
+        "meta": {
+            "created": time.time(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "sqlite": sqlite3.sqlite_version,
+            "sqlite_profile": QueryData.sqlite_profile,
+            "kdf_iterations": CryptoHandler.kdf_iterations,
+            "mariadb": foreign,
+            "repeats": repeats
+        },
+        "results": results
+    }, indent=2)
+
+    if output is None:
+        print(report)
+    else:
+        with open(output, "w") as file:
+            file.write(report + "\n")
+        print(f"\n{len(results)} results written to {output}")
+
+    if baseline is not None:
+        with open(baseline) as file:
+            regressions = compare_suites(results, json.load(file)["results"], tolerance)
+
+        for regression in regressions:
+            print(regression)
+        if len(regressions) > 0:
+            sys.exit(1)
+        print(f"\nNo p50 regression beyond {tolerance:.0%} !\n")
+
+
+benchmark_method.add_command(lookup)
+benchmark_method.add_command(startup)
+benchmark_method.add_command(daemon)
+benchmark_method.add_command(concurrent)
+benchmark_method.add_command(profiles)
+benchmark_method.add_command(encoding)
+benchmark_method.add_command(suite)
+benchmark_method.add_command(bins)
+benchmark_method.add_command(salts)
+benchmark_method.add_command(identities)
+benchmark_method.add_command(logins)
+
+if __name__ == "__main__":
+    benchmark_method()
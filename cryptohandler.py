@@ -3,13 +3,20 @@
 backend data encryption and decryption handler
 progression_tracker_OOP_V2/cryptohandler.py
 """
-from Crypto.Protocol.KDF import PBKDF2
-from Crypto.Random import get_random_bytes
+import os
+import mmap
+import struct
+import importlib
+import threading
+from contextlib import contextmanager
 
-from Crypto.Cipher import AES
-from Crypto.Util.Padding import pad, unpad
+from keycache import KeyCache
+from keystore import KeyStore
+from metrics import Metrics
+from decorators import shared_logger, timer
 
-from python_datalogger import DataLogger
+# pycryptodome modules are imported on first use so that commands which never encrypt do not load them
+AES_BLOCK_SIZE = 16
 
 
 class CryptoHandler:
@@ -17,15 +24,49 @@ class CryptoHandler:
     Handles all the processes related to cryptography.
     """
 
+    # PBKDF2 parameters used for new keys, the defaults match the keys of existing bin files
+    kdf_iterations = 1000
+    kdf_hash = "SHA1"
+    kdf_hashes = {
+        1: "SHA1",
+        2: "SHA256",
+        3: "SHA512"
+    }
+
+    # data bin header: magic, hash id, iteration count
+    header_magic = b"PTE1"
+    header_format = ">4sBI"
+    header_size = struct.calcsize(header_format)
+
+    # chunked data bin (version 2) header: magic, hash id, iteration count, record count,
+    # followed by length prefixed records of nonce, tag and AES-GCM ciphertext
+    records_magic = b"PTE2"
+    records_format = ">4sBII"
+    records_size = struct.calcsize(records_format)
+    record_prefix_format = ">I"
+    record_prefix_size = struct.calcsize(record_prefix_format)
+    nonce_size = 12
+    tag_size = 16
+
+    # decrypted pages of memory mapped bins are dropped from the resident set every release_size bytes
+    release_size = 1 << 20
+
+    # derived keys shared by all the handlers of the process
+    key_cache = KeyCache()
+
     def __init__(self, availability: bool = False, password: str = "root", key: bytes = None,
-                 logger_name: str = "CryptoHandleLogger"):
+                 logger_name: str = "CryptoHandleLogger", uid: str = None, iterations: int = None,
+                 hash_name: str = None):
         self.__availability = availability
         self.__password = password
+        self.__uid = uid
         self.salt = None
         self.key = key
         self.cipher = None
         self.iv = None
-        self.logger = DataLogger(name=logger_name, propagate=False)
+        self.iterations = CryptoHandler.kdf_iterations if iterations is None else iterations
+        self.hash_name = CryptoHandler.kdf_hash if hash_name is None else hash_name
+        self.logger = shared_logger(name=logger_name, propagate=False)
 
     @property
     def password(self) -> str:
@@ -43,31 +84,84 @@ class CryptoHandler:
         :param salt: byte array of length 32
         """
         if not self.__availability:
+            from Crypto.Random import get_random_bytes
             self.salt = get_random_bytes(32)
         else:
             self.salt = salt
 
     def get_salt(self, path: str):
         """
-        reads a given bin file and assign salt
-        :param path: name/path of the salt bin file
+        assigns the salt, and the KDF parameters recorded with it, from the keystore of the salt directory.
+        salt bin files missing from the keystore are read and imported.
+        :param path: name/path of the salt bin file (<salt directory>/<uid>.bin)
+        """
+        store, uid = KeyStore.locate(path)
+        entry = store.get(uid)
+
+        if entry is None:
+            with open(path, 'rb') as file:
+                self.salt = file.read()
+            store.put(uid, self.salt)
+            return
+
+        self.salt, hash_name, iterations = entry
+        if hash_name is not None:
+            self.hash_name, self.iterations = hash_name, iterations
+
+    @staticmethod
+    def hash_id(hash_name: str) -> int:
         """
-        with open(path, 'rb') as file:
-            self.salt = file.read()
+        looks up the header id of a PBKDF2 hash
+        :param hash_name: hash name (SHA1, SHA256 or SHA512)
+        :return: hash id recorded in data bin headers
+        """
+        for hash_id, name in CryptoHandler.kdf_hashes.items():
+            if name == hash_name:
+                return hash_id
+        raise ValueError(f"Unsupported KDF hash -> {hash_name}")
 
+    @staticmethod
+    def hash_name_of(hash_id: int, file_name: str) -> str:
+        """
+        looks up the PBKDF2 hash recorded in a data bin header
+        :param hash_id: hash id read from the header
+        :param file_name: name/path of the bin file
+        :return: hash name
+        """
+        if hash_id not in CryptoHandler.kdf_hashes:
+            raise ValueError(f"{file_name} records an unknown KDF hash id -> {hash_id}")
+        return CryptoHandler.kdf_hashes[hash_id]
+
+    @timer
     def generate_key(self) -> None:
-        """Generates a unique 32byte key using salt and password"""
+        """Generates a unique 32byte key using salt and password, reusing the process key cache when possible"""
         if self.key is None and self.salt is not None:
+            cache_key = None
+            if self.__uid is not None:
+                cache_key = KeyCache.cache_key(self.__uid, self.salt, self.__password, self.iterations,
+                                               self.hash_name)
+                self.key = CryptoHandler.key_cache.get(cache_key)
+
+            if self.key is None:
+                from Crypto.Protocol.KDF import PBKDF2
+                hash_module = importlib.import_module(
+                    f"Crypto.Hash.{CryptoHandler.kdf_hashes[CryptoHandler.hash_id(self.hash_name)]}")
+                self.key = PBKDF2(self.__password, self.salt, dkLen=32, count=self.iterations,
+                                  hmac_hash_module=hash_module)
+                Metrics.count("kdf_invocations")
+                self.logger.log_info("Key generated")
 
-            self.key = PBKDF2(self.__password, self.salt, dkLen=32)
-            self.logger.log_info("Key generated")
+                if cache_key is not None:
+                    CryptoHandler.key_cache.put(cache_key, self.key)
 
     def get_encrypting_cipher(self):
         """assigns the cipher for encryption"""
+        from Crypto.Cipher import AES
         self.cipher = AES.new(self.key, AES.MODE_CBC)
 
     def get_decrypting_cipher(self):
         """assigns the cipher for decryption"""
+        from Crypto.Cipher import AES
         self.cipher = AES.new(self.key, AES.MODE_CBC, iv=self.iv)
 
     def get_iv(self):
@@ -85,8 +179,10 @@ class CryptoHandler:
         if not isinstance(data, bytes):
             data = data.encode()
 
+        from Crypto.Util.Padding import pad
         self.get_iv()
-        return self.cipher.encrypt(pad(data, AES.block_size))
+        Metrics.count("bytes_encrypted", len(data))
+        return self.cipher.encrypt(pad(data, AES_BLOCK_SIZE))
 
     def decrypt(self, data: bytes) -> bytes:
         """
@@ -99,35 +195,365 @@ class CryptoHandler:
         if isinstance(data, str):
             data = data.encode()
 
-        return unpad(self.cipher.decrypt(data), AES.block_size)
+        from Crypto.Util.Padding import unpad
+        Metrics.count("bytes_decrypted", len(data))
+        return unpad(self.cipher.decrypt(data), AES_BLOCK_SIZE)
 
     def salt_to_bin(self, path) -> None:
-        """creates a bin file containing the salt bytes"""
-        with open(path, 'wb') as file:
-            file.write(self.salt)
-        self.logger.log_info("salt bin created.")
+        """
+        stores the salt and the KDF parameters in the keystore of the salt directory
+        :param path: name/path of the salt bin file (<salt directory>/<uid>.bin), no file is written
+        """
+        store, uid = KeyStore.locate(path)
+        store.put(uid, self.salt, self.hash_name, self.iterations)
+        self.logger.log_info("salt stored.")
 
     def write_to_bin(self, file_name: str, data: bytes):
         """
-        creates or overwrites a bin file with iv and encrypted bytes.
+        creates or overwrites a bin file with the KDF header, iv and encrypted bytes.
         :param file_name: name/path of the bin file
         :param data: encrypted bytes
         """
         if isinstance(data, str):
             data = data.encode()
         with open(file_name, 'wb') as file:
+            file.write(struct.pack(CryptoHandler.header_format, CryptoHandler.header_magic,
+                                   CryptoHandler.hash_id(self.hash_name), self.iterations))
             file.write(self.iv)
             file.write(data)
         self.logger.log_info("Data bin created.")
 
     def read_from_bin(self, file_name: str) -> bytes:
         """
-        retrieves iv and encrypted byte data from a bin file.
+        retrieves the KDF parameters, iv and encrypted byte data from a bin file.
+        bin files written without a header use the original PBKDF2 defaults (1000 iterations, SHA1).
+        call before generate_key so the key is derived with the recorded parameters.
         :param file_name: name/path of the bin file
         :return: bytes read from the bin file
         """
         with open(file_name, 'rb') as file:
-            self.iv = file.read(16)
+            header = file.read(CryptoHandler.header_size)
+            magic, hash_id, iterations = struct.unpack(CryptoHandler.header_format, header.ljust(
+                CryptoHandler.header_size, b"\0"))
+
+            if magic == CryptoHandler.header_magic:
+                self.hash_name = CryptoHandler.hash_name_of(hash_id, file_name)
+                self.iterations = iterations
+                self.iv = file.read(16)
+            else:
+                self.hash_name, self.iterations = "SHA1", 1000
+                self.iv = header + file.read(16 - len(header))
             data = file.read()
         self.logger.log_info("Data retrieved from bin.")
         return data
+
+    def read_bin_version(self, file_name: str) -> int:
+        """
+        reads the format of a bin file and assigns the KDF parameters it records.
+        call before generate_key so the key is derived with the recorded parameters.
+        :param file_name: name/path of the bin file
+        :return: 2 for chunked record bins, 1 for single blob bins with a header, 0 for headerless bins
+        """
+        with open(file_name, 'rb') as file:
+            header = file.read(CryptoHandler.records_size)
+
+        if header[:4] == CryptoHandler.records_magic and len(header) == CryptoHandler.records_size:
+            _, hash_id, self.iterations, _ = struct.unpack(CryptoHandler.records_format, header)
+            self.hash_name = CryptoHandler.hash_name_of(hash_id, file_name)
+            return 2
+
+        if header[:4] == CryptoHandler.header_magic:
+            _, hash_id, self.iterations = struct.unpack(CryptoHandler.header_format,
+                                                        header[:CryptoHandler.header_size])
+            self.hash_name = CryptoHandler.hash_name_of(hash_id, file_name)
+            return 1
+
+        self.hash_name, self.iterations = "SHA1", 1000
+        return 0
+
+    def encrypt_record(self, data: str, index: int) -> bytes:
+        """
+        encrypts a single record with its own nonce, authenticating its position in the bin
+        :param data: A string of information that needs to be encrypted
+        :param index: position of the record in the bin
+        :return: nonce, tag and encrypted bytes
+        """
+        if not isinstance(data, bytes):
+            data = data.encode()
+
+        from Crypto.Cipher import AES
+        from Crypto.Random import get_random_bytes
+        nonce = get_random_bytes(CryptoHandler.nonce_size)
+        cipher = AES.new(self.key, AES.MODE_GCM, nonce=nonce)
+        cipher.update(struct.pack(">I", index))
+        encrypted_data, tag = cipher.encrypt_and_digest(data)
+        Metrics.count("bytes_encrypted", len(data))
+        return nonce + tag + encrypted_data
+
+    def decrypt_record(self, record: bytes, index: int) -> bytes:
+        """
+        decrypts and verifies a single record
+        :param record: nonce, tag and encrypted bytes, or a memoryview of them
+        :param index: position of the record in the bin
+        :return: decrypted bytes
+        """
+        from Crypto.Cipher import AES
+        # nonce and tag are copied, the ciphertext may be a memoryview of a memory mapped bin
+        nonce = bytes(record[:CryptoHandler.nonce_size])
+        tag = bytes(record[CryptoHandler.nonce_size:CryptoHandler.nonce_size + CryptoHandler.tag_size])
+        cipher = AES.new(self.key, AES.MODE_GCM, nonce=nonce)
+        cipher.update(struct.pack(">I", index))
+        Metrics.count("bytes_decrypted", len(record) - CryptoHandler.nonce_size - CryptoHandler.tag_size)
+        return cipher.decrypt_and_verify(record[CryptoHandler.nonce_size + CryptoHandler.tag_size:], tag)
+
+    @timer
+    def write_records(self, file_name: str, records) -> int:
+        """
+        atomically creates or overwrites a chunked bin file, encrypting every record independently.
+        :param file_name: name/path of the bin file
+        :param records: iterable of strings
+        :return: number of records written
+        """
+        # unique per writer, concurrent rewrites of the same bin must not share a temporary file
+        temp_file = f"{file_name}.{os.getpid()}-{threading.get_ident()}.tmp"
+        count = 0
+
+        with open(temp_file, 'wb') as file:
+            file.write(bytes(CryptoHandler.records_size))
+            for count, data in enumerate(records, start=1):
+                record = self.encrypt_record(data, count - 1)
+                file.write(struct.pack(CryptoHandler.record_prefix_format, len(record)))
+                file.write(record)
+
+            file.seek(0)
+            file.write(struct.pack(CryptoHandler.records_format, CryptoHandler.records_magic,
+                                   CryptoHandler.hash_id(self.hash_name), self.iterations, count))
+
+        os.replace(temp_file, file_name)
+        self.logger.log_info(f"Data bin created - {count} records.")
+        return count
+
+    @timer
+    def append_records(self, file_name: str, records) -> int:
+        """
+        appends records to an existing chunked bin file without re-encrypting the existing ones.
+        appenders of every process take turns on an exclusive lock of the bin, the record count in the header
+        is only raised once the new records are written, so readers never see a partially written record.
+        :param file_name: name/path of the bin file
+        :param records: iterable of strings
+        :return: number of records in the bin after appending
+        """
+        with open(file_name, 'r+b') as file, CryptoHandler.append_lock(file, file_name):
+            magic, hash_id, iterations, count = struct.unpack(CryptoHandler.records_format,
+                                                              file.read(CryptoHandler.records_size))
+            if magic != CryptoHandler.records_magic:
+                raise ValueError(f"{file_name} is not a chunked data bin.")
+            if (CryptoHandler.hash_name_of(hash_id, file_name), iterations) != (self.hash_name, self.iterations):
+                raise ValueError(f"{file_name} was encrypted with different KDF parameters.")
+
+            # bytes past the counted records are left by an interrupted append and are overwritten
+            file.seek(CryptoHandler.records_end(file, count, file_name))
+            for data in records:
+                record = self.encrypt_record(data, count)
+                file.write(struct.pack(CryptoHandler.record_prefix_format, len(record)))
+                file.write(record)
+                count += 1
+
+            file.flush()
+            file.seek(CryptoHandler.records_size - 4)
+            file.write(struct.pack(">I", count))
+            file.flush()
+
+        self.logger.log_info(f"Data bin appended - {count} records.")
+        return count
+
+    @staticmethod
+    @contextmanager
+    def append_lock(file, file_name: str):
+        """
+        holds the exclusive append lock of a bin file for the duration of a with block.
+        flock locks the bin itself, where fcntl is unavailable (windows) msvcrt locks a <bin>.lock file instead,
+        as its byte range locks would also block the readers of the bin.
+        :param file: bin file opened for writing
+        :param file_name: name/path of the bin file
+        """
+        try:
+            import fcntl
+        except ImportError:
+            fcntl = None
+
+        if fcntl is not None:
+            fcntl.flock(file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(file.fileno(), fcntl.LOCK_UN)
+            return
+
+        import msvcrt
+        with open(f"{file_name}.lock", 'wb') as lock_file:
+            while True:
+                try:
+                    # LK_LOCK gives up after 10 one second retries, appenders keep waiting for their turn
+                    msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue
+            try:
+                yield
+            finally:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+    @staticmethod
+    def records_end(file, count: int, file_name: str) -> int:
+        """
+        finds the end of the counted records of a chunked bin file by walking their length prefixes
+        :param file: bin file opened for reading
+        :param count: number of records recorded in the header
+        :param file_name: name/path of the bin file, for errors
+        :return: offset following the last counted record
+        """
+        size = os.fstat(file.fileno()).st_size
+        position = CryptoHandler.records_size
+        if count == 0:
+            return position
+
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            for index in range(count):
+                position = CryptoHandler.record_bounds(mapped, position, index, size, file_name)[1]
+
+        return position
+
+    @staticmethod
+    def record_bounds(mapped: mmap.mmap, position: int, index: int, size: int, file_name: str) -> tuple:
+        """
+        reads the length prefix of a record of a chunked bin file
+        :param mapped: memory map of the bin file
+        :param position: offset of the record's length prefix
+        :param index: position of the record in the bin
+        :param size: size of the bin file
+        :param file_name: name/path of the bin file, for errors
+        :return: (record start, record end) offsets
+        """
+        start = position + CryptoHandler.record_prefix_size
+        if start > size:
+            raise ValueError(f"{file_name} record {index} - bin is truncated")
+
+        (length,) = struct.unpack_from(CryptoHandler.record_prefix_format, mapped, position)
+        if start + length > size:
+            raise ValueError(f"{file_name} record {index} - bin is truncated")
+        return start, start + length
+
+    @timer
+    def read_records(self, file_name: str, last: int = None, first: int = 0) -> list:
+        """
+        decrypts records of a chunked bin file, skipping over the ones that are not requested.
+        :param file_name: name/path of the bin file
+        :param last: number of trailing records to decrypt, None for all of them
+        :param first: number of leading records to always decrypt (e.g. a report header)
+        :return: list of decrypted bytes in file order
+        """
+        records = list(self.iter_records(file_name=file_name, last=last, first=first))
+        self.logger.log_info(f"Data retrieved from bin - {len(records)} records.")
+        return records
+
+    @staticmethod
+    def release_pages(mapped: mmap.mmap, start: int, end: int) -> int:
+        """
+        drops the whole pages of a read-only memory map between two offsets from the resident set,
+        they are read from the file again if accessed
+        :param mapped: memory map
+        :param start: offset of the first page not dropped yet
+        :param end: offset up to which the map has been read
+        :return: offset of the first page not dropped after this call
+        """
+        end = end - end % mmap.PAGESIZE
+        if end - start >= CryptoHandler.release_size and hasattr(mmap, "MADV_DONTNEED"):
+            mapped.madvise(mmap.MADV_DONTNEED, start, end - start)
+            return end
+        return start
+
+    def iter_records(self, file_name: str, last: int = None, first: int = 0):
+        """
+        lazily decrypts records of a chunked bin file, reading the ciphertext straight from a memory map.
+        :param file_name: name/path of the bin file
+        :param last: number of trailing records to decrypt, None for all of them
+        :param first: number of leading records to always decrypt (e.g. a report header)
+        :return: generator of decrypted bytes in file order
+        """
+        with open(file_name, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            magic, _, _, count = struct.unpack_from(CryptoHandler.records_format, mapped)
+            if magic != CryptoHandler.records_magic:
+                raise ValueError(f"{file_name} is not a chunked data bin.")
+
+            start = 0 if last is None else max(count - last, 0)
+            position = CryptoHandler.records_size
+            released = 0
+
+            with memoryview(mapped) as view:
+                for index in range(count):
+                    position, end = CryptoHandler.record_bounds(mapped, position, index, len(mapped), file_name)
+                    if index < first or index >= start:
+                        failure = None
+                        with view[position:end] as record:
+                            try:
+                                data = self.decrypt_record(record, index)
+                            except ValueError as error:
+                                # the traceback holds views of the memory map, which cannot close while they exist
+                                failure = f"{error}"
+                        if failure is not None:
+                            raise ValueError(f"{file_name} record {index} - {failure}")
+                        yield data
+                    position = end
+                    released = CryptoHandler.release_pages(mapped, released, position)
+
+    def iter_blob(self, file_name: str, block_size: int = 1 << 16):
+        """
+        lazily decrypts a single blob (version 0 or 1) bin file from a memory map, one block at a time,
+        into a buffer that is reused between blocks.
+        :param file_name: name/path of the bin file
+        :param block_size: bytes decrypted at a time, a multiple of the AES block size
+        :return: generator of memoryviews of decrypted bytes, each only valid until the next one is requested
+        """
+        if block_size <= 0 or block_size % AES_BLOCK_SIZE != 0:
+            raise ValueError(f"block size must be a positive multiple of {AES_BLOCK_SIZE} -> {block_size}")
+
+        from Crypto.Cipher import AES
+        with open(file_name, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            if mapped[:4] == CryptoHandler.header_magic:
+                _, hash_id, self.iterations = struct.unpack_from(CryptoHandler.header_format, mapped)
+                self.hash_name = CryptoHandler.hash_name_of(hash_id, file_name)
+                start = CryptoHandler.header_size
+            else:
+                self.hash_name, self.iterations = "SHA1", 1000
+                start = 0
+
+            self.iv = mapped[start:start + AES_BLOCK_SIZE]
+            start += AES_BLOCK_SIZE
+            size = len(mapped) - start
+            if size <= 0 or size % AES_BLOCK_SIZE != 0:
+                raise ValueError("Data must be padded to 16 byte boundary in CBC mode")
+
+            self.cipher = AES.new(self.key, AES.MODE_CBC, iv=self.iv)
+            buffer = bytearray(min(block_size, size))
+            released = 0
+
+            with memoryview(mapped) as view, memoryview(buffer) as output:
+                for offset in range(start, len(mapped), len(buffer)):
+                    end = min(offset + len(buffer), len(mapped))
+                    with view[offset:end] as block:
+                        self.cipher.decrypt(block, output=output[:end - offset])
+                    Metrics.count("bytes_decrypted", end - offset)
+                    released = CryptoHandler.release_pages(mapped, released, end)
+
+                    if end < len(mapped):
+                        yield output
+                        continue
+
+                    # PKCS#7 padding of the last block, checked like Crypto.Util.Padding.unpad
+                    padding = output[end - offset - 1]
+                    if padding < 1 or padding > min(AES_BLOCK_SIZE, size) or \
+                            output[end - offset - padding:end - offset] != bytes([padding]) * padding:
+                        raise ValueError("Padding is incorrect.")
+                    yield output[:end - offset - padding]
@@ -0,0 +1,272 @@
+"""
+#!/usr/bin/env python3
+long running server keeping database connections and derived keys warm
+progression_tracker_OOP_V2/daemon.py
+"""
+import os
+import json
+import signal
+import struct
+import socket
+import threading
+from decorators import shared_logger
+
+# asyncio is imported by the server on first use, the CLI only needs the client to forward its commands
+
+
+class DaemonServer:
+    """
+    Serves the user facing operations over a Unix domain socket.
+    Each request and response is a frame of a 4 byte big-endian length followed by a UTF-8 JSON body,
+    requests are {"op": name, "args": {...}} and responses {"ok": true, "output": text} or {"ok": false, "error": text}.
+    """
+
+    socket_path = f"{os.getcwd()}/progression.sock"
+    frame_format = ">I"
+    frame_size = struct.calcsize(frame_format)
+    max_frame = 1 << 20
+
+    def __init__(self, socket_path: str = None):
+        self.__socket_path = socket_path if socket_path is not None else DaemonServer.socket_path
+        self.__requests = 0
+        self.__server = None
+        self.__clients = set()
+        self.__executor = None
+        self.__executor_lock = threading.Lock()
+        self.logger = shared_logger(name="DaemonLogger", propagate=False)
+
+    @property
+    def requests(self) -> int:
+        """number of requests served"""
+        return self.__requests
+
+    @property
+    def executor(self) -> "ThreadPoolExecutor":
+        """
+        single thread running the operations, it owns the daemon's sqlite connection and keeps the
+        event loop free to accept and read other clients while an operation runs
+        """
+        with self.__executor_lock:
+            if self.__executor is None:
+                from concurrent.futures import ThreadPoolExecutor
+                self.__executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="DaemonWorker")
+            return self.__executor
+
+    @staticmethod
+    def encode_frame(message: dict) -> bytes:
+        """
+        frames a message
+        :param message: JSON serializable dictionary
+        :return: length prefixed frame
+        """
+        body = json.dumps(message, separators=(",", ":")).encode()
+        return struct.pack(DaemonServer.frame_format, len(body)) + body
+
+    @staticmethod
+    def handle(request: dict) -> dict:
+        """
+        runs a single request against the operations of this process
+        :param request: {"op": name, "args": {...}} dictionary
+        :return: response dictionary
+        """
+        import operations
+
+        try:
+            operation = operations.registry.get(request.get("op"))
+            if operation is None:
+                raise Exception(f"unknown operation -> {request.get('op')}")
+
+            return {"ok": True, "output": operation(**request.get("args", {}))}
+
+        except Exception as error:
+            return {"ok": False, "error": f"{error}"}
+
+    async def serve_client(self, reader: "asyncio.StreamReader", writer: "asyncio.StreamWriter") -> None:
+        """
+        answers the requests of one client connection until it disconnects
+        :param reader: connection stream reader
+        :param writer: connection stream writer
+        """
+        import asyncio
+
+        self.__clients.add(writer)
+        try:
+            while True:
+                try:
+                    header = await reader.readexactly(DaemonServer.frame_size)
+                except asyncio.IncompleteReadError:
+                    break
+
+                (length,) = struct.unpack(DaemonServer.frame_format, header)
+                if length > DaemonServer.max_frame:
+                    self.logger.log_warning(f"Dropping client - frame of {length} bytes exceeds the limit.")
+                    break
+
+                try:
+                    request = json.loads(await reader.readexactly(length))
+                except asyncio.IncompleteReadError:
+                    break
+                except ValueError as error:
+                    response = {"ok": False, "error": f"malformed request -> {error}"}
+                else:
+                    response = await asyncio.get_running_loop().run_in_executor(self.executor, self.handle, request)
+                    self.__requests += 1
+
+                writer.write(self.encode_frame(response))
+                await writer.drain()
+
+        except ConnectionError:
+            pass
+
+        finally:
+            self.__clients.discard(writer)
+            writer.close()
+
+    async def start(self) -> None:
+        """binds the socket and serves requests until SIGINT or SIGTERM"""
+        import asyncio
+
+        if os.path.exists(self.__socket_path):
+            if DaemonClient(self.__socket_path).running():
+                raise Exception(f"a daemon is already serving {self.__socket_path}")
+            os.remove(self.__socket_path)
+
+        self.__server = await asyncio.start_unix_server(self.serve_client, path=self.__socket_path)
+        self.logger.log_info(f"Serving on {self.__socket_path}")
+
+        stopped = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for signal_number in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(signal_number, stopped.set)
+
+        try:
+            async with self.__server:
+                await stopped.wait()
+                for writer in list(self.__clients):
+                    writer.close()
+        finally:
+            if os.path.exists(self.__socket_path):
+                os.remove(self.__socket_path)
+            self.logger.log_info(f"Stopped after {self.__requests} requests.")
+
+    @staticmethod
+    def warm_up() -> None:
+        """creates the user data directories and opens the database, on the operations thread"""
+        from handler import DataHandler
+        from queries import QueryData
+
+        DataHandler.init_env()
+        QueryData().close()
+
+    def run(self) -> None:
+        """warms up the environment and serves until interrupted"""
+        import asyncio
+
+        self.executor.submit(self.warm_up).result()
+        try:
+            asyncio.run(self.start())
+        finally:
+            self.executor.shutdown(wait=True)
+
+
+class DaemonClient:
+    """
+    Forwards operations to a running DaemonServer, keeping one connection open across requests.
+    """
+
+    disable_variable = "PROGRESSION_NO_DAEMON"
+
+    def __init__(self, socket_path: str = None, timeout: float = 30.0):
+        self.__socket_path = socket_path if socket_path is not None else DaemonServer.socket_path
+        self.__timeout = timeout
+        self.__socket = None
+
+    def connect(self) -> bool:
+        """
+        connects to the daemon if it is running
+        :return: boolean value of the connection state
+        """
+        if self.__socket is not None:
+            return True
+
+        if os.environ.get(DaemonClient.disable_variable) or not os.path.exists(self.__socket_path):
+            return False
+
+        client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        client.settimeout(self.__timeout)
+        try:
+            client.connect(self.__socket_path)
+        except OSError:
+            client.close()
+            return False
+
+        self.__socket = client
+        return True
+
+    def running(self) -> bool:
+        """
+        checks whether a daemon accepts connections on the socket
+        :return: boolean value of the daemon state
+        """
+        connected = self.connect()
+        self.close()
+        return connected
+
+    def receive(self, size: int) -> bytes:
+        """reads exactly size bytes from the daemon"""
+        data = bytearray()
+        while len(data) < size:
+            chunk = self.__socket.recv(size - len(data))
+            if not chunk:
+                raise Exception("daemon closed the connection")
+            data.extend(chunk)
+        return bytes(data)
+
+    def request(self, op: str, **args) -> str:
+        """
+        runs an operation on the daemon
+        :param op: operation name
+        :param args: operation arguments
+        :return: output text of the operation
+        """
+        if not self.connect():
+            raise Exception(f"no daemon is serving {self.__socket_path}")
+
+        self.__socket.sendall(DaemonServer.encode_frame({"op": op, "args": args}))
+        (length,) = struct.unpack(DaemonServer.frame_format, self.receive(DaemonServer.frame_size))
+        response = json.loads(self.receive(length))
+
+        if not response["ok"]:
+            raise Exception(response["error"])
+        return response["output"]
+
+    @staticmethod
+    def forward(op: str, socket_path: str = None, timeout: float = 30.0, **args) -> str:
+        """
+        runs an operation on the daemon if one is running
+        :param op: operation name
+        :param socket_path: daemon socket, DaemonServer.socket_path if None
+        :param timeout: seconds to wait for the daemon, None to wait until the operation finishes
+        :param args: operation arguments
+        :return: output text of the operation, None if no daemon is running
+        """
+        client = DaemonClient(socket_path, timeout=timeout)
+        if not client.connect():
+            return None
+
+        try:
+            return client.request(op, **args)
+        finally:
+            client.close()
+
+    def close(self) -> None:
+        """closes the connection to the daemon"""
+        if self.__socket is not None:
+            self.__socket.close()
+            self.__socket = None
+
+    def __enter__(self) -> "DaemonClient":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
@@ -1,30 +1,61 @@
 import time
 from typing import Callable
+from functools import lru_cache, wraps
 from python_datalogger import DataLogger
+from metrics import Metrics
+
+
+@lru_cache(maxsize=None)
+def shared_logger(name: str, level: str = None, propagate: bool = False) -> DataLogger:
+    """
+    returns the process-wide DataLogger of a given name, creating it on first use
+    :param name: logger name
+    :param level: logging level, DataLogger's default if None
+    :param propagate: propagate records to the root logger
+    :return: shared DataLogger
+    """
+    if level is None:
+        return DataLogger(name=name, propagate=propagate)
+    return DataLogger(name=name, level=level, propagate=propagate)
 
 
 def logger(function: Callable):
-    default_logger = DataLogger(name="DefaultLogger", level="ERROR", propagate=True)
-    method_name = function.__name__
+    """
+    logs the exceptions raised by a function before re-raising them
+    :param function: decorated function
+    :return: wrapper
+    """
+    default_logger = shared_logger(name="DefaultLogger", level="ERROR", propagate=True)
+    method_name = function.__qualname__
 
+    @wraps(function)
     def wrapper(*args, **kwargs):
         try:
-            result = function(*args, **kwargs)
-            return result
+            return function(*args, **kwargs)
         except Exception as exception:
             default_logger.log_error(f"{method_name} - {exception}")
-            del default_logger
+            raise
 
     return wrapper
 
 
 def timer(function: Callable):
-    method_name = function.__name__
+    """
+    records the latency of every call in the Metrics histogram of the function.
+    whether calls are timed is decided at import time, with Metrics off the function is returned unwrapped.
+    :param function: decorated function
+    :return: wrapper, or the function itself
+    """
+    if not Metrics.enabled:
+        return function
 
+    method_name = function.__qualname__
+
+    @wraps(function)
     def wrapper(*args, **kwargs):
-        before = time.time()
-        result = function(*args, **kwargs)
-        after = time.time()
-        print(f"\n{method_name} - took {str(after - before)[:9]} seconds to execute.\n")
-        return result
+        before = time.perf_counter_ns()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            Metrics.observe(method_name, time.perf_counter_ns() - before)
     return wrapper
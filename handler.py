@@ -4,12 +4,20 @@ backend validated data processing
 progression_tracker_OOP_V2/handler.py
 """
 import os
+import time
+import codecs
 import uuid
-from decorators import timer
+import threading
 from queries import QueryData
 from validator import DataValidator
+from outcomes import OutcomeTable
+from keystore import KeyStore
+from identitycache import IdentityCache
+from sessioncache import SessionCache
+from passwords import PasswordHasher
 from cryptohandler import CryptoHandler
-from python_datalogger import DataLogger
+from metrics import Metrics
+from decorators import shared_logger, timer
 
 # TODO: Data entry method and get user stats unauthorized bin file generated.
 
@@ -27,7 +35,15 @@ class DataHandler:
         3: "Retriever",
         4: "Exclude"
     }
+    # identities of recently used usernames, shared by the handlers of the process
+    identities = IdentityCache()
+    # passwords verified within the last seconds, shared by the handlers of the process
+    sessions = SessionCache()
+    __env_initialized = False
+    __snapshot_writers = {}
+    __snapshot_lock = threading.Lock()
 
+    @timer
     def __init__(self, name: str, pass_marks: int = None, defer_marks: int = None, fail_marks: int = None,
                  password: str = "root", database: str = "local"):
         self.__name = name
@@ -36,23 +52,26 @@ class DataHandler:
         self.__pass_marks = pass_marks
         self.__defer_marks = defer_marks
         self.__fail_marks = fail_marks
-        self.__outcome = "undetermined"
+        self.__outcome = 0
         self.__db_con = QueryData(choice=database)
         self.__authentication = False
         self.__user_init = False
         self.__data_file = None
         self.__salt_file = None
-        self.logger = DataLogger(name="HandleLogger", propagate=False)
+        self.__user_record = None
+        self.__user_record_loaded = False
+        self.__salt = None
+        self.__snapshot_writer = None
+        self.logger = shared_logger(name="HandleLogger", propagate=False)
 
         if self.__pass_marks is None or self.__defer_marks is None or self.__fail_marks is None:
             self.__validity = False
+        elif OutcomeTable.outcome(self.__pass_marks, self.__defer_marks, self.__fail_marks) != 0:
+            self.__validity = True
         else:
+            # invalid marks are rare, the validator logs why they were rejected
             student = DataValidator(self.__name, self.__pass_marks, self.__defer_marks, self.__fail_marks)
-
-            if student.validity:
-                self.__validity = True
-            else:
-                self.__validity = False
+            self.__validity = student.validity
 
         self.init_env()
         self.init_user()
@@ -65,12 +84,19 @@ class DataHandler:
     def authentication(self):
         return self.__authentication
 
+    @property
+    def outcome(self) -> str:
+        """name of the outcome code of the entered marks"""
+        return DataHandler.progress_values.get(self.__outcome, "undetermined")
+
     @classmethod
-    @timer
     def init_env(cls) -> None:
-        """creates necessary directories for user data files"""
+        """creates necessary directories for user data files, once per process"""
+        if cls.__env_initialized:
+            return
+
         path_list = [DataHandler.salt_path, DataHandler.data_path]
-        cls_logger = DataLogger(name="ClassDataHandler", propagate=False)
+        cls_logger = shared_logger(name="ClassDataHandler", propagate=False)
 
         for paths in path_list:
             try:
@@ -79,6 +105,8 @@ class DataHandler:
             except FileExistsError:
                 cls_logger.log_info(f"Existing path found: [{paths}]")
 
+        cls.__env_initialized = True
+
     def init_user(self) -> None:
         """initiates and coordinates the methods assigning uid and password validation for new users"""
 
@@ -88,41 +116,49 @@ class DataHandler:
         if self.__authentication or not self.check_user_availability():
             self.__user_init = True
 
-    def check_user_availability(self) -> bool:
+    def read_user_record(self) -> tuple:
         """
-        search the database for existing users and sort new users and existing users
-        :return: boolean value depending on user's existence
+        reads the uid and stored credential of the user once and caches them for the handler's lifetime,
+        from the process identity cache when the connection allows it
+        :return: (uid, credential) tuple, None for new users
         """
-        result = False
-        temp_user_data = (self.__name,)
-        sample_data = self.__db_con.execute(func=QueryData.read_user_data_fields(
-            table_name='user_data',
-            columns='name'
-        ),
-            output=True
-        )
-        for value in sample_data:
+        if not self.__user_record_loaded:
+            identity = DataHandler.identities.get(self.identity_key()) if self.__db_con.identity_cache else None
 
-            if value == temp_user_data:
-                result = True
+            if identity is not None:
+                uid, credential, self.__salt = identity
+                self.__user_record = (uid, credential)
             else:
-                pass
+                self.__user_record = self.__db_con.read_user(self.__name)
+                self.cache_identity()
+            self.__user_record_loaded = True
+
+        return self.__user_record
+
+    def identity_key(self) -> tuple:
+        """
+        :return: identity and session cache key of the user
+        """
+        return IdentityCache.cache_key(self.__db_con.database_key, self.__name)
+
+    def cache_identity(self) -> None:
+        """publishes the uid, credential and salt of an existing user to the process identity cache"""
+        if self.__db_con.identity_cache and self.__user_record is not None:
+            DataHandler.identities.put(self.identity_key(), (*self.__user_record, self.__salt))
 
-        return result
+    def check_user_availability(self) -> bool:
+        """
+        search the database for existing users and sort new users and existing users
+        :return: boolean value depending on user's existence
+        """
+        return self.read_user_record() is not None
 
     def check_password(self) -> None:
         """check and validate the passwords of existing users."""
         if self.check_user_availability():
             self.logger.log_info(f"[{self.__name}] existing user found.")
-            sample_data = self.__db_con.execute(func=QueryData.read_user_specific_field(
-                column='password',
-                table_name='user_data',
-                filter_expression=f"name='{self.__name}'"
-            ),
-                output=True
-            )
 
-            if self.__password == sample_data[0][0]:
+            if self.verify_password(self.read_user_record()[1]):
                 self.__authentication = True
                 self.logger.log_info(f"User [{self.__name}] authentication successful.")
 
@@ -131,6 +167,47 @@ class DataHandler:
         else:
             pass
 
+    def verify_password(self, credential: str) -> bool:
+        """
+        checks the password against the stored credential, skipping the password hash if it was verified recently.
+        plaintext credentials and credentials hashed with another scheme or cost are rehashed once verified.
+        :param credential: stored credential of the user
+        :return: boolean value depending on the password matching
+        """
+        if DataHandler.sessions.check(self.identity_key(), credential, self.__password):
+            return True
+
+        match, needs_rehash = PasswordHasher.verify(self.__password, credential)
+        if not match:
+            return False
+
+        if needs_rehash:
+            credential = self.rehash_password()
+        DataHandler.sessions.remember(self.identity_key(), credential, self.__password)
+        return True
+
+    def rehash_password(self) -> str:
+        """
+        replaces the stored credential of the user with a hash of the configured scheme and cost
+        :return: new credential
+        """
+        uid = self.read_user_record()[0]
+        credential = PasswordHasher.hash(self.__password)
+
+        DataHandler.identities.invalidate(self.identity_key())
+        self.__db_con.execute(func=QueryData.update_rows_statement(
+            table_name='user_data',
+            values={"password": credential},
+            filters={"uid": uid}
+        ))
+        self.__user_record = (uid, credential)
+        self.cache_identity()
+
+        Metrics.count("password_rehashes")
+        self.logger.log_info(f"[{self.__name}] password rehashed with {PasswordHasher.current.scheme} "
+                             f"(cost {PasswordHasher.current.cost}).")
+        return credential
+
     def set_file_paths(self) -> None:
         """assign the paths for user data and bin files"""
 
@@ -144,40 +221,41 @@ class DataHandler:
 
             self.__uid = uuid.uuid4()
             self.set_file_paths()
-            self.assign_cryptodata()
 
-            data_entry = [f"'{self.__uid}'", f"'{self.__name}'", f"'{self.__password}'"]
-            self.__db_con.execute(func=QueryData.create_row_query(
-                table_name='user_data',
-                data_list=data_entry
-            ))
+            # the user row is only committed once its salt is stored
+            credential = PasswordHasher.hash(self.__password)
+            data_entry = [str(self.__uid), self.__name, credential]
+            DataHandler.identities.invalidate(self.identity_key())
+            with self.__db_con.transaction():
+                self.__db_con.execute(func=QueryData.create_row_statement(
+                    table_name='user_data',
+                    data_list=data_entry
+                ))
+                self.assign_cryptodata()
+            self.__user_record = (str(self.__uid), credential)
+            self.cache_identity()
+            DataHandler.sessions.remember(self.identity_key(), credential, self.__password)
 
         else:
-            sample_data = self.__db_con.execute(func=QueryData.read_user_specific_field(
-                column='uid',
-                table_name='user_data',
-                filter_expression=f"name='{self.__name}'"
-            ),
-                output=True
-            )
-
-            if len(sample_data) > 0:
-                self.__uid = sample_data[0][0]
+            self.__uid = self.read_user_record()[0]
 
         self.set_file_paths()
 
     def check_salt_data(self) -> bool:
         """
-        check for existing salt bin files
-        :return: boolean value depending on file's existence
+        check for an existing salt in the keystore, or a salt bin file not imported yet
+        :return: boolean value depending on the salt's existence
         """
-        current_files = os.listdir(DataHandler.salt_path)
-        salt_file = f"{self.__uid}.bin"
+        if self.__salt is not None:
+            return True
 
-        if salt_file in current_files:
+        entry = KeyStore.shared(DataHandler.salt_path).get(self.__uid)
+        if entry is not None:
+            self.__salt = entry[0]
+            self.cache_identity()
             return True
         else:
-            return False
+            return os.path.exists(self.__salt_file)
 
     def assign_cryptodata(self) -> None:
         """assign necessary cryptographic data for new users"""
@@ -186,34 +264,35 @@ class DataHandler:
             user = CryptoHandler(availability=False, password=self.__password)
             user.assign_salt()
             user.salt_to_bin(path=self.__salt_file)
+            self.__salt = user.salt
             self.logger.log_info(f"[{self.__name}] - cryptodata assigned.")
 
         else:
             pass
 
-    def progression_outcome(self) -> None:
-        """calculate the user outcome based on validated marks"""
+    @staticmethod
+    def calculate_outcome(pass_marks: int, fail_marks: int) -> int:
+        """
+        calculate the outcome of a validated set of marks
+        :param pass_marks: pass marks
+        :param fail_marks: fail marks
+        :return: outcome key of DataHandler.progress_values
+        """
 
-        progress, trailing, retriever, exclude = 0, 0, 0, 0
+        return OutcomeTable.calculate(pass_marks, fail_marks)
 
-        if self.__pass_marks >= 100:
-            if self.__pass_marks == 120:
-                self.__outcome = DataHandler.progress_values[1]
-                progress += 1
-            else:
-                self.__outcome = DataHandler.progress_values[2]
-                trailing += 1
+    def progression_outcome(self) -> None:
+        """calculate the user outcome based on validated marks"""
 
-        elif self.__fail_marks >= 80:
-            self.__outcome = DataHandler.progress_values[4]
-            exclude += 1
-        else:
-            self.__outcome = DataHandler.progress_values[3]
-            retriever += 1
+        counts = [0, 0, 0, 0]
+        outcome = OutcomeTable.outcome(self.__pass_marks, self.__defer_marks, self.__fail_marks)
+        self.__outcome = outcome
+        counts[outcome - 1] += 1
 
-        self.update_progression_stats(progress, trailing, retriever, exclude)
+        self.update_progression_stats(*counts)
         self.logger.log_info("Progression stats updated.")
 
+    @timer
     def data_entry(self) -> list:
         """
         if validated, enters a new data set of user progress to the database
@@ -221,19 +300,32 @@ class DataHandler:
         """
 
         if self.__user_init and self.__validity:
-            self.progression_outcome()
-
-            data_entry = [f"'{self.__uid}'", f"'{self.__pass_marks}'",
-                          f"'{self.__defer_marks}'", f"'{self.__fail_marks}'", f"'{self.__outcome}'"]
-            self.__db_con.execute(func=QueryData.create_row_query(
-                table_name='user_progression',
-                data_list=data_entry
-            ))
-
-            return [self.__name, self.__pass_marks, self.__defer_marks, self.__fail_marks, self.__outcome]
+            snapshot_fresh = self.check_snapshot()
+
+            # the stats, the entry and the summary are committed together or not at all
+            with self.__db_con.transaction():
+                self.progression_outcome()
+
+                data_entry = [str(self.__uid), self.__pass_marks,
+                              self.__defer_marks, self.__fail_marks, self.__outcome, time.time()]
+                self.__db_con.execute(func=QueryData.create_row_statement(
+                    table_name='user_progression',
+                    data_list=data_entry
+                ))
+                DataHandler.write_progression_summary(self.__db_con, {
+                    (self.__pass_marks, self.__defer_marks, self.__fail_marks, self.__outcome): 1
+                })
+
+            Metrics.count("data_entries")
+            if snapshot_fresh:
+                self.append_to_bin([DataHandler.format_record(self.__pass_marks, self.__defer_marks,
+                                                              self.__fail_marks, self.__outcome)])
+
+            return [self.__name, self.__pass_marks, self.__defer_marks, self.__fail_marks, self.outcome]
         else:
             return [self.__validity]
 
+    @timer
     def update_progression_stats(self, progress: int = 0, trailing: int = 0,
                                  retriever: int = 0, exclude: int = 0) -> None:
         """
@@ -244,108 +336,247 @@ class DataHandler:
         :param exclude: exclude count
         """
 
-        sample_data = self.__db_con.execute(func=QueryData.read_all_queries(
-            table_name='user_stats',
-        ),
-            output=True
-        )
+        with self.__db_con.transaction():
+            DataHandler.write_progression_stats(self.__db_con, progress, trailing, retriever, exclude)
 
-        if len(sample_data) == 0:
-            filter_value = 0
-        else:
-            filter_value = sample_data[0][0]
+    @staticmethod
+    def write_progression_stats(db_con: QueryData, progress: int = 0, trailing: int = 0,
+                                retriever: int = 0, exclude: int = 0, commit: bool = True) -> None:
+        """
+        atomically add progression counts (a single entry or an aggregated batch) to the user_stats totals.
+        :param db_con: database connection to write with
+        :param progress: progress count
+        :param trailing: trailing count
+        :param retriever: retriever count
+        :param exclude: exclude count
+        :param commit: commit the stats update immediately
+        """
 
-            progress += sample_data[0][0]
-            trailing += sample_data[0][1]
-            retriever += sample_data[0][2]
-            exclude += sample_data[0][3]
+        db_con.execute(func=QueryData.increment_rows_statement(
+            table_name='user_stats',
+            deltas={"progress": progress, "trailing": trailing, "retriever": retriever, "exclude": exclude},
+            filters={"id": 1}
+        ), commit=commit)
 
-        progress_list = [progress, trailing, retriever, exclude]
+    @staticmethod
+    def write_progression_summary(db_con: QueryData, entries: dict, commit: bool = True) -> None:
+        """
+        add entry counts to the materialized progression_summary table.
+        :param db_con: database connection to write with
+        :param entries: dictionary of (pass marks, defer marks, fail marks, outcome code) -> number of new entries
+        :param commit: commit the summary update immediately
+        """
 
-        self.__db_con.execute(func=QueryData.delete_rows(
-            table_name='user_stats',
-            filter_expression=f"progress='{filter_value}'"
-        ))
+        data = []
+        func = None
+        for (pass_marks, defer_marks, fail_marks, outcome), count in entries.items():
+            func, params = db_con.upsert_increment_statement(
+                table_name='progression_summary',
+                keys={"pass_marks": pass_marks, "defer_marks": defer_marks, "fail_marks": fail_marks},
+                values={"outcome": outcome},
+                deltas={"entries": count}
+            )
+            data.append(params)
 
-        self.__db_con.execute(func=QueryData.create_row_query(
-            table_name='user_stats',
-            data_list=progress_list
-        ))
+        if func is not None:
+            db_con.execute_many(func=func, data=data, commit=commit)
 
-    def dump_to_bin(self, data_str: str = None) -> None:
+    @timer
+    def dump_to_bin(self, data_str: any = None, generated_at: float = None) -> None:
         """
-        Outputs a json file with given data.
-        :param data_str: A string containing updated student progress data.
+        Outputs an encrypted bin file with given data, one independently encrypted record per entry.
+        :param data_str: A string or an iterable of record strings containing updated student progress data,
+        streamed from the database if None.
+        :param generated_at: time the data string was read from the database, recorded as the bin's mtime
         :return: None
         """
 
         if data_str is None:
-            data_str = self.generate_str()
+            generated_at = time.time()
+            data_str = self.stream_records()
+        if isinstance(data_str, str):
+            data_str = [data_str]
 
-        dump_user = CryptoHandler(availability=False, password=self.__password, logger_name="CryptoHandleLogger(ENC)")
+        dump_user = CryptoHandler(availability=False, password=self.__password, logger_name="CryptoHandleLogger(ENC)",
+                                  uid=str(self.__uid))
 
         self.assign_cryptodata()
 
         dump_user.get_salt(path=self.__salt_file)
         self.logger.log_info("Key requested to dump data.")
         dump_user.generate_key()
-        encrypted_data = dump_user.encrypt(data=data_str)
-        dump_user.write_to_bin(file_name=self.__data_file, data=encrypted_data)
+        dump_user.write_records(file_name=self.__data_file, records=data_str)
+
+        if generated_at is not None:
+            os.utime(self.__data_file, (generated_at, generated_at))
 
         self.logger.log_info(f"[{self.__name}] - Data bin encrypted.")
 
-    def load_from_bin(self) -> str:
+    def append_to_bin(self, records: list) -> bool:
+        """
+        Appends records to an existing chunked bin file without re-encrypting its older records.
+        :param records: list of record strings
+        :return: boolean value depending on whether the records were appended
+        """
+        if not self.check_salt_data():
+            return False
+
+        append_user = CryptoHandler(availability=True, password=self.__password,
+                                    logger_name="CryptoHandleLogger(ENC)", uid=str(self.__uid))
+        append_user.get_salt(path=self.__salt_file)
+
+        try:
+            if append_user.read_bin_version(file_name=self.__data_file) != 2:
+                return False
+
+            self.logger.log_info("Key requested to append data.")
+            append_user.generate_key()
+            append_user.append_records(file_name=self.__data_file, records=records)
+
+        except (OSError, ValueError) as error:
+            self.logger.log_warning(f"[{self.__name}] - Data bin not appended - {error}")
+            return False
+
+        self.logger.log_info(f"[{self.__name}] - Data bin appended.")
+        return True
+
+    @timer
+    def load_from_bin(self, last: int = None) -> str:
         """
         Loads a data string from a given bin file and returns it.
+        :param last: number of most recent entries to decrypt from chunked bins, None for all of them
         :return: data_str: A dictionary containing student progress data.
         """
 
+        chunks = self.stream_from_bin(last=last)
+        if chunks is not None:
+            return "".join(chunks)
+
+    def stream_from_bin(self, last: int = None):
+        """
+        Opens the data bin and lazily decrypts it from a memory map, without holding its plaintext as a whole.
+        :param last: number of most recent entries to decrypt from chunked bins, None for all of them
+        :return: generator of data string chunks, None if the data bin does not exist
+        """
+
         try:
             load_user = CryptoHandler(availability=True, password=self.__password,
-                                      logger_name="CryptoHandleLogger(DEC)")
+                                      logger_name="CryptoHandleLogger(DEC)", uid=str(self.__uid))
             if self.check_salt_data():
                 load_user.get_salt(path=self.__salt_file)
             else:
                 raise Exception(f"{self.__salt_file} does not exists.")
 
+            version = load_user.read_bin_version(file_name=self.__data_file)
             self.logger.log_info("Key requested to load data.")
             load_user.generate_key()
-            encrypted_data = load_user.read_from_bin(file_name=self.__data_file)
-            decrypted_data = load_user.decrypt(data=encrypted_data)
-            self.logger.log_info(f"[{self.__name}] - Data bin decrypted.")
-
-            return decrypted_data.decode()
 
         except FileNotFoundError as error:
             self.logger.log_error(str(error))
+            return None
 
-    def generate_str(self) -> str:
+        return self.__decrypt_bin(load_user, version, last)
+
+    def __decrypt_bin(self, load_user: CryptoHandler, version: int, last: int = None):
+        """decrypts and decodes the opened data bin chunk by chunk"""
+        if version == 2:
+            for record in load_user.iter_records(file_name=self.__data_file, last=last, first=1):
+                yield record.decode()
+        else:
+            decoder = codecs.getincrementaldecoder("utf-8")()
+            for block in load_user.iter_blob(file_name=self.__data_file):
+                yield decoder.decode(block)
+            yield decoder.decode(b"", final=True)
+
+        self.logger.log_info(f"[{self.__name}] - Data bin decrypted.")
+
+    @staticmethod
+    def format_header(name: str, uid: str, data_file: str) -> str:
         """
-        generated a string of user progression data from the database
-        :return: string of progression data
+        formats the header of the progress data string
+        :return: string of user details
+        """
+        return f"""
+        Progress Data
+        --------------
+        Name: {name}
+        UID: {uid}
+        Data File: {data_file}\n
         """
 
-        sample_data = self.__db_con.execute(func=QueryData.read_user_specific_field(
-            column="pass_marks, defer_marks, fail_marks, outcome",
+    @staticmethod
+    def format_record(pass_marks: int, defer_marks: int, fail_marks: int, outcome: int) -> str:
+        """
+        formats a single progression entry of the progress data string
+        :param outcome: outcome code, or name
+        :return: string of a progression entry
+        """
+        outcome = DataHandler.progress_values.get(outcome, outcome)
+        return f"\n        [pass:{pass_marks} | defer:{defer_marks} | fail:{fail_marks} | outcome:{outcome}]"
+
+    def count_entries(self, since: float = None) -> int:
+        """
+        counts the user's progression entries using the (uid, entry_time) index
+        :param since: only count entries made at or after this time
+        :return: number of entries
+        """
+        filter_expression, params = QueryData.filter_statement({"uid": str(self.__uid)})
+        if since is not None:
+            filter_expression, params = f"{filter_expression} AND entry_time >= ?", params + (since,)
+
+        return self.__db_con.execute(func=QueryData.read_user_specific_field(
             table_name='user_progression',
-            filter_expression=f"uid='{self.__uid}'"
+            filter_expression=filter_expression,
+            column="COUNT(*)"
         ),
-            output=True
-        )
+            params=params,
+            output=True,
+            commit=False
+        )[0][0]
 
-        user_progress = f"""
-        Progress Data
-        --------------
-        Name: {self.__name}
-        UID: {self.__uid}
-        Data File: {self.__data_file}\n
+    def stream_records(self, limit: int = None, offset: int = 0, since: float = None, chunk_size: int = 500,
+                       db_con: QueryData = None):
         """
-        for data in sample_data:
-            user_progress = user_progress + f"\n        [pass:{data[0]} | defer:{data[1]} | fail:{data[2]} | " \
-                                            f"outcome:{data[3]}]"
+        lazily generates the records of the user progression data string, oldest entry first,
+        reading chunk_size rows at a time so that memory use does not grow with the user's history
+        :param limit: maximum number of entries, None for all of them
+        :param offset: number of leading entries to skip
+        :param since: only entries made at or after this time
+        :param chunk_size: rows fetched from the database at a time
+        :param db_con: database connection to read with, the handler's own connection if None
+        :return: generator of the report header followed by one string per progression entry
+        """
+        db_con = db_con if db_con is not None else self.__db_con
+
+        yield DataHandler.format_header(self.__name, self.__uid, self.__data_file)
+
+        for data in db_con.stream(db_con.read_page_statement(
+            table_name='user_progression',
+            column="pass_marks, defer_marks, fail_marks, outcome",
+            filters={"uid": str(self.__uid)},
+            order_by="entry_time",
+            limit=limit,
+            offset=offset,
+            minimums={"entry_time": since}
+        ), size=chunk_size):
+            yield DataHandler.format_record(*data)
+
+    def generate_records(self) -> list:
+        """
+        generates the records of the user progression data string from the database
+        :return: list of the report header followed by one string per progression entry
+        """
+        records = list(self.stream_records())
+        self.logger.log_info("progress data records generated from database.")
+        return records
 
-        self.logger.log_info("progress data string generated from database.")
-        return user_progress
+    @timer
+    def generate_str(self) -> str:
+        """
+        generated a string of user progression data from the database
+        :return: string of progression data
+        """
+        return "".join(self.stream_records())
 
     def get_output(self) -> str:
         """
@@ -358,6 +589,167 @@ class DataHandler:
             data = self.load_from_bin()
             return data
 
+    def latest_entry_time(self) -> float:
+        """
+        reads the time of the user's latest progression entry using the (uid, entry_time) index
+        :return: entry time, None if the user has no entries
+        """
+        sample_data = self.__db_con.execute(func=QueryData.read_user_specific_field_statement(
+            column="MAX(entry_time)",
+            table_name='user_progression',
+            filters={"uid": str(self.__uid)}
+        ),
+            output=True,
+            commit=False
+        )
+
+        return sample_data[0][0] if len(sample_data) > 0 else None
+
+    def check_snapshot(self) -> bool:
+        """
+        check whether the encrypted data bin holds every progression entry of the user
+        :return: boolean value depending on the data bin's freshness
+        """
+        try:
+            modified = os.path.getmtime(self.__data_file)
+        except OSError:
+            return False
+
+        latest = self.latest_entry_time()
+        return latest is None or modified >= latest
+
+    def write_snapshot(self, data_str: any, generated_at: float) -> None:
+        """
+        encrypts and writes the data bin in a background thread, the process waits for it before exiting
+        :param data_str: A string or a list of record strings containing updated student progress data,
+        None to stream the records from the database in the background thread.
+        :param generated_at: time the data string was read from the database
+        """
+        self.wait_for_snapshot()
+
+        with DataHandler.__snapshot_lock:
+            # a long running process may still be writing this user's bin, the next stale read rewrites it again
+            pending = DataHandler.__snapshot_writers.get(str(self.__uid))
+            if pending is not None and pending.is_alive():
+                return
+
+            self.__snapshot_writer = threading.Thread(target=self.__write_snapshot, args=(data_str, generated_at),
+                                                      name=f"SnapshotWriter-{self.__uid}")
+            DataHandler.__snapshot_writers[str(self.__uid)] = self.__snapshot_writer
+            self.__snapshot_writer.start()
+
+    def __write_snapshot(self, data_str: any, generated_at: float) -> None:
+        """background data bin write, forgets the writer once it has finished"""
+        try:
+            if data_str is None:
+                # the handler's sqlite connection belongs to the calling thread
+                with QueryData(choice=self.__db_con.choice) as db_con:
+                    self.dump_to_bin(self.stream_records(db_con=db_con), generated_at)
+            else:
+                self.dump_to_bin(data_str, generated_at)
+        finally:
+            with DataHandler.__snapshot_lock:
+                if DataHandler.__snapshot_writers.get(str(self.__uid)) is threading.current_thread():
+                    del DataHandler.__snapshot_writers[str(self.__uid)]
+
+    def wait_for_snapshot(self) -> None:
+        """blocks until a pending background data bin write has finished"""
+        if self.__snapshot_writer is not None:
+            self.__snapshot_writer.join()
+            self.__snapshot_writer = None
+
+    def stream_progress(self, use_snapshot: bool = False, last: int = None, limit: int = None, offset: int = 0,
+                        since: float = None, chunk_size: int = 500):
+        """
+        if user is authenticated, lazily generates the progress data string without the encrypt-decrypt round trip.
+        the data bin is only rewritten, in the background, when it is missing entries.
+        :param use_snapshot: serve from the data bin when it is up-to-date, without reading user_progression
+        :param last: number of most recent entries to return, cannot be combined with limit or offset
+        :param limit: maximum number of entries, None for all of them
+        :param offset: number of leading entries to skip
+        :param since: only entries made at or after this time
+        :param chunk_size: rows fetched from the database at a time
+        :return: generator of progress data string chunks
+        """
+        if not self.__authentication:
+            return
+
+        if last is not None and (limit is not None or offset > 0):
+            raise Exception("last cannot be combined with limit or offset")
+
+        paginated = limit is not None or offset > 0 or since is not None
+        fresh = not paginated and self.check_snapshot()
+        served = 0
+        if use_snapshot and fresh:
+            try:
+                chunks = self.stream_from_bin(last=last)
+                if chunks is not None:
+                    for chunk in chunks:
+                        served += len(chunk)
+                        yield chunk
+                    self.logger.log_info(f"[{self.__name}] - served from data bin.")
+                    return
+
+            except ValueError as error:
+                # a damaged bin is stale, the database serves what the bin could not and the bin is rewritten
+                self.logger.log_warning(f"[{self.__name}] - data bin unreadable, "
+                                        f"serving from the database - {error}")
+                fresh = False
+
+        # paginated reads neither serve from nor rewrite the data bin
+        if not fresh and not paginated:
+            self.write_snapshot(None, time.time())
+
+        if last is not None:
+            limit, offset = last, max(self.count_entries(since=since) - last, 0)
+
+        records = self.stream_records(limit=limit, offset=offset, since=since, chunk_size=chunk_size)
+        yield from DataHandler.skip_characters(records, served)
+
+    @staticmethod
+    def skip_characters(chunks, count: int):
+        """
+        drops the leading characters of a stream of strings
+        :param chunks: iterable of strings
+        :param count: number of characters to drop, e.g. already served from a data bin
+        :return: generator of the remaining strings
+        """
+        for chunk in chunks:
+            if count >= len(chunk):
+                count -= len(chunk)
+                continue
+
+            yield chunk[count:]
+            count = 0
+
+    @timer
+    def get_progress(self, use_snapshot: bool = False, last: int = None, limit: int = None, offset: int = 0,
+                     since: float = None) -> str:
+        """
+        if user is authenticated, returns the progress data string without the encrypt-decrypt round trip.
+        :param use_snapshot: serve from the data bin when it is up-to-date, without reading user_progression
+        :param last: number of most recent entries to return, None for all of them
+        :param limit: maximum number of entries, None for all of them
+        :param offset: number of leading entries to skip
+        :param since: only entries made at or after this time
+        :return: string of progression data
+        """
+        if not self.__authentication:
+            return None
+
+        return "".join(self.stream_progress(use_snapshot=use_snapshot, last=last, limit=limit, offset=offset,
+                                            since=since))
+
+    def close(self) -> None:
+        """returns the handler's database connection to the pool"""
+        self.__db_con.close()
+
+    def __enter__(self) -> "DataHandler":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
     def get_user_data(self):
         return f"""
         name: {self.__name}
@@ -365,4 +757,4 @@ class DataHandler:
         """
 
     def __repr__(self) -> str:
-        return f"{self.__name}, {self.__pass_marks}, {self.__defer_marks}, {self.__fail_marks}, {self.__outcome}"
+        return f"{self.__name}, {self.__pass_marks}, {self.__defer_marks}, {self.__fail_marks}, {self.outcome}"
@@ -0,0 +1,33 @@
+"""
+#!/usr/bin/env python3
+in-memory user identity cache
+progression_tracker_OOP_V2/identitycache.py
+"""
+from ttlcache import TTLCache
+
+
+class IdentityCache(TTLCache):
+    """
+    Bounded, TTL-evicting cache of the (uid, credential, salt) identity of usernames,
+    shared by the DataHandler instances of a process.
+    Entries are keyed by database so that the local and foreign databases never share identities.
+    Identities are invalidated whenever their user row is written.
+    """
+
+    metric = "identity_cache"
+
+    def __init__(self, size: int = 1024, ttl: float = 60.0):
+        super().__init__(size, ttl)
+
+    @staticmethod
+    def cache_key(database_key: tuple, name: str) -> tuple:
+        """
+        builds the cache key of a username, shared with the session cache
+        :param database_key: QueryData.database_key of the database holding the user
+        :param name: username
+        :return: tuple of (database key, username)
+        """
+        return database_key, name
+
+    def store(self, identity: tuple) -> tuple:
+        return tuple(identity)
@@ -0,0 +1,234 @@
+"""
+#!/usr/bin/env python3
+bulk user marks ingestion
+progression_tracker_OOP_V2/importer.py
+"""
+import os
+import csv
+import json
+import time
+from collections import Counter
+from queries import QueryData
+from handler import DataHandler
+from outcomes import OutcomeTable
+from decorators import shared_logger
+
+
+class MarksImporter:
+    """
+    Streams user marks from a csv or jsonl file into the database in batched transactions.
+    """
+
+    fields = ("name", "pass_marks", "defer_marks", "fail_marks")
+
+    def __init__(self, file_path: str, batch_size: int = 500, database: str = "local"):
+        if batch_size < 1:
+            raise ValueError(f"batch_size must be at least 1 -> {batch_size}")
+
+        self.__file_path = file_path
+        self.__csv = os.path.splitext(file_path)[1].lower() == ".csv"
+        self.__batch_size = batch_size
+        self.__db_con = QueryData(choice=database)
+        self.__inserted = 0
+        self.__rejected = []
+        self.__elapsed = 0.0
+        self.logger = shared_logger(name="ImportLogger", propagate=False)
+
+    @property
+    def inserted(self) -> int:
+        return self.__inserted
+
+    @property
+    def rejected(self) -> list:
+        """list of (line number, reason) pairs of the rows that were not imported"""
+        return self.__rejected
+
+    @property
+    def elapsed(self) -> float:
+        return self.__elapsed
+
+    @property
+    def rate(self) -> float:
+        """processed rows per second"""
+        processed = self.__inserted + len(self.__rejected)
+        if self.__elapsed == 0:
+            return 0.0
+        return processed / self.__elapsed
+
+    def read_rows(self):
+        """
+        lazily reads the rows of a csv (with a header) or jsonl file
+        :return: generator of (line number, row dictionary) pairs, row is None if the line is malformed
+        """
+        with open(self.__file_path, 'r', newline='') as file:
+            if self.__csv:
+                reader = csv.DictReader(file)
+                for row in reader:
+                    yield reader.line_num, row
+            else:
+                for line_no, line in enumerate(file, start=1):
+                    if line.strip() == "":
+                        continue
+                    try:
+                        yield line_no, json.loads(line)
+                    except json.JSONDecodeError:
+                        yield line_no, None
+
+    @staticmethod
+    def parse_row(row: dict, text: bool = False) -> tuple:
+        """
+        converts a raw row into a (name, pass, defer, fail) tuple, the marks are validated per batch
+        :param row: row dictionary read from the file
+        :param text: the row was read from a csv file and its marks are strings
+        :return: tuple of name and marks
+        """
+        if not isinstance(row, dict):
+            raise ValueError("malformed row")
+
+        missing = [field for field in MarksImporter.fields if row.get(field) in (None, "")]
+        if len(missing) > 0:
+            raise ValueError(f"missing field(s): {', '.join(missing)}")
+
+        marks = [MarksImporter.parse_mark(row[field], text) for field in MarksImporter.fields[1:]]
+
+        return (str(row["name"]).strip(), *marks)
+
+    @staticmethod
+    def parse_mark(value: any, text: bool = False) -> int:
+        """
+        converts a raw mark without truncating or coercing it, like DataValidator.validate_type.
+        csv marks must be digit strings and jsonl marks JSON integers, floats and booleans are rejected.
+        :param value: raw mark
+        :param text: the mark was read from a csv file
+        :return: mark between 0 and OutcomeTable.total
+        """
+        if text:
+            value = str(value).strip()
+            value = int(value) if value.isascii() and value.isdigit() else None
+
+        elif isinstance(value, bool) or not isinstance(value, int):
+            value = None
+
+        if value is None:
+            raise ValueError("marks should be integers")
+        if value < 0 or value > OutcomeTable.total:
+            raise ValueError(f"marks should be between 0 and {OutcomeTable.total}")
+        return value
+
+    def read_batches(self):
+        """
+        groups the parsed rows into batches of batch_size, recording rejected rows on the way
+        :return: generator of lists of (line number, parsed row) pairs
+        """
+        batch = []
+        for line_no, row in self.read_rows():
+            try:
+                batch.append((line_no, self.parse_row(row, text=self.__csv)))
+            except ValueError as error:
+                self.reject(line_no, str(error))
+                continue
+
+            if len(batch) >= self.__batch_size:
+                yield batch
+                batch = []
+
+        if len(batch) > 0:
+            yield batch
+
+    def reject(self, line_no: int, reason: str) -> None:
+        """records a rejected row without stopping the import"""
+        self.__rejected.append((line_no, reason))
+        self.logger.log_warning(f"line {line_no} rejected - {reason}")
+
+    def resolve_uids(self, names: set) -> dict:
+        """
+        fetch the uid of every existing user in a batch with a single query
+        :param names: set of user names
+        :return: dictionary of name -> uid
+        """
+        sample_data = self.__db_con.execute(func=QueryData.read_user_specific_field_statement(
+            column='name, uid',
+            table_name='user_data',
+            filters={"name": names}
+        ),
+            output=True,
+            commit=False
+        )
+
+        return {name: uid for name, uid in sample_data}
+
+    def write_batch(self, batch: list) -> None:
+        """
+        inserts a batch of parsed rows and the aggregated stats in one transaction
+        :param batch: list of (line number, parsed row) pairs
+        """
+        uids = self.resolve_uids({row[0] for _, row in batch})
+        validity, outcomes = OutcomeTable.classify(*(
+            [row[column] for _, row in batch] for column in range(1, 4)
+        ))
+        entry_time = time.time()
+        counts = [0, 0, 0, 0]
+        summary = Counter()
+        data = []
+        lines = []
+
+        for position, (line_no, (name, pass_marks, defer_marks, fail_marks)) in enumerate(batch):
+            if not validity[position]:
+                self.reject(line_no, f"invalid marks {(pass_marks, defer_marks, fail_marks)}")
+                continue
+
+            if name not in uids:
+                self.reject(line_no, f"unknown user [{name}]")
+                continue
+
+            outcome = int(outcomes[position])
+            counts[outcome - 1] += 1
+            summary[(pass_marks, defer_marks, fail_marks, outcome)] += 1
+            data.append((uids[name], pass_marks, defer_marks, fail_marks, outcome, entry_time))
+            lines.append(line_no)
+
+        try:
+            with self.__db_con.transaction():
+                self.__db_con.execute_many(func=QueryData.create_rows_query(
+                    table_name='user_progression',
+                    column_count=6
+                ),
+                    data=data
+                )
+                DataHandler.write_progression_stats(self.__db_con, *counts)
+                DataHandler.write_progression_summary(self.__db_con, summary)
+            self.__inserted += len(data)
+
+        except Exception as error:
+            for line_no in lines:
+                self.reject(line_no, f"batch failed - {error}")
+
+    def import_file(self) -> int:
+        """
+        streams the whole file into the database
+        :return: number of inserted rows
+        """
+        before = time.perf_counter()
+
+        for batch in self.read_batches():
+            self.write_batch(batch)
+            self.__elapsed = time.perf_counter() - before
+            self.logger.log_info(f"{self.__inserted} rows imported ({self.rate:.1f} rows/sec).")
+
+        self.__elapsed = time.perf_counter() - before
+        self.logger.log_info(f"[{self.__file_path}] imported - {self.__inserted} rows, "
+                             f"{len(self.__rejected)} rejected.")
+        return self.__inserted
+
+    def close(self) -> None:
+        """returns the importer's database connection to the pool"""
+        self.__db_con.close()
+
+    def __enter__(self) -> "MarksImporter":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def __repr__(self) -> str:
+        return f"{self.__file_path}, {self.__inserted}, {len(self.__rejected)}, {self.__elapsed}"
@@ -0,0 +1,47 @@
+"""
+#!/usr/bin/env python3
+in-memory derived key cache
+progression_tracker_OOP_V2/keycache.py
+"""
+import hashlib
+from ttlcache import TTLCache
+
+
+class KeyCache(TTLCache):
+    """
+    Bounded, TTL-evicting cache of derived keys shared by the CryptoHandler instances of a process.
+    Cached keys are held in bytearrays and zeroed when evicted.
+    """
+
+    def __init__(self, size: int = 128, ttl: float = 300.0):
+        super().__init__(size, ttl)
+
+    @staticmethod
+    def cache_key(uid: str, salt: bytes, password: str, iterations: int, hash_name: str) -> tuple:
+        """
+        builds the cache key of a derivation, the password is only kept as a keyed digest
+        :param uid: user id owning the key
+        :param salt: salt bytes
+        :param password: password the key is derived from
+        :param iterations: PBKDF2 iteration count
+        :param hash_name: PBKDF2 hash name
+        :return: tuple of (uid, salt digest, password digest, iterations, hash name)
+        """
+        salt_digest = hashlib.sha256(salt).hexdigest()
+        return str(uid), salt_digest, TTLCache.keyed_digest(password).hex(), iterations, hash_name
+
+    def live_keys(self) -> dict:
+        """
+        the most recently used unexpired key of every user, which re-encrypts their data bins without a password
+        :return: dictionary of uid -> (key bytes, PBKDF2 iteration count, PBKDF2 hash name)
+        """
+        return {key[0]: (value, key[3], key[4]) for key, value in self.items()}
+
+    def export(self, value: bytearray) -> bytes:
+        return bytes(value)
+
+    def store(self, value: bytes) -> bytearray:
+        return bytearray(value)
+
+    def release(self, value: bytearray) -> None:
+        value[:] = bytes(len(value))
@@ -0,0 +1,164 @@
+"""
+#!/usr/bin/env python3
+single file store of user salts and KDF parameters
+progression_tracker_OOP_V2/keystore.py
+"""
+import os
+import glob
+import sqlite3
+import threading
+from decorators import shared_logger
+
+
+class KeyStore:
+    """
+    Indexed sqlite file mapping each uid to its salt and KDF parameters, one per salt directory.
+    It replaces the <uid>.bin salt files of that directory, which are imported when the store is first opened.
+    """
+
+    file_name = "keystore.db"
+    # schema versions, recorded in PRAGMA user_version
+    version = 1
+    # salts hold key material, every write is synced
+    pragmas = (("journal_mode", "WAL"), ("synchronous", "FULL"), ("busy_timeout", 5000))
+
+    __stores = {}
+    __stores_lock = threading.Lock()
+
+    def __init__(self, directory: str):
+        self.__directory = os.path.abspath(directory)
+        self.__path = os.path.join(self.__directory, KeyStore.file_name)
+        self.__local = threading.local()
+        self.__pid = os.getpid()
+        self.logger = shared_logger(name="KeyStoreLogger", propagate=False)
+        self.migrate()
+
+    @property
+    def path(self) -> str:
+        return self.__path
+
+    @classmethod
+    def shared(cls, directory: str) -> "KeyStore":
+        """
+        returns the process-wide store of a salt directory, creating it on first use
+        :param directory: salt directory
+        :return: shared KeyStore
+        """
+        key = os.path.abspath(directory)
+
+        with cls.__stores_lock:
+            if key not in cls.__stores:
+                cls.__stores[key] = cls(directory)
+            return cls.__stores[key]
+
+    @classmethod
+    def locate(cls, salt_file: str) -> tuple:
+        """
+        finds the store and uid of a salt bin file path
+        :param salt_file: <salt directory>/<uid>.bin path
+        :return: (KeyStore, uid) pair
+        """
+        uid, _ = os.path.splitext(os.path.basename(salt_file))
+        return cls.shared(os.path.dirname(salt_file) or "."), uid
+
+    @classmethod
+    def close_all(cls) -> None:
+        """closes the calling thread's connection of every store of the process"""
+        with cls.__stores_lock:
+            for store in cls.__stores.values():
+                store.close()
+            cls.__stores.clear()
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        """sqlite connection of the calling thread, forked processes open their own"""
+        if self.__pid != os.getpid():
+            self.__local = threading.local()
+            self.__pid = os.getpid()
+
+        connection = getattr(self.__local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.__path)
+            for name, value in KeyStore.pragmas:
+                connection.execute(f"PRAGMA {name} = {value};")
+            self.__local.connection = connection
+
+        return connection
+
+    def migrate(self) -> None:
+        """creates the keys table and imports the salt bin files of the directory, once per store file"""
+        connection = self.connection
+        if connection.execute("PRAGMA user_version;").fetchone()[0] >= KeyStore.version:
+            return
+
+        with connection:
+            connection.execute("""
+            CREATE TABLE IF NOT EXISTS `keys` (
+            `uid` TEXT NOT NULL PRIMARY KEY,
+            `salt` BLOB NOT NULL,
+            `kdf_hash` TEXT NULL,
+            `kdf_iterations` INTEGER NULL) WITHOUT ROWID;
+            """)
+            imported = self.import_bins(commit=False)
+            connection.execute(f"PRAGMA user_version = {KeyStore.version};")
+
+        self.logger.log_info(f"Keystore {self.__path} created - {imported} salt bins imported.")
+
+    def import_bins(self, commit: bool = True) -> int:
+        """
+        imports the <uid>.bin salt files of the directory, keeping the salts already stored.
+        the files are left in place.
+        :param commit: commit after importing
+        :return: number of salt files read
+        """
+        salts = []
+        for salt_file in glob.iglob(os.path.join(glob.escape(self.__directory), "*.bin")):
+            with open(salt_file, 'rb') as file:
+                salts.append((os.path.splitext(os.path.basename(salt_file))[0], file.read()))
+
+        self.connection.executemany("INSERT OR IGNORE INTO `keys` (`uid`, `salt`) VALUES (?, ?);", salts)
+        if commit:
+            self.connection.commit()
+        return len(salts)
+
+    def get(self, uid: str) -> tuple:
+        """
+        looks up the salt of a user
+        :param uid: user id
+        :return: (salt, KDF hash name, KDF iterations) tuple, the KDF parameters are None for imported salts;
+        None if the uid has no salt
+        """
+        row = self.connection.execute(
+            "SELECT `salt`, `kdf_hash`, `kdf_iterations` FROM `keys` WHERE `uid` = ?;", (str(uid),)).fetchone()
+        if row is None:
+            return None
+        return bytes(row[0]), row[1], row[2]
+
+    def contains(self, uid: str) -> bool:
+        """
+        :param uid: user id
+        :return: boolean value depending on the uid having a salt
+        """
+        return self.connection.execute("SELECT 1 FROM `keys` WHERE `uid` = ?;", (str(uid),)).fetchone() is not None
+
+    def put(self, uid: str, salt: bytes, hash_name: str = None, iterations: int = None) -> None:
+        """
+        stores the salt of a user, replacing an existing one
+        :param uid: user id
+        :param salt: salt bytes
+        :param hash_name: PBKDF2 hash the user's keys are derived with
+        :param iterations: PBKDF2 iteration count the user's keys are derived with
+        """
+        with self.connection as connection:
+            connection.execute("INSERT OR REPLACE INTO `keys` (`uid`, `salt`, `kdf_hash`, `kdf_iterations`) "
+                               "VALUES (?, ?, ?, ?);", (str(uid), bytes(salt), hash_name, iterations))
+
+    def __len__(self) -> int:
+        return self.connection.execute("SELECT COUNT(*) FROM `keys`;").fetchone()[0]
+
+    def close(self) -> None:
+        """closes the calling thread's connection"""
+        connection = getattr(self.__local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self.__local.connection = None
@@ -3,7 +3,11 @@
 user data input and output
 progression_tracker_OOP_V2/main.py
 """
-from handler import DataHandler
+import sys
+import operations
+from importer import MarksImporter
+from daemon import DaemonServer, DaemonClient
+from metrics import Metrics
 from python_datalogger import DataLogger
 import click
 
@@ -35,12 +39,9 @@ def add_user(name, password, database) -> None:
     :param database: local or foreign [l/f]
     """
     try:
-        user = DataHandler(name=name, password=password, database=databases[database])
-        print(user.get_user_data())
-        if user.authentication:
-            print("\nSuccess !\n")
-        else:
-            print("\nCannot add user \nusername already exists !\n")
+        args = {"name": name, "password": password, "database": databases[database]}
+        output = DaemonClient.forward("add_user", **args)
+        print(output if output is not None else operations.add_user(**args))
 
     except Exception as error:
         data_logger.log_critical(f"{error}")
@@ -65,16 +66,10 @@ def add_marks(name: str, pass_marks: int, defer_marks: int, fail_marks: int, pas
     :param database: local or foreign [l/f]
     """
     try:
-        user = DataHandler(name=name, pass_marks=pass_marks, defer_marks=defer_marks, fail_marks=fail_marks,
-                           password=password, database=databases[database])
-        entry = user.data_entry()
-        if len(entry) == 1:
-            if not entry[0]:
-                print("\nRecheck your inputs !\n")
-            else:
-                print("\nIncorrect password !\n")
-        else:
-            print(f"\n{entry}\nEntry successful !\n")
+        args = {"name": name, "pass_marks": pass_marks, "defer_marks": defer_marks, "fail_marks": fail_marks,
+                "password": password, "database": databases[database]}
+        output = DaemonClient.forward("add_marks", **args)
+        print(output if output is not None else operations.add_marks(**args))
 
     except Exception as error:
         data_logger.log_critical(f"{error}")
@@ -84,38 +79,166 @@ def add_marks(name: str, pass_marks: int, defer_marks: int, fail_marks: int, pas
 @click.option("--name", "-n", prompt="Enter your name", help="Name of the user", type=str, required=True)
 @click.option("--password", "-pw", prompt="Enter your password", help="user password",
               type=str, required=False, default=None)
+@click.option("--cached", "-c", is_flag=True, help="serve from the encrypted data bin when it is up-to-date")
+@click.option("--last", "-l", help="only output the most recent entries", type=click.IntRange(min=0),
+              required=False, default=None)
+@click.option("--limit", help="maximum number of entries", type=click.IntRange(min=0), required=False, default=None)
+@click.option("--offset", help="number of leading entries to skip", type=click.IntRange(min=0), default=0)
+@click.option("--since", "-s", help="only entries made at or after this time", type=click.DateTime(),
+              required=False, default=None)
 @click.argument("database", type=click.Choice(list(databases.keys())), default="l", required=False)
-def get_progress(name, password, database) -> None:
+def get_progress(name, password, cached, last, limit, offset, since, database) -> None:
     """
     outputs the stored user progression data
     :param name: username
     :param password: user password
+    :param cached: serve from the encrypted data bin when it is up-to-date
+    :param last: only output the most recent entries
+    :param limit: maximum number of entries
+    :param offset: number of leading entries to skip
+    :param since: only entries made at or after this time
     :param database: local or foreign [l/f]
     :return: string of user progression data
     """
     # TODO: Non existing user entries keep generating bin files
     try:
-        user = DataHandler(name=name, password=password, database=databases[database])
-        progress_data = user.get_output()
-        if progress_data is None:
-            print(f"\nIncorrect password !\n")
+        args = {"name": name, "password": password, "cached": cached, "last": last, "limit": limit,
+                "offset": offset, "since": since.timestamp() if since is not None else None,
+                "database": databases[database]}
+        output = DaemonClient.forward("get_progress", **args)
+        if output is not None:
+            print(output)
         else:
-            print(f"{progress_data}\n\n")
+            # written as it is read, the report is never held in memory as a whole
+            for chunk in operations.stream_progress(**args):
+                sys.stdout.write(chunk)
+            print()
+
+    except Exception as error:
+        data_logger.log_critical(f"{error}")
+
+
+@click.command()
+@click.option("--recompute", "-r", is_flag=True, help="rebuild the summary from all user data entries")
+@click.option("--check", "-c", is_flag=True, help="verify the summary against a full recomputation")
+@click.argument("database", type=click.Choice(list(databases.keys())), default="l", required=False)
+def get_stats(recompute: bool, check: bool, database: str) -> None:
+    """
+    gets the statistics of all user progression data
+    :param recompute: rebuild the summary from all user data entries
+    :param check: verify the summary against a full recomputation
+    :param database: local or foreign [l/f]
+    """
+    try:
+        args = {"recompute": recompute, "check": check, "database": databases[database]}
+        output = DaemonClient.forward("get_stats", **args)
+        print(output if output is not None else operations.get_stats(**args))
 
     except Exception as error:
         data_logger.log_critical(f"{error}")
 
 
 @click.command()
-def get_stats() -> None:
-    """gets the statistics of all user progression data"""
-    print(f"\nI'm still working on this function.\n")
+@click.argument("file_path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--batch_size", "-b", help="rows committed per transaction", type=int, default=500, show_default=True)
+@click.argument("database", type=click.Choice(list(databases.keys())), default="l", required=False)
+def import_marks(file_path: str, batch_size: int, database: str) -> None:
+    """
+    imports user data entries in bulk from a csv or jsonl file
+    :param file_path: csv (name,pass_marks,defer_marks,fail_marks header) or jsonl file
+    :param batch_size: rows committed per transaction
+    :param database: local or foreign [l/f]
+    """
+    try:
+        with MarksImporter(file_path=file_path, batch_size=batch_size, database=databases[database]) as importer:
+            importer.import_file()
+
+        for line_no, reason in sorted(importer.rejected):
+            print(f"line {line_no}: {reason}")
+        print(f"\n{importer.inserted} rows imported, {len(importer.rejected)} rejected "
+              f"in {importer.elapsed:.2f} seconds ({importer.rate:.1f} rows/sec).\n")
+
+    except Exception as error:
+        data_logger.log_critical(f"{error}")
+
+
+@click.command()
+@click.option("--workers", "-w", help="worker processes (defaults to the number of cores)", type=int, default=None)
+@click.option("--since", "-s", help="only users with entries made at or after this time", type=click.DateTime(),
+              required=False, default=None)
+@click.argument("database", type=click.Choice(list(databases.keys())), default="l", required=False)
+def rebuild_snapshots(workers: int, since, database: str) -> None:
+    """
+    regenerates the encrypted progress data bins of the recently signed-in users in parallel, on the running
+    daemon, which holds their keys (other bins are rebuilt on their next cached read)
+    :param workers: worker processes
+    :param since: only users with entries made at or after this time
+    :param database: local or foreign [l/f]
+    """
+    try:
+        output = DaemonClient.forward("rebuild_snapshots", timeout=None, workers=workers,
+                                      since=since.timestamp() if since is not None else None,
+                                      database=databases[database])
+        if output is None:
+            output = ("\nrebuild-snapshots needs a running daemon (serve), data bin keys are only held by the "
+                      "process the users signed in to !\n")
+        print(output)
+
+    except Exception as error:
+        data_logger.log_critical(f"{error}")
+
+
+@click.command()
+@click.option("--socket", "-s", "socket_path", help="unix socket to listen on", type=click.Path(dir_okay=False),
+              default=DaemonServer.socket_path, show_default=True)
+def serve(socket_path: str) -> None:
+    """
+    keeps database connections and derived keys warm in one process and serves the other commands,
+    which forward to it while it is running
+    :param socket_path: unix socket to listen on
+    """
+    try:
+        DaemonServer(socket_path=socket_path).run()
+
+    except Exception as error:
+        data_logger.log_critical(f"{error}")
+
+
+@click.command()
+@click.option("--format", "-f", "output_format", type=click.Choice(["json", "prometheus"]), default="json",
+              show_default=True)
+@click.option("--output", "-o", help="file to write instead of printing", type=click.Path(dir_okay=False),
+              required=False, default=None)
+def metrics(output_format: str, output: str) -> None:
+    """
+    exports the timers and counters of the running daemon (started with PROGRESSION_METRICS=1),
+    single commands export theirs on exit to the file named by PROGRESSION_METRICS_FILE
+    :param output_format: json or prometheus
+    :param output: file to write instead of printing
+    """
+    try:
+        text = DaemonClient.forward("get_metrics", output_format=output_format)
+        if text is None:
+            text = f"\nNo daemon is running, set {Metrics.file_variable}=<file> to export the metrics of a command !\n"
+
+        if output is None:
+            print(text)
+        else:
+            with open(output, "w") as file:
+                file.write(text)
+
+    except Exception as error:
+        data_logger.log_critical(f"{error}")
 
 
 main_method.add_command(add_user)
 main_method.add_command(add_marks)
 main_method.add_command(get_progress)
 main_method.add_command(get_stats)
+main_method.add_command(import_marks)
+main_method.add_command(rebuild_snapshots)
+main_method.add_command(serve)
+main_method.add_command(metrics)
 
 if __name__ == "__main__":
     main_method()
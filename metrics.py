@@ -0,0 +1,205 @@
+"""
+#!/usr/bin/env python3
+in-process timers and counters of the hot paths
+progression_tracker_OOP_V2/metrics.py
+"""
+import os
+import json
+import time
+import atexit
+import threading
+from collections import deque
+
+
+class Histogram:
+    """
+    Latencies of one instrumented function, cumulative buckets for Prometheus and a window of recent samples
+    for percentiles.
+    """
+
+    # bucket upper bounds in nanoseconds, 10 us to 10 s
+    bounds = (10_000, 50_000, 100_000, 500_000, 1_000_000, 5_000_000, 10_000_000, 50_000_000, 100_000_000,
+              500_000_000, 1_000_000_000, 10_000_000_000)
+    window = 1024
+
+    def __init__(self):
+        self.count = 0
+        self.total_ns = 0
+        self.max_ns = 0
+        self.buckets = [0] * len(Histogram.bounds)
+        self.samples = deque(maxlen=Histogram.window)
+
+    def observe(self, elapsed_ns: int) -> None:
+        """
+        records a latency
+        :param elapsed_ns: latency in nanoseconds
+        """
+        self.count += 1
+        self.total_ns += elapsed_ns
+        self.max_ns = max(self.max_ns, elapsed_ns)
+        self.samples.append(elapsed_ns)
+        for index, bound in enumerate(Histogram.bounds):
+            if elapsed_ns <= bound:
+                self.buckets[index] += 1
+                break
+
+    def percentile(self, point: float) -> int:
+        """
+        nearest-rank percentile of the recent samples
+        :param point: percentile between 0 and 100
+        :return: latency in nanoseconds
+        """
+        ordered = sorted(self.samples)
+        if len(ordered) == 0:
+            return 0
+        return ordered[min(len(ordered) - 1, max(0, -int(-point * len(ordered) // 100) - 1))]
+
+    def snapshot(self) -> dict:
+        """
+        summarizes the histogram
+        :return: dictionary of count, mean, maximum and p50/p95/p99 latencies in microseconds
+        """
+        return {
+            "count": self.count,
+            "mean_us": round(self.total_ns / self.count / 1e3, 3) if self.count else 0.0,
+            "p50_us": round(self.percentile(50) / 1e3, 3),
+            "p95_us": round(self.percentile(95) / 1e3, 3),
+            "p99_us": round(self.percentile(99) / 1e3, 3),
+            "max_us": round(self.max_ns / 1e3, 3)
+        }
+
+
+class Metrics:
+    """
+    Process-wide instrumentation, off unless PROGRESSION_METRICS or PROGRESSION_METRICS_FILE is set
+    when the process starts. When off, timed functions are not wrapped and counters return after a single check.
+    """
+
+    enable_variable = "PROGRESSION_METRICS"
+    file_variable = "PROGRESSION_METRICS_FILE"
+    prefix = "progression"
+
+    enabled = bool(os.environ.get(enable_variable) or os.environ.get(file_variable))
+    __lock = threading.Lock()
+    __counters = {}
+    __histograms = {}
+
+    @classmethod
+    def reset(cls) -> None:
+        """forgets every collected value"""
+        with cls.__lock:
+            cls.__counters.clear()
+            cls.__histograms.clear()
+
+    @classmethod
+    def count(cls, name: str, value: int = 1) -> None:
+        """
+        increments a counter
+        :param name: counter name
+        :param value: increment
+        """
+        if not cls.enabled:
+            return
+
+        with cls.__lock:
+            cls.__counters[name] = cls.__counters.get(name, 0) + value
+
+    @classmethod
+    def observe(cls, name: str, elapsed_ns: int) -> None:
+        """
+        records the latency of a function call
+        :param name: function name
+        :param elapsed_ns: latency in nanoseconds
+        """
+        with cls.__lock:
+            histogram = cls.__histograms.get(name)
+            if histogram is None:
+                histogram = cls.__histograms[name] = Histogram()
+            histogram.observe(elapsed_ns)
+
+    @classmethod
+    def snapshot(cls) -> dict:
+        """
+        copies the collected values
+        :return: {"counters": {name: value}, "timers": {function: summary}} dictionary
+        """
+        with cls.__lock:
+            return {
+                "created": time.time(),
+                "counters": dict(sorted(cls.__counters.items())),
+                "timers": {name: histogram.snapshot() for name, histogram in sorted(cls.__histograms.items())}
+            }
+
+    @classmethod
+    def to_json(cls) -> str:
+        """
+        :return: JSON snapshot of the collected values
+        """
+        return json.dumps(cls.snapshot(), indent=2)
+
+    @classmethod
+    def to_prometheus(cls) -> str:
+        """
+        :return: Prometheus text exposition of the collected values
+        """
+        lines = []
+        with cls.__lock:
+            for name, value in sorted(cls.__counters.items()):
+                lines.append(f"# TYPE {cls.prefix}_{name}_total counter")
+                lines.append(f"{cls.prefix}_{name}_total {value}")
+
+            histograms = sorted(cls.__histograms.items())
+            duration = f"{cls.prefix}_call_duration_seconds"
+            lines.append(f"# TYPE {duration} histogram")
+            for name, histogram in histograms:
+                cumulative = 0
+                for bound, bucket in zip(Histogram.bounds, histogram.buckets):
+                    cumulative += bucket
+                    lines.append(f'{duration}_bucket{{function="{name}",le="{bound / 1e9:g}"}} {cumulative}')
+                lines.append(f'{duration}_bucket{{function="{name}",le="+Inf"}} {histogram.count}')
+                lines.append(f'{duration}_sum{{function="{name}"}} {histogram.total_ns / 1e9:.9f}')
+                lines.append(f'{duration}_count{{function="{name}"}} {histogram.count}')
+
+            latency = f"{cls.prefix}_call_latency_seconds"
+            lines.append(f"# TYPE {latency} summary")
+            for name, histogram in histograms:
+                for point in (50, 95, 99):
+                    lines.append(f'{latency}{{function="{name}",quantile="{point / 100:g}"}} '
+                                 f'{histogram.percentile(point) / 1e9:.9f}')
+                lines.append(f'{latency}_sum{{function="{name}"}} {histogram.total_ns / 1e9:.9f}')
+                lines.append(f'{latency}_count{{function="{name}"}} {histogram.count}')
+
+        return "\n".join(lines) + "\n"
+
+    @classmethod
+    def export(cls, output_format: str = "json") -> str:
+        """
+        :param output_format: json or prometheus
+        :return: collected values in the given format
+        """
+        if output_format == "prometheus":
+            return cls.to_prometheus()
+        elif output_format == "json":
+            return cls.to_json()
+        raise Exception(f"unknown metrics format -> {output_format}")
+
+    @classmethod
+    def write(cls, path: str) -> None:
+        """
+        writes the collected values to a file, Prometheus text for .prom files and JSON otherwise
+        :param path: path of the metrics file
+        """
+        temp_file = f"{path}.{os.getpid()}.tmp"
+        with open(temp_file, "w") as file:
+            file.write(cls.export("prometheus" if path.endswith(".prom") else "json"))
+        os.replace(temp_file, path)
+
+    @classmethod
+    def write_on_exit(cls) -> None:
+        """writes the metrics file named by PROGRESSION_METRICS_FILE, if any, when the process exits"""
+        path = os.environ.get(cls.file_variable)
+        if cls.enabled and path:
+            cls.write(path)
+
+
+atexit.register(Metrics.write_on_exit)
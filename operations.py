@@ -0,0 +1,161 @@
+"""
+#!/usr/bin/env python3
+user facing operations shared by the CLI and the daemon
+progression_tracker_OOP_V2/operations.py
+"""
+from handler import DataHandler
+from stats import ProgressionStats
+from metrics import Metrics
+
+
+def add_user(name: str, password: str, database: str = "local") -> str:
+    """
+    adds a new user
+    :param name: username
+    :param password: preferred password
+    :param database: local or foreign
+    :return: output text
+    """
+    with DataHandler(name=name, password=password, database=database) as user:
+        output = user.get_user_data() + "\n"
+        if user.authentication:
+            output = output + "\nSuccess !\n"
+        else:
+            output = output + "\nCannot add user \nusername already exists !\n"
+
+    return output
+
+
+def add_marks(name: str, pass_marks: int, defer_marks: int, fail_marks: int, password: str,
+              database: str = "local") -> str:
+    """
+    add new user data entries to the database
+    :param name: username
+    :param pass_marks: pass marks
+    :param defer_marks: defer marks
+    :param fail_marks: fail marks
+    :param password: user password
+    :param database: local or foreign
+    :return: output text
+    """
+    with DataHandler(name=name, pass_marks=pass_marks, defer_marks=defer_marks, fail_marks=fail_marks,
+                     password=password, database=database) as user:
+        entry = user.data_entry()
+
+    if len(entry) == 1:
+        if not entry[0]:
+            return "\nRecheck your inputs !\n"
+        else:
+            return "\nIncorrect password !\n"
+    else:
+        return f"\n{entry}\nEntry successful !\n"
+
+
+def stream_progress(name: str, password: str, cached: bool = False, last: int = None, limit: int = None,
+                    offset: int = 0, since: float = None, database: str = "local"):
+    """
+    lazily outputs the stored user progression data
+    :param name: username
+    :param password: user password
+    :param cached: serve from the encrypted data bin when it is up-to-date
+    :param last: only output the most recent entries
+    :param limit: maximum number of entries
+    :param offset: number of leading entries to skip
+    :param since: only entries made at or after this time
+    :param database: local or foreign
+    :return: generator of output text chunks
+    """
+    with DataHandler(name=name, password=password, database=database) as user:
+        if not user.authentication:
+            yield "\nIncorrect password !\n"
+            return
+
+        yield from user.stream_progress(use_snapshot=cached, last=last, limit=limit, offset=offset, since=since)
+        yield "\n\n"
+
+
+def get_progress(name: str, password: str, cached: bool = False, last: int = None, limit: int = None,
+                 offset: int = 0, since: float = None, database: str = "local") -> str:
+    """
+    outputs the stored user progression data
+    :param name: username
+    :param password: user password
+    :param cached: serve from the encrypted data bin when it is up-to-date
+    :param last: only output the most recent entries
+    :param limit: maximum number of entries
+    :param offset: number of leading entries to skip
+    :param since: only entries made at or after this time
+    :param database: local or foreign
+    :return: output text
+    """
+    return "".join(stream_progress(name=name, password=password, cached=cached, last=last, limit=limit,
+                                   offset=offset, since=since, database=database))
+
+
+def get_stats(recompute: bool = False, check: bool = False, database: str = "local") -> str:
+    """
+    gets the statistics of all user progression data
+    :param recompute: rebuild the summary from all user data entries
+    :param check: verify the summary against a full recomputation
+    :param database: local or foreign
+    :return: output text
+    """
+    with ProgressionStats(database=database) as stats:
+        if recompute:
+            stats.recompute()
+
+        output = f"{stats.generate_str()}\n"
+
+        if check:
+            mismatches = stats.check_consistency()
+            for mismatch in mismatches:
+                output = output + f"\n{mismatch}"
+            if len(mismatches) == 0:
+                output = output + "\n\nSummary is consistent !\n"
+            else:
+                output = output + "\n\nSummary is inconsistent, rerun with --recompute !\n"
+
+    return output
+
+
+def rebuild_snapshots(workers: int = None, since: float = None, database: str = "local") -> str:
+    """
+    regenerates the encrypted progress data bins of the users whose keys this process holds
+    :param workers: worker processes, None for the number of cores
+    :param since: only users with entries made at or after this time
+    :param database: local or foreign
+    :return: output text
+    """
+    from snapshots import SnapshotBuilder
+
+    DataHandler.init_env()
+    with SnapshotBuilder(workers=workers, database=database) as builder:
+        builder.rebuild(since=since)
+
+    output = "".join(f"{uid}: {reason}\n" for uid, reason in builder.failed)
+    return output + (f"\n{builder.built} data bins rebuilt, {len(builder.failed)} failed, {len(builder.skipped)} "
+                     f"skipped (not signed in recently) in {builder.elapsed:.2f} seconds with {builder.workers} "
+                     f"workers ({builder.rate:.1f} bins/sec).\n")
+
+
+def get_metrics(output_format: str = "json") -> str:
+    """
+    exports the timers and counters collected by this process
+    :param output_format: json or prometheus
+    :return: output text
+    """
+    if not Metrics.enabled:
+        return f"\nMetrics are disabled, set {Metrics.enable_variable}=1 to collect them !\n"
+
+    return Metrics.export(output_format)
+
+
+# operations that can be forwarded to the daemon
+registry = {
+    "add_user": add_user,
+    "add_marks": add_marks,
+    "get_progress": get_progress,
+    "get_stats": get_stats,
+    "rebuild_snapshots": rebuild_snapshots,
+    "get_metrics": get_metrics
+}
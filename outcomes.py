@@ -0,0 +1,150 @@
+"""
+#!/usr/bin/env python3
+precomputed mark validity and progression outcomes
+progression_tracker_OOP_V2/outcomes.py
+"""
+from array import array
+from validator import DataValidator
+
+
+class OutcomeTable:
+    """
+    Validity and outcome of every (pass, defer, fail) triple of the valid mark range, computed once per process.
+    Outcome codes are the keys of DataHandler.progress_values, 0 marks an invalid triple.
+    """
+
+    step = DataValidator.valid_range[1] - DataValidator.valid_range[0]
+    total = 120
+    width = len(DataValidator.valid_range)
+    __codes = None
+    __numpy = None
+    __numpy_codes = None
+
+    @staticmethod
+    def calculate(pass_marks: int, fail_marks: int) -> int:
+        """
+        calculate the outcome of a validated set of marks
+        :param pass_marks: pass marks
+        :param fail_marks: fail marks
+        :return: outcome code
+        """
+        if pass_marks >= 100:
+            if pass_marks == 120:
+                return 1
+            else:
+                return 2
+
+        elif fail_marks >= 80:
+            return 4
+        else:
+            return 3
+
+    @classmethod
+    def codes(cls) -> array:
+        """
+        the outcome code of every triple, indexed by OutcomeTable.index
+        :return: array of width ** 3 unsigned bytes
+        """
+        if cls.__codes is None:
+            codes = array('B', bytes(cls.width ** 3))
+            for pass_marks in DataValidator.valid_range:
+                for defer_marks in DataValidator.valid_range:
+                    fail_marks = cls.total - pass_marks - defer_marks
+                    if fail_marks in DataValidator.valid_range:
+                        codes[cls.index(pass_marks, defer_marks, fail_marks)] = cls.calculate(pass_marks, fail_marks)
+            cls.__codes = codes
+
+        return cls.__codes
+
+    @classmethod
+    def valid_triples(cls) -> list:
+        """
+        every valid triple with its outcome code
+        :return: list of (pass marks, defer marks, fail marks, outcome code) tuples
+        """
+        codes = cls.codes()
+        return [(pass_marks, defer_marks, fail_marks, codes[cls.index(pass_marks, defer_marks, fail_marks)])
+                for pass_marks in DataValidator.valid_range
+                for defer_marks in DataValidator.valid_range
+                for fail_marks in DataValidator.valid_range
+                if codes[cls.index(pass_marks, defer_marks, fail_marks)] != 0]
+
+    @classmethod
+    def index(cls, pass_marks: int, defer_marks: int, fail_marks: int) -> int:
+        """
+        position of a triple in the table
+        :return: table index, -1 if a mark is not an integer of the valid range
+        """
+        position = 0
+        for mark in (pass_marks, defer_marks, fail_marks):
+            if not isinstance(mark, int) or mark < 0 or mark > cls.total or mark % cls.step != 0:
+                return -1
+            position = position * cls.width + mark // cls.step
+
+        return position
+
+    @classmethod
+    def outcome(cls, pass_marks: int, defer_marks: int, fail_marks: int) -> int:
+        """
+        looks up the outcome of a single triple
+        :return: outcome code, 0 if the marks are invalid
+        """
+        position = cls.index(pass_marks, defer_marks, fail_marks)
+        return cls.codes()[position] if position >= 0 else 0
+
+    @classmethod
+    def numpy(cls) -> any:
+        """
+        the numpy module if it is installed, imported on first use
+        :return: numpy module or None
+        """
+        if cls.__numpy is None:
+            try:
+                import numpy
+                cls.__numpy = numpy
+                cls.__numpy_codes = numpy.frombuffer(cls.codes().tobytes(), dtype=numpy.uint8)
+            except ImportError:
+                cls.__numpy = False
+
+        return cls.__numpy or None
+
+    @classmethod
+    def classify(cls, pass_marks, defer_marks, fail_marks, use_numpy: bool = True) -> tuple:
+        """
+        classifies columns of marks in one pass
+        :param pass_marks: sequence of pass marks
+        :param defer_marks: sequence of defer marks
+        :param fail_marks: sequence of fail marks
+        :param use_numpy: use numpy when it is installed
+        :return: (validity mask, outcome codes) pair, numpy bool/uint8 arrays with numpy, otherwise (or when a
+        mark is not a 64 bit integer) array('B')s
+        """
+        numpy = cls.numpy() if use_numpy else None
+        columns = None
+
+        if numpy is not None:
+            try:
+                columns = [numpy.asarray(marks, dtype=numpy.int64) for marks in (pass_marks, defer_marks, fail_marks)]
+            except (OverflowError, TypeError, ValueError):
+                # marks that are not 64 bit integers are invalid, the table lookup below marks them as such
+                columns = None
+
+        if columns is not None:
+            valid = numpy.ones(columns[0].shape, dtype=bool)
+            positions = numpy.zeros(columns[0].shape, dtype=numpy.int64)
+
+            for marks in columns:
+                valid &= (marks >= 0) & (marks <= cls.total) & (marks % cls.step == 0)
+                positions = positions * cls.width + marks // cls.step
+
+            codes = numpy.where(valid, cls.__numpy_codes[numpy.where(valid, positions, 0)], 0).astype(numpy.uint8)
+            return codes != 0, codes
+
+        table = cls.codes()
+        codes = array('B', bytes(len(pass_marks)))
+        for row, marks in enumerate(zip(pass_marks, defer_marks, fail_marks)):
+            position = cls.index(*marks)
+            if position >= 0:
+                codes[row] = table[position]
+
+        return array('B', [code != 0 for code in codes]), codes
@@ -0,0 +1,169 @@
+"""
+#!/usr/bin/env python3
+password hashing and verification
+progression_tracker_OOP_V2/passwords.py
+"""
+import os
+import hmac
+import base64
+import importlib
+from metrics import Metrics
+from decorators import timer
+
+
+class PasswordVerifier:
+    """
+    Base of the password hash schemes, stored credentials are encoded as <scheme>$<cost>$<salt>$<digest>.
+    The cost is the single tuning knob of a scheme, higher costs are slower to verify and to brute force.
+    """
+
+    scheme = None
+    default_cost = None
+    salt_size = 16
+    digest_size = 32
+
+    def __init__(self, cost: int = None):
+        self.cost = self.default_cost if cost is None else int(cost)
+
+    def derive(self, password: str, salt: bytes, cost: int) -> bytes:
+        """
+        derives the digest of a password
+        :param password: plaintext password
+        :param salt: salt bytes
+        :param cost: cost of the scheme
+        :return: digest bytes
+        """
+        raise NotImplementedError
+
+    def hash(self, password: str) -> str:
+        """
+        hashes a password with a fresh salt at the verifier's cost
+        :param password: plaintext password
+        :return: encoded credential
+        """
+        salt = os.urandom(self.salt_size)
+        digest = self.derive(password, salt, self.cost)
+        return "$".join((self.scheme, str(self.cost), base64.b64encode(salt).decode(),
+                         base64.b64encode(digest).decode()))
+
+    def verify(self, password: str, cost: int, salt: bytes, digest: bytes) -> bool:
+        """
+        checks a password against a decoded credential of this scheme
+        :param password: plaintext password
+        :param cost: cost the credential was hashed with
+        :param salt: salt of the credential
+        :param digest: digest of the credential
+        :return: boolean value depending on the password matching
+        """
+        return hmac.compare_digest(self.derive(password, salt, cost), digest)
+
+
+class PBKDF2Verifier(PasswordVerifier):
+    """PBKDF2-HMAC-SHA256, the cost is the iteration count."""
+
+    scheme = "pbkdf2-sha256"
+    default_cost = 600_000
+
+    def derive(self, password: str, salt: bytes, cost: int) -> bytes:
+        from Crypto.Protocol.KDF import PBKDF2
+        hash_module = importlib.import_module("Crypto.Hash.SHA256")
+        return PBKDF2(password, salt, dkLen=self.digest_size, count=cost, hmac_hash_module=hash_module)
+
+
+class ScryptVerifier(PasswordVerifier):
+    """scrypt with r=8 and p=1, the cost is log2 of N (14 -> 16 MiB of memory per verification)."""
+
+    scheme = "scrypt"
+    default_cost = 14
+    block_size = 8
+    parallelization = 1
+
+    def derive(self, password: str, salt: bytes, cost: int) -> bytes:
+        from Crypto.Protocol.KDF import scrypt
+        return scrypt(password, salt, key_len=self.digest_size, N=1 << cost, r=self.block_size,
+                      p=self.parallelization)
+
+
+class PasswordHasher:
+    """
+    Hashes new credentials with the configured verifier and checks stored credentials against any known scheme.
+    Credentials stored before hashing (plaintext) still verify and are reported as needing a rehash,
+    as are credentials of another scheme or cost.
+    The scheme and cost are read from PROGRESSION_PASSWORD_SCHEME and PROGRESSION_PASSWORD_COST on startup.
+    """
+
+    scheme_variable = "PROGRESSION_PASSWORD_SCHEME"
+    cost_variable = "PROGRESSION_PASSWORD_COST"
+    verifiers = {verifier.scheme: verifier for verifier in (ScryptVerifier, PBKDF2Verifier)}
+
+    current = None
+
+    @classmethod
+    def configure(cls, scheme: str = ScryptVerifier.scheme, cost: int = None) -> PasswordVerifier:
+        """
+        selects the verifier new credentials are hashed with
+        :param scheme: scheme name (scrypt or pbkdf2-sha256)
+        :param cost: cost of the scheme, None for its default
+        :return: the selected verifier
+        """
+        if scheme not in cls.verifiers:
+            raise Exception(f"unknown password scheme -> {scheme}")
+
+        cls.current = cls.verifiers[scheme](cost)
+        return cls.current
+
+    @classmethod
+    def decode(cls, credential: str) -> tuple:
+        """
+        splits a stored credential
+        :param credential: stored credential
+        :return: (verifier, cost, salt, digest) tuple, None for plaintext credentials
+        """
+        parts = credential.split("$")
+        if len(parts) != 4 or parts[0] not in cls.verifiers:
+            return None
+
+        try:
+            return (cls.verifiers[parts[0]](), int(parts[1]), base64.b64decode(parts[2], validate=True),
+                    base64.b64decode(parts[3], validate=True))
+        except ValueError:
+            return None
+
+    @classmethod
+    def is_hashed(cls, credential: str) -> bool:
+        """
+        :param credential: stored credential
+        :return: boolean value depending on the credential being a password hash
+        """
+        return cls.decode(credential) is not None
+
+    @classmethod
+    def hash(cls, password: str) -> str:
+        """
+        :param password: plaintext password
+        :return: credential encoded with the configured verifier
+        """
+        return cls.current.hash(password)
+
+    @classmethod
+    @timer
+    def verify(cls, password: str, credential: str) -> tuple:
+        """
+        checks a password against a stored credential
+        :param password: plaintext password
+        :param credential: stored credential
+        :return: (match, needs rehash) pair
+        """
+        Metrics.count("password_verifications")
+        decoded = cls.decode(credential)
+
+        if decoded is None:
+            return hmac.compare_digest(password.encode(), credential.encode()), True
+
+        verifier, cost, salt, digest = decoded
+        return (verifier.verify(password, cost, salt, digest),
+                (verifier.scheme, cost) != (cls.current.scheme, cls.current.cost))
+
+
+PasswordHasher.configure(os.environ.get(PasswordHasher.scheme_variable, ScryptVerifier.scheme),
+                         os.environ.get(PasswordHasher.cost_variable))
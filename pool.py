@@ -0,0 +1,286 @@
+"""
+#!/usr/bin/env python3
+Backend database connection pooling
+progression_tracker_OOP_V2/pool.py
+"""
+import time
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from collections import OrderedDict
+from decorators import shared_logger
+
+
+class PoolTimeoutError(Exception):
+    """raised when no pooled connection becomes available within the checkout timeout"""
+
+
+class StatementCache:
+    """
+    Least recently used cache of prepared statement cursors for a single connection
+    """
+
+    def __init__(self, connection: any, backend: str = "sqlite", size: int = 64):
+        self.__connection = connection
+        self.__backend = backend
+        self.__size = size
+        self.__cursors = OrderedDict()
+
+    @property
+    def size(self) -> int:
+        return self.__size
+
+    def cursor(self, sql: str) -> any:
+        """
+        returns the cursor holding the prepared statement of a query, preparing it on a cache miss
+        :param sql: placeholder (?) SQL query
+        :return: cursor bound to the query
+        """
+        if sql in self.__cursors:
+            self.__cursors.move_to_end(sql)
+            return self.__cursors[sql]
+
+        if self.__backend == "mariadb":
+            cursor = self.__connection.cursor(prepared=True)
+        else:
+            cursor = self.__connection.cursor()
+
+        self.__cursors[sql] = cursor
+        if len(self.__cursors) > self.__size:
+            _, evicted = self.__cursors.popitem(last=False)
+            evicted.close()
+
+        return cursor
+
+    def clear(self) -> None:
+        """closes and forgets all the cached statements"""
+        for cursor in self.__cursors.values():
+            cursor.close()
+        self.__cursors.clear()
+
+    def __len__(self) -> int:
+        return len(self.__cursors)
+
+
+class PooledConnection:
+    """
+    A database connection owned by a ConnectionPool together with its prepared statement cache
+    """
+
+    def __init__(self, connection: any, backend: str, cache_size: int = 64):
+        self.connection = connection
+        self.backend = backend
+        self.statements = StatementCache(connection, backend=backend, size=cache_size)
+        self.checked_out = False
+        # open QueryData.transaction() blocks, kept with the connection as the QueryData of a thread share it
+        self.transaction_depth = 0
+
+    def close(self) -> None:
+        """closes the cached statements and the underlying connection"""
+        try:
+            self.statements.clear()
+            self.connection.close()
+        except Exception:
+            pass
+
+
+class ConnectionPool:
+    """
+    Process-wide pool of database connections.
+    mariadb connections are shared across threads through a bounded pool,
+    sqlite falls back to one reused connection per thread.
+    """
+
+    __pools = {}
+    __pools_lock = threading.Lock()
+
+    def __init__(self, backend: str = "sqlite", size: int = 5, timeout: float = 10.0, cache_size: int = 64,
+                 pragmas: tuple = (), **connect_args):
+        self.__backend = backend
+        self.__size = size
+        self.__timeout = timeout
+        self.__cache_size = cache_size
+        self.__pragmas = tuple(pragmas)
+        self.__connect_args = connect_args
+        self.__idle = queue.LifoQueue()
+        self.__created = 0
+        self.__lock = threading.Lock()
+        self.__local = threading.local()
+        self.logger = shared_logger(name="PoolLogger", propagate=False)
+
+    @property
+    def backend(self) -> str:
+        return self.__backend
+
+    @property
+    def size(self) -> int:
+        return self.__size
+
+    @property
+    def pragmas(self) -> tuple:
+        """(name, value) pairs applied to every new sqlite connection"""
+        return self.__pragmas
+
+    @property
+    def created(self) -> int:
+        """number of open connections owned by the pool"""
+        return self.__created
+
+    @classmethod
+    def shared(cls, backend: str = "sqlite", size: int = 5, timeout: float = 10.0, cache_size: int = 64,
+               pragmas: tuple = (), **connect_args) -> "ConnectionPool":
+        """
+        returns the process-wide pool for a backend and connection arguments, creating it on first use
+        :param backend: sqlite or mariadb
+        :param size: maximum number of mariadb connections
+        :param timeout: seconds to wait for a free connection before raising PoolTimeoutError
+        :param cache_size: number of prepared statements kept per connection
+        :param pragmas: (name, value) pairs applied to every new sqlite connection
+        :param connect_args: arguments passed to sqlite3.connect / mariadb.connect
+        :return: shared ConnectionPool
+        """
+        key = (backend, tuple(pragmas), tuple(sorted(connect_args.items())))
+
+        with cls.__pools_lock:
+            if key not in cls.__pools:
+                cls.__pools[key] = cls(backend=backend, size=size, timeout=timeout, cache_size=cache_size,
+                                       pragmas=pragmas, **connect_args)
+            return cls.__pools[key]
+
+    @classmethod
+    def close_all(cls) -> None:
+        """closes every shared pool of the process"""
+        with cls.__pools_lock:
+            for pool in cls.__pools.values():
+                pool.close()
+            cls.__pools.clear()
+
+    def new_connection(self) -> PooledConnection:
+        """opens a new connection to the pool's database"""
+        if self.__backend == "mariadb":
+            import mariadb
+            connection = mariadb.connect(**self.__connect_args)
+        else:
+            connection = sqlite3.connect(cached_statements=self.__cache_size, **self.__connect_args)
+            for name, value in self.__pragmas:
+                connection.execute(f"PRAGMA {name} = {value};")
+
+        return PooledConnection(connection, backend=self.__backend, cache_size=self.__cache_size)
+
+    def healthy(self, pooled: PooledConnection) -> bool:
+        """
+        checks whether an idle connection is still usable
+        :param pooled: pooled connection
+        :return: boolean value of the connection's health
+        """
+        try:
+            if self.__backend == "mariadb":
+                pooled.connection.ping()
+            return True
+        except Exception as error:
+            self.logger.log_warning(f"Discarding unhealthy connection - {error}")
+            return False
+
+    def acquire(self) -> PooledConnection:
+        """
+        checks out a connection, waiting up to the pool timeout when all the connections are in use
+        :return: pooled connection
+        """
+        if self.__backend != "mariadb":
+            pooled = getattr(self.__local, "pooled", None)
+            if pooled is None:
+                pooled = self.new_connection()
+                self.__local.pooled = pooled
+            pooled.checked_out = True
+            return pooled
+
+        deadline = time.monotonic() + self.__timeout
+        while True:
+            try:
+                pooled = self.__idle.get_nowait()
+            except queue.Empty:
+                pooled = None
+
+            if pooled is None:
+                with self.__lock:
+                    create = self.__created < self.__size
+                    if create:
+                        self.__created += 1
+
+                if create:
+                    try:
+                        pooled = self.new_connection()
+                    except Exception:
+                        with self.__lock:
+                            self.__created -= 1
+                        raise
+                else:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise PoolTimeoutError(f"no connection available within {self.__timeout} seconds")
+                    try:
+                        pooled = self.__idle.get(timeout=remaining)
+                    except queue.Empty:
+                        raise PoolTimeoutError(f"no connection available within {self.__timeout} seconds") from None
+
+                    if not self.healthy(pooled):
+                        self.discard(pooled)
+                        continue
+
+            elif not self.healthy(pooled):
+                self.discard(pooled)
+                continue
+
+            pooled.checked_out = True
+            return pooled
+
+    def release(self, pooled: PooledConnection) -> None:
+        """
+        returns a checked out connection to the pool, discarding its uncommitted changes
+        :param pooled: pooled connection
+        """
+        if not pooled.checked_out:
+            return
+        pooled.checked_out = False
+
+        if self.__backend != "mariadb":
+            return
+
+        try:
+            pooled.connection.rollback()
+            self.__idle.put(pooled)
+        except Exception as error:
+            self.logger.log_warning(f"Discarding connection on release - {error}")
+            self.discard(pooled)
+
+    def discard(self, pooled: PooledConnection) -> None:
+        """closes a connection and frees its slot in the pool"""
+        pooled.close()
+        with self.__lock:
+            self.__created -= 1
+
+    @contextmanager
+    def connection(self):
+        """
+        context manager checking out a connection for the duration of a with block
+        :return: pooled connection
+        """
+        pooled = self.acquire()
+        try:
+            yield pooled
+        finally:
+            self.release(pooled)
+
+    def close(self) -> None:
+        """closes all the idle connections and the calling thread's sqlite connection"""
+        while True:
+            try:
+                self.discard(self.__idle.get_nowait())
+            except queue.Empty:
+                break
+
+        pooled = getattr(self.__local, "pooled", None)
+        if pooled is not None:
+            pooled.close()
+            self.__local.pooled = None
@@ -3,11 +3,13 @@
 Backend SQL query handler
 progression_tracker_OOP_V2/queries.py
 """
-import mariadb
-import sqlite3
-from python_datalogger import DataLogger
+import os
+from contextlib import contextmanager
+from pool import ConnectionPool, PoolTimeoutError
+from metrics import Metrics
+from decorators import shared_logger, timer
 
-env_logger = DataLogger(name="QueryInfoLogger", propagate=False)
+env_logger = shared_logger(name="QueryInfoLogger", propagate=False)
 
 
 class QueryData:
@@ -27,29 +29,334 @@ class QueryData:
         "database": "progression_db.db"
     }
 
-    def __init__(self, host: str = alt_query["host"], user: str = alt_query["user"],
-                 password: str = alt_query["password"], database: str = alt_query["database"],
-                 choice: str = "local", **kwargs):
+    # sqlite connection settings per deployment, pick one with sqlite_profile
+    # or the PROGRESSION_SQLITE_PROFILE environment variable.
+    # "default" keeps sqlite's rollback journal and a full fsync on every commit.
+    sqlite_profiles = {
+        "default": {},
+        "wal": {
+            "journal_mode": "WAL",
+            "synchronous": "NORMAL",
+            "cache_size": -16000,
+            "mmap_size": 268435456,
+            "busy_timeout": 5000,
+            "temp_store": "MEMORY"
+        },
+        "wal-durable": {
+            "journal_mode": "WAL",
+            "synchronous": "FULL",
+            "cache_size": -16000,
+            "mmap_size": 268435456,
+            "busy_timeout": 5000,
+            "temp_store": "MEMORY"
+        },
+        "fast": {
+            "journal_mode": "WAL",
+            "synchronous": "OFF",
+            "cache_size": -64000,
+            "mmap_size": 1073741824,
+            "busy_timeout": 5000,
+            "temp_store": "MEMORY"
+        }
+    }
+    sqlite_profile = os.environ.get("PROGRESSION_SQLITE_PROFILE", "wal")
+
+    # user identities read through this connection may be cached in-process, turn off when other processes
+    # write user rows of the same database (e.g. several writers sharing the mariadb database)
+    cache_identities = os.environ.get("PROGRESSION_IDENTITY_CACHE", "1") != "0"
+
+    # number of prepared statements kept per connection
+    statement_cache_size = 64
+
+    # mariadb connection pool size and seconds to wait for a free connection
+    pool_size = 5
+    pool_timeout = 10.0
 
-        self.logger = DataLogger(name="QueryLogger", propagate=False)
-        self.__host = host
-        self.__user = user
-        self.__password = password
-        self.__database = database
+    # databases whose tables were initialised by this process
+    __initialized = set()
+
+    # Ordered schema migrations, the schema version of a database is the number of migrations applied to it.
+    # Each migration holds the statements for both backends, sqlite tables are rebuilt since sqlite
+    # cannot alter keys or column types in place. A migration's "conflicts" query lists the rows its new keys
+    # would reject (e.g. users sharing a name), the migration is not applied while it returns any.
+    # MariaDB commits every DDL statement implicitly, so schema_version.step records the statements of the next
+    # migration already applied and an interrupted migration resumes after them instead of failing on them.
+    migrations = [
+        {
+            "description": "primary key on user_data.uid, unique user_data.name, indexed user_progression.uid "
+                           "and integer marks",
+            "conflicts": """
+                SELECT name, uid FROM `user_data`
+                WHERE name IN (SELECT name FROM `user_data` GROUP BY name HAVING COUNT(*) > 1)
+                OR uid IN (SELECT uid FROM `user_data` GROUP BY uid HAVING COUNT(*) > 1)
+                ORDER BY name, uid;
+                """,
+            "sqlite": [
+                """
+                CREATE TABLE `user_data_v1` (
+                `uid` CHAR(36) NOT NULL PRIMARY KEY ,
+                `name` VARCHAR(200) NOT NULL ,
+                `password` VARCHAR(300) NOT NULL);
+                """,
+                """
+                INSERT INTO `user_data_v1`
+                SELECT uid, name, password FROM `user_data` ORDER BY rowid;
+                """,
+                "DROP TABLE `user_data`;",
+                "ALTER TABLE `user_data_v1` RENAME TO `user_data`;",
+                "CREATE UNIQUE INDEX `idx_user_data_name` ON `user_data` (`name`);",
+                """
+                CREATE TABLE `user_progression_v1` (
+                `uid` CHAR(36) NOT NULL ,
+                `pass_marks` SMALLINT NOT NULL ,
+                `defer_marks` SMALLINT NOT NULL ,
+                `fail_marks` SMALLINT NOT NULL ,
+                `outcome` VARCHAR(20) NOT NULL);
+                """,
+                """
+                INSERT INTO `user_progression_v1`
+                SELECT uid, CAST(pass_marks AS INTEGER), CAST(defer_marks AS INTEGER),
+                CAST(fail_marks AS INTEGER), outcome
+                FROM `user_progression` ORDER BY rowid;
+                """,
+                "DROP TABLE `user_progression`;",
+                "ALTER TABLE `user_progression_v1` RENAME TO `user_progression`;",
+                "CREATE INDEX `idx_user_progression_uid` ON `user_progression` (`uid`);"
+            ],
+            "mariadb": [
+                """
+                ALTER TABLE `user_data`
+                MODIFY `uid` CHAR(36) NOT NULL ,
+                MODIFY `name` VARCHAR(200) NOT NULL ,
+                ADD PRIMARY KEY (`uid`) ,
+                ADD UNIQUE INDEX `idx_user_data_name` (`name`);
+                """,
+                """
+                ALTER TABLE `user_progression`
+                MODIFY `uid` CHAR(36) NOT NULL ,
+                MODIFY `pass_marks` SMALLINT NOT NULL ,
+                MODIFY `defer_marks` SMALLINT NOT NULL ,
+                MODIFY `fail_marks` SMALLINT NOT NULL ,
+                MODIFY `outcome` VARCHAR(20) NOT NULL ,
+                ADD INDEX `idx_user_progression_uid` (`uid`);
+                """
+            ]
+        },
+        {
+            "description": "singleton user_stats row rebuilt from user_progression",
+            "sqlite": [
+                """
+                CREATE TABLE `user_stats_v2` (
+                `id` TINYINT NOT NULL PRIMARY KEY CHECK (`id` = 1) ,
+                `progress` INT NOT NULL DEFAULT '0' ,
+                `trailing` INT NOT NULL DEFAULT '0' ,
+                `retriever` INT NOT NULL DEFAULT '0' ,
+                `exclude` INT NOT NULL DEFAULT '0');
+                """,
+                """
+                INSERT INTO `user_stats_v2`
+                SELECT 1,
+                COALESCE(SUM(CASE WHEN outcome = 'Progress' THEN 1 ELSE 0 END), 0),
+                COALESCE(SUM(CASE WHEN outcome = 'Trailing' THEN 1 ELSE 0 END), 0),
+                COALESCE(SUM(CASE WHEN outcome = 'Retriever' THEN 1 ELSE 0 END), 0),
+                COALESCE(SUM(CASE WHEN outcome = 'Exclude' THEN 1 ELSE 0 END), 0)
+                FROM `user_progression`;
+                """,
+                "DROP TABLE `user_stats`;",
+                "ALTER TABLE `user_stats_v2` RENAME TO `user_stats`;"
+            ],
+            "mariadb": [
+                """
+                CREATE TABLE `user_stats_v2` (
+                `id` TINYINT NOT NULL PRIMARY KEY CHECK (`id` = 1) ,
+                `progress` INT NOT NULL DEFAULT '0' ,
+                `trailing` INT NOT NULL DEFAULT '0' ,
+                `retriever` INT NOT NULL DEFAULT '0' ,
+                `exclude` INT NOT NULL DEFAULT '0');
+                """,
+                """
+                INSERT INTO `user_stats_v2`
+                SELECT 1,
+                COALESCE(SUM(CASE WHEN outcome = 'Progress' THEN 1 ELSE 0 END), 0),
+                COALESCE(SUM(CASE WHEN outcome = 'Trailing' THEN 1 ELSE 0 END), 0),
+                COALESCE(SUM(CASE WHEN outcome = 'Retriever' THEN 1 ELSE 0 END), 0),
+                COALESCE(SUM(CASE WHEN outcome = 'Exclude' THEN 1 ELSE 0 END), 0)
+                FROM `user_progression`;
+                """,
+                "DROP TABLE `user_stats`;",
+                "RENAME TABLE `user_stats_v2` TO `user_stats`;"
+            ]
+        },
+        {
+            "description": "progression_summary table holding entry counts per set of marks",
+            "sqlite": [
+                """
+                CREATE TABLE `progression_summary` (
+                `pass_marks` SMALLINT NOT NULL ,
+                `defer_marks` SMALLINT NOT NULL ,
+                `fail_marks` SMALLINT NOT NULL ,
+                `outcome` VARCHAR(20) NOT NULL ,
+                `entries` BIGINT NOT NULL DEFAULT '0' ,
+                PRIMARY KEY (`pass_marks`, `defer_marks`, `fail_marks`));
+                """,
+                """
+                INSERT INTO `progression_summary`
+                SELECT pass_marks, defer_marks, fail_marks, MIN(outcome), COUNT(*)
+                FROM `user_progression`
+                GROUP BY pass_marks, defer_marks, fail_marks;
+                """
+            ],
+            "mariadb": [
+                """
+                CREATE TABLE `progression_summary` (
+                `pass_marks` SMALLINT NOT NULL ,
+                `defer_marks` SMALLINT NOT NULL ,
+                `fail_marks` SMALLINT NOT NULL ,
+                `outcome` VARCHAR(20) NOT NULL ,
+                `entries` BIGINT NOT NULL DEFAULT '0' ,
+                PRIMARY KEY (`pass_marks`, `defer_marks`, `fail_marks`));
+                """,
+                """
+                INSERT INTO `progression_summary`
+                SELECT pass_marks, defer_marks, fail_marks, MIN(outcome), COUNT(*)
+                FROM `user_progression`
+                GROUP BY pass_marks, defer_marks, fail_marks;
+                """
+            ]
+        },
+        {
+            "description": "user_progression.entry_time, indexed with uid for the latest entry of a user",
+            "sqlite": [
+                "ALTER TABLE `user_progression` ADD COLUMN `entry_time` DOUBLE NOT NULL DEFAULT '0';",
+                "DROP INDEX `idx_user_progression_uid`;",
+                "CREATE INDEX `idx_user_progression_uid_time` ON `user_progression` (`uid`, `entry_time`);"
+            ],
+            "mariadb": [
+                """
+                ALTER TABLE `user_progression`
+                ADD COLUMN `entry_time` DOUBLE NOT NULL DEFAULT '0' ,
+                DROP INDEX `idx_user_progression_uid` ,
+                ADD INDEX `idx_user_progression_uid_time` (`uid`, `entry_time`);
+                """
+            ]
+        },
+        {
+            "description": "one byte marks and outcome codes (DataHandler.progress_values keys) instead of names",
+            "sqlite": [
+                """
+                CREATE TABLE `user_progression_v5` (
+                `uid` CHAR(36) NOT NULL ,
+                `pass_marks` TINYINT NOT NULL ,
+                `defer_marks` TINYINT NOT NULL ,
+                `fail_marks` TINYINT NOT NULL ,
+                `outcome` TINYINT NOT NULL ,
+                `entry_time` DOUBLE NOT NULL DEFAULT '0');
+                """,
+                """
+                INSERT INTO `user_progression_v5`
+                SELECT uid, pass_marks, defer_marks, fail_marks,
+                CASE outcome WHEN 'Progress' THEN 1 WHEN 'Trailing' THEN 2
+                WHEN 'Retriever' THEN 3 WHEN 'Exclude' THEN 4 ELSE 0 END, entry_time
+                FROM `user_progression` ORDER BY rowid;
+                """,
+                "DROP TABLE `user_progression`;",
+                "ALTER TABLE `user_progression_v5` RENAME TO `user_progression`;",
+                "CREATE INDEX `idx_user_progression_uid_time` ON `user_progression` (`uid`, `entry_time`);",
+                """
+                CREATE TABLE `progression_summary_v5` (
+                `pass_marks` TINYINT NOT NULL ,
+                `defer_marks` TINYINT NOT NULL ,
+                `fail_marks` TINYINT NOT NULL ,
+                `outcome` TINYINT NOT NULL ,
+                `entries` BIGINT NOT NULL DEFAULT '0' ,
+                PRIMARY KEY (`pass_marks`, `defer_marks`, `fail_marks`));
+                """,
+                """
+                INSERT INTO `progression_summary_v5`
+                SELECT pass_marks, defer_marks, fail_marks,
+                CASE outcome WHEN 'Progress' THEN 1 WHEN 'Trailing' THEN 2
+                WHEN 'Retriever' THEN 3 WHEN 'Exclude' THEN 4 ELSE 0 END, entries
+                FROM `progression_summary`;
+                """,
+                "DROP TABLE `progression_summary`;",
+                "ALTER TABLE `progression_summary_v5` RENAME TO `progression_summary`;"
+            ],
+            "mariadb": [
+                """
+                ALTER TABLE `user_progression`
+                ADD COLUMN `outcome_code` TINYINT UNSIGNED NOT NULL DEFAULT '0';
+                """,
+                """
+                UPDATE `user_progression` SET `outcome_code` =
+                CASE outcome WHEN 'Progress' THEN 1 WHEN 'Trailing' THEN 2
+                WHEN 'Retriever' THEN 3 WHEN 'Exclude' THEN 4 ELSE 0 END;
+                """,
+                """
+                ALTER TABLE `user_progression`
+                MODIFY `pass_marks` TINYINT UNSIGNED NOT NULL ,
+                MODIFY `defer_marks` TINYINT UNSIGNED NOT NULL ,
+                MODIFY `fail_marks` TINYINT UNSIGNED NOT NULL ,
+                DROP COLUMN `outcome` ,
+                CHANGE `outcome_code` `outcome` TINYINT UNSIGNED NOT NULL;
+                """,
+                """
+                ALTER TABLE `progression_summary`
+                ADD COLUMN `outcome_code` TINYINT UNSIGNED NOT NULL DEFAULT '0';
+                """,
+                """
+                UPDATE `progression_summary` SET `outcome_code` =
+                CASE outcome WHEN 'Progress' THEN 1 WHEN 'Trailing' THEN 2
+                WHEN 'Retriever' THEN 3 WHEN 'Exclude' THEN 4 ELSE 0 END;
+                """,
+                """
+                ALTER TABLE `progression_summary`
+                MODIFY `pass_marks` TINYINT UNSIGNED NOT NULL ,
+                MODIFY `defer_marks` TINYINT UNSIGNED NOT NULL ,
+                MODIFY `fail_marks` TINYINT UNSIGNED NOT NULL ,
+                DROP COLUMN `outcome` ,
+                CHANGE `outcome_code` `outcome` TINYINT UNSIGNED NOT NULL;
+                """
+            ]
+        }
+    ]
+
+    def __init__(self, host: str = None, user: str = None, password: str = None, database: str = None,
+                 choice: str = "local", local_database: str = local_db["database"], sqlite_profile: str = None,
+                 identity_cache: bool = None, **kwargs):
+
+        self.logger = shared_logger(name="QueryLogger", propagate=False)
+        # connection settings left out are read from alt_query when connecting, not when this module was loaded
+        self.__host = host if host is not None else QueryData.alt_query["host"]
+        self.__user = user if user is not None else QueryData.alt_query["user"]
+        self.__password = password if password is not None else QueryData.alt_query["password"]
+        self.__database = database if database is not None else QueryData.alt_query["database"]
         self.__choice = choice
-        self.connect = sqlite3.connect(QueryData.local_db["database"])
+        self.__backend = "sqlite"
+        self.__pool = None
+        self.__pooled = None
+        self.__identity_cache = QueryData.cache_identities if identity_cache is None else identity_cache
 
         env_logger.logger.propagate = True
         if self.choice != "local":
             try:
-                self.connect = mariadb.connect(
+                self.__pool = ConnectionPool.shared(
+                    backend="mariadb",
+                    size=QueryData.pool_size,
+                    timeout=QueryData.pool_timeout,
+                    cache_size=QueryData.statement_cache_size,
                     host=self.host,
                     user=self.user,
                     password=self.password,
                     database=self.database
                 )
+                self.__pooled = self.__pool.acquire()
+                self.__backend = "mariadb"
                 env_logger.log_info(f"Proceeding with [alternate] foreign database [mariadb].")
 
+            except PoolTimeoutError:
+                # the server is reachable but busy, falling back would write to the wrong database
+                raise
+
             except Exception as exception:
                 env_logger.log_error(str(exception))
                 env_logger.log_info("Proceeding with [default] local database [sqlite3].")
@@ -57,10 +364,37 @@ class QueryData:
         else:
             self.logger.log_info("Proceeding with [default] local database [sqlite3].")
 
+        if self.__pooled is None:
+            self.__pool = ConnectionPool.shared(backend="sqlite", cache_size=QueryData.statement_cache_size,
+                                                pragmas=QueryData.sqlite_pragmas(sqlite_profile),
+                                                database=local_database)
+            self.__pooled = self.__pool.acquire()
+
+        self.connect = self.__pooled.connection
+        self.statements = self.__pooled.statements
         self.cursor = self.connect.cursor()
-        self.init_tables()
+
+        self.__database_key = (self.backend, self.host, self.database) if self.backend == "mariadb" \
+            else (self.backend, os.path.abspath(local_database))
+        if self.__database_key not in QueryData.__initialized:
+            self.init_tables()
+            QueryData.__initialized.add(self.__database_key)
         super().__init__(**kwargs)
 
+    @staticmethod
+    def sqlite_pragmas(profile: str = None) -> tuple:
+        """
+        Looks up the pragmas of a sqlite profile
+        :param profile: name of a sqlite_profiles entry, QueryData.sqlite_profile if None
+        :return: tuple of (name, value) pairs
+        """
+        profile = profile if profile is not None else QueryData.sqlite_profile
+
+        if profile not in QueryData.sqlite_profiles:
+            raise Exception(f"Unknown sqlite profile -> {profile}, choose from {list(QueryData.sqlite_profiles)}")
+
+        return tuple(QueryData.sqlite_profiles[profile].items())
+
     @property
     def host(self) -> str:
         return self.__host
@@ -81,6 +415,21 @@ class QueryData:
     def choice(self) -> str:
         return self.__choice
 
+    @property
+    def database_key(self) -> tuple:
+        """identifies the connected database, (backend, host, database) or (backend, sqlite file path)"""
+        return self.__database_key
+
+    @property
+    def identity_cache(self) -> bool:
+        """whether user identities read through this connection may be cached in-process"""
+        return self.__identity_cache
+
+    @property
+    def backend(self) -> str:
+        """database engine in use (sqlite or mariadb), differs from choice if the foreign database is unreachable"""
+        return self.__backend
+
     @staticmethod
     def default_user_setup() -> str:
         """
@@ -114,6 +463,30 @@ class QueryData:
                 """
         # ENGINE = MyISAM;
 
+    @staticmethod
+    def default_schema_version_setup() -> str:
+        """
+        Query to initiate the schema_version table
+        :return: schema_version table SQL query
+        """
+        return """
+
+        CREATE TABLE IF NOT EXISTS `schema_version` (
+        `version` INT NOT NULL);
+                """
+
+    @staticmethod
+    def default_schema_step_setup() -> str:
+        """
+        Query to add the migration step column to the schema_version table (MariaDB only)
+        :return: schema_version step column SQL query
+        """
+        return """
+
+        ALTER TABLE `schema_version`
+        ADD COLUMN IF NOT EXISTS `step` INT NOT NULL DEFAULT '0';
+                """
+
     @staticmethod
     def default_user_statistics_setup() -> str:
         """
@@ -129,23 +502,157 @@ class QueryData:
         `exclude` INT(200) NOT NULL DEFAULT '0' ); 
                         """
 
-    def execute(self, func: any = None, output: bool = False) -> list:
+    @timer
+    def execute(self, func: any = None, output: bool = False, params: tuple = None, commit: bool = True) -> list:
         """
         Executes a SQL query based on user preference
-        :param func: Specific SQL query
+        :param func: Specific SQL query, or a (query, params) pair from a *_statement builder
         :param output: boolean value of output choice (True or False)
+        :param params: values bound to the query placeholders (?)
+        :param commit: commit after execution, set to False to group several queries in one transaction
         :return: if output is True, returns fetched results
         """
 
+        if isinstance(func, tuple):
+            func, params = func
+
         if func is not None:
-            self.cursor.execute(func)
-            self.connect.commit()
+            if params is None:
+                cursor = self.cursor
+                cursor.execute(func)
+            else:
+                cursor = self.statements.cursor(func)
+                cursor.execute(func, tuple(params))
+            if commit and self.__pooled.transaction_depth == 0:
+                self.connect.commit()
+            if Metrics.enabled:
+                # checked inline, every query of the process passes through here
+                Metrics.count("queries")
+                Metrics.count("commits", commit and self.__pooled.transaction_depth == 0)
             if output:
-                return self.cursor.fetchall()
+                rows = cursor.fetchall()
+                if Metrics.enabled:
+                    Metrics.count("rows_fetched", len(rows))
+                return rows
         else:
             self.logger.log_critical(f"param: func is not specified -> {func}")
             raise Exception(f"param: func is not specified -> {func}")
 
+    @timer
+    def execute_many(self, func: str = None, data: list = None, commit: bool = True) -> int:
+        """
+        Executes a placeholder (?) SQL query once for every set of values in data
+        :param func: Specific SQL query with placeholders
+        :param data: list of value tuples bound to the placeholders
+        :param commit: commit after execution, set to False to group several queries in one transaction
+        :return: number of value sets executed
+        """
+
+        if func is not None and data is not None:
+            if len(data) > 0:
+                self.statements.cursor(func).executemany(func, data)
+                Metrics.count("queries", len(data))
+            if commit and self.__pooled.transaction_depth == 0:
+                self.connect.commit()
+                Metrics.count("commits")
+            return len(data)
+        else:
+            self.logger.log_critical(f"params: func or data is not specified -> {func}")
+            raise Exception(f"params: func or data is not specified -> {func}")
+
+    def stream(self, func: any = None, params: tuple = None, size: int = 500):
+        """
+        Executes a SQL query on its own cursor and lazily yields its rows, fetching size rows at a time
+        :param func: Specific SQL query, or a (query, params) pair from a *_statement builder
+        :param params: values bound to the query placeholders (?)
+        :param size: rows fetched per round trip
+        :return: generator of rows
+        """
+
+        if isinstance(func, tuple):
+            func, params = func
+
+        if func is None:
+            self.logger.log_critical(f"param: func is not specified -> {func}")
+            raise Exception(f"param: func is not specified -> {func}")
+
+        cursor = self.connect.cursor()
+        try:
+            cursor.execute(func, tuple(params) if params is not None else ())
+            Metrics.count("queries")
+            while True:
+                rows = cursor.fetchmany(size)
+                if not rows:
+                    break
+                Metrics.count("rows_fetched", len(rows))
+                yield from rows
+        finally:
+            cursor.close()
+
+    @property
+    def in_transaction(self) -> bool:
+        """whether a transaction() block is open on this connection, by any QueryData sharing it"""
+        return self.__pooled.transaction_depth > 0
+
+    @contextmanager
+    def transaction(self, immediate: bool = False):
+        """
+        Unit of work, the queries executed inside the with block are committed once when the outermost block exits
+        and rolled back together if it raises. Nested blocks are savepoints that only roll back their own queries.
+        :param immediate: take sqlite's write lock when the unit of work begins (BEGIN IMMEDIATE) instead of at its
+        first write, so that no other writer commits between its reads and its writes
+        :return: QueryData
+        """
+        depth = self.__pooled.transaction_depth
+
+        if depth == 0:
+            if self.backend == "sqlite" and not self.connect.in_transaction:
+                self.cursor.execute("BEGIN IMMEDIATE;" if immediate else "BEGIN;")
+        else:
+            self.cursor.execute(f"SAVEPOINT sp_{depth};")
+
+        self.__pooled.transaction_depth += 1
+        try:
+            yield self
+
+        except BaseException:
+            self.__pooled.transaction_depth -= 1
+            if depth == 0:
+                self.connect.rollback()
+            else:
+                self.cursor.execute(f"ROLLBACK TO SAVEPOINT sp_{depth};")
+                self.cursor.execute(f"RELEASE SAVEPOINT sp_{depth};")
+            raise
+
+        self.__pooled.transaction_depth -= 1
+        if depth == 0:
+            self.connect.commit()
+            Metrics.count("commits")
+        else:
+            self.cursor.execute(f"RELEASE SAVEPOINT sp_{depth};")
+
+    def close(self) -> None:
+        """returns the borrowed connection to the pool"""
+        if self.__pooled is not None:
+            self.cursor.close()
+            self.__pool.release(self.__pooled)
+            self.__pooled = None
+
+    def __enter__(self) -> "QueryData":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def commit(self) -> None:
+        """commits the current transaction"""
+        self.connect.commit()
+        Metrics.count("commits")
+
+    def rollback(self) -> None:
+        """discards the current transaction"""
+        self.connect.rollback()
+
     def init_tables(self) -> None:
         """
         Initiates all the necessary data tables
@@ -154,6 +661,102 @@ class QueryData:
         self.cursor.execute(self.default_user_setup())
         self.cursor.execute(self.default_user_progression_setup())
         self.cursor.execute(self.default_user_statistics_setup())
+        self.cursor.execute(self.default_schema_version_setup())
+        if self.backend == "mariadb":
+            self.cursor.execute(self.default_schema_step_setup())
+        self.migrate()
+
+    def schema_version(self) -> int:
+        """
+        Reads the schema version of the connected database
+        :return: number of migrations applied
+        """
+        self.cursor.execute(self.read_all_queries(table_name='schema_version'))
+        sample_data = self.cursor.fetchall()
+
+        if len(sample_data) == 0:
+            return 0
+        return sample_data[0][0]
+
+    def migration_step(self) -> int:
+        """
+        Reads the number of statements of the next migration already applied to the connected database
+        :return: number of statements, always 0 on sqlite where a migration is applied in one transaction
+        """
+        if self.backend != "mariadb":
+            return 0
+
+        self.cursor.execute(self.read_user_data_fields(table_name='schema_version', columns='step'))
+        sample_data = self.cursor.fetchall()
+
+        if len(sample_data) == 0:
+            return 0
+        return sample_data[0][0]
+
+    def record_schema_version(self, version: int, step: int = 0) -> None:
+        """
+        Replaces the recorded schema version, the caller commits
+        :param version: number of migrations applied
+        :param step: number of statements of the next migration applied (MariaDB only)
+        :return: None
+        """
+        data_list = [version, step] if self.backend == "mariadb" else [version]
+        self.cursor.execute(self.delete_rows(table_name='schema_version', filter_expression="1=1"))
+        self.cursor.execute(self.create_row_query(table_name='schema_version', data_list=data_list))
+
+    def migrate(self) -> int:
+        """
+        Upgrades the connected database in place by applying all the pending migrations in order
+        :return: schema version after migrating
+        """
+        version = self.schema_version()
+        step = self.migration_step()
+
+        for target, migration in enumerate(QueryData.migrations[version:], start=version + 1):
+            try:
+                self.check_conflicts(target, migration)
+                if self.backend == "sqlite":
+                    self.cursor.execute("BEGIN;")
+
+                statements = migration[self.backend]
+                for index, statement in enumerate(statements[step:], start=step + 1):
+                    self.cursor.execute(statement)
+                    if self.backend == "mariadb" and index < len(statements):
+                        # the statement is already committed, a retry resumes after it
+                        self.record_schema_version(target - 1, index)
+                        self.connect.commit()
+
+                step = 0
+                self.record_schema_version(target)
+                self.connect.commit()
+                self.logger.log_info(f"Schema migrated to version {target} - {migration['description']}.")
+
+            except Exception as exception:
+                self.connect.rollback()
+                self.logger.log_critical(f"Schema migration to version {target} failed - {exception}")
+                raise
+
+        return max(version, len(QueryData.migrations))
+
+    def check_conflicts(self, target: int, migration: dict) -> None:
+        """
+        Refuses to apply a migration whose new keys would drop rows, logging every conflicting row
+        :param target: schema version the migration upgrades to
+        :param migration: QueryData.migrations entry
+        :return: None
+        """
+        if "conflicts" not in migration:
+            return
+
+        self.cursor.execute(migration["conflicts"])
+        conflicts = self.cursor.fetchall()
+
+        for row in conflicts:
+            self.logger.log_error(f"Row {tuple(row)} conflicts with schema version {target}.")
+
+        if len(conflicts) > 0:
+            raise Exception(f"{len(conflicts)} rows conflict with schema version {target} "
+                            f"({migration['description']}), resolve them before migrating")
 
     @staticmethod
     def read_all_queries(table_name: str) -> str:
@@ -182,6 +785,81 @@ class QueryData:
         FROM {table_name};
         """
 
+    @staticmethod
+    def read_group_counts(table_name: str, group_columns: str, columns: str = None) -> str:
+        """
+        Counts the rows of a given table for every distinct value of the grouped columns
+        :param table_name: preferred table name
+        :param group_columns: column(s) to group by
+        :param columns: additional aggregated column(s) read after the grouped columns
+        :return: list of grouped values followed by the row count
+        """
+        if columns is None:
+            selected = group_columns
+        else:
+            selected = f"{group_columns}, {columns}"
+
+        return f"""
+        SELECT {selected}, COUNT(*)
+        FROM {table_name}
+        GROUP BY {group_columns};
+        """
+
+    @staticmethod
+    def exists_query(table_name: str, column: str) -> str:
+        """
+        Checks the existence of a value in a column of a given table, stops at the first match
+        :param table_name: preferred table name
+        :param column: column to search, bind the value to the placeholder (?)
+        :return: tuple containing 1 if the value exists, otherwise 0
+        """
+
+        return f"""
+        SELECT EXISTS(SELECT 1 FROM {table_name} WHERE {column} = ?);
+        """
+
+    @staticmethod
+    def read_first_match(table_name: str, column: str, filter_column: str) -> str:
+        """
+        Reads specific values of the first row matching a value using an indexed point lookup
+        :param table_name: preferred table name
+        :param column: required column(s)
+        :param filter_column: column to filter by, bind the value to the placeholder (?)
+        :return: tuple of a selected data
+        """
+
+        return f"""
+        SELECT {column}
+        FROM {table_name}
+        WHERE {filter_column} = ?
+        LIMIT 1;
+        """
+
+    def exists(self, table_name: str, column: str, value: any) -> bool:
+        """
+        Checks whether a value exists in a column of a given table
+        :param table_name: preferred table name
+        :param column: column to search
+        :param value: value to search for
+        :return: boolean value depending on the value's existence
+        """
+        sample_data = self.execute(func=self.exists_query(table_name=table_name, column=column),
+                                   output=True, params=(value,), commit=False)
+        return bool(sample_data[0][0])
+
+    def read_user(self, name: str) -> tuple:
+        """
+        Reads the uid and password of a user in a single round trip
+        :param name: username
+        :return: (uid, password) tuple, None if the user does not exist
+        """
+        sample_data = self.execute(func=self.read_first_match(table_name='user_data', column='uid, password',
+                                                              filter_column='name'),
+                                   output=True, params=(name,), commit=False)
+        if len(sample_data) == 0:
+            return None
+        return sample_data[0]
+
     @staticmethod
     def read_user_specific_field(table_name: str, filter_expression: str, column: str) -> str:
         """
@@ -214,6 +892,22 @@ class QueryData:
         VALUES ({values_string});
         """
 
+    @staticmethod
+    def create_rows_query(table_name: str, column_count: int) -> str:
+        """
+        Enter rows of data to a specified table using placeholders, for use with execute_many
+        :param table_name: preferred table name
+        :param column_count: number of values in a row
+        :return: None
+        """
+
+        placeholders = ", ".join(["?"] * column_count)
+
+        return f"""
+        INSERT INTO {table_name}
+        VALUES ({placeholders});
+        """
+
     @staticmethod
     def update_rows_query(table_name: str, column_value_pair: str, filter_expression: str) -> str:
         """
@@ -264,3 +958,191 @@ class QueryData:
         ON {join_table_1}.{common_column} = {join_table_2}.{common_column}
         WHERE {table_filter_expression};
         """
+
+    @staticmethod
+    def filter_statement(filters: dict) -> tuple:
+        """
+        Builds a placeholder filter expression from column and value pairs joined with AND,
+        list values are matched using IN
+        :param filters: dictionary of column -> value
+        :return: (filter expression, params) pair
+        """
+        expressions = []
+        params = []
+
+        for column, value in filters.items():
+            if isinstance(value, (list, tuple, set)):
+                value = list(value)
+                expressions.append(f"{column} IN ({', '.join(['?'] * len(value))})")
+                params.extend(value)
+            else:
+                expressions.append(f"{column} = ?")
+                params.append(value)
+
+        return " AND ".join(expressions), tuple(params)
+
+    @staticmethod
+    def read_user_specific_field_statement(table_name: str, filters: dict, column: str) -> tuple:
+        """
+        Reads a specific value from a column of a given table using bound filter values
+        :param table_name: preferred table name
+        :param filters: dictionary of column -> value to filter out a specific value
+        :param column: required column
+        :return: (query, params) pair
+        """
+        filter_expression, params = QueryData.filter_statement(filters)
+
+        return QueryData.read_user_specific_field(table_name=table_name, filter_expression=filter_expression,
+                                                  column=column), params
+
+    @staticmethod
+    def lock_rows_statement(table_name: str, filters: dict) -> tuple:
+        """
+        Locks rows of a given table until the end of the transaction (mariadb only)
+        :param table_name: preferred table name
+        :param filters: dictionary of column -> value to isolate specific rows
+        :return: (query, params) pair
+        """
+        filter_expression, params = QueryData.filter_statement(filters)
+
+        return f"""
+        SELECT 1
+        FROM {table_name}
+        WHERE {filter_expression}
+        FOR UPDATE;
+        """, params
+
+    @staticmethod
+    def create_row_statement(table_name: str, data_list: list) -> tuple:
+        """
+        Enter a row of bound values to a specified table
+        :param table_name: preferred table name
+        :param data_list: list of values to be entered as a row
+        :return: (query, params) pair
+        """
+
+        return QueryData.create_rows_query(table_name=table_name, column_count=len(data_list)), tuple(data_list)
+
+    @staticmethod
+    def update_rows_statement(table_name: str, values: dict, filters: dict) -> tuple:
+        """
+        Update rows of a specified table using bound values
+        :param table_name: preferred table name
+        :param values: dictionary of column -> new value
+        :param filters: dictionary of column -> value to isolate specific rows
+        :return: (query, params) pair
+        """
+        column_value_pair = ", ".join([f"{column} = ?" for column in values])
+        filter_expression, params = QueryData.filter_statement(filters)
+
+        return QueryData.update_rows_query(table_name=table_name, column_value_pair=column_value_pair,
+                                           filter_expression=filter_expression), tuple(values.values()) + params
+
+    @staticmethod
+    def increment_rows_statement(table_name: str, deltas: dict, filters: dict) -> tuple:
+        """
+        Atomically add bound deltas to numeric columns of specified rows
+        :param table_name: preferred table name
+        :param deltas: dictionary of column -> value added to the column
+        :param filters: dictionary of column -> value to isolate specific rows
+        :return: (query, params) pair
+        """
+        column_value_pair = ", ".join([f"{column} = {column} + ?" for column in deltas])
+        filter_expression, params = QueryData.filter_statement(filters)
+
+        return QueryData.update_rows_query(table_name=table_name, column_value_pair=column_value_pair,
+                                           filter_expression=filter_expression), tuple(deltas.values()) + params
+
+    def read_page_statement(self, table_name: str, column: str, filters: dict, order_by: str, limit: int = None,
+                            offset: int = 0, minimums: dict = None) -> tuple:
+        """
+        Reads an ordered page of the rows matching bound filter values
+        :param table_name: preferred table name
+        :param column: required column(s)
+        :param filters: dictionary of column -> value to filter by
+        :param order_by: column(s) to order the rows by
+        :param limit: maximum number of rows, None for every row
+        :param offset: number of leading rows to skip
+        :param minimums: dictionary of column -> lowest accepted value, None values are ignored
+        :return: (query, params) pair
+        """
+        filter_expression, params = QueryData.filter_statement(filters)
+
+        for minimum_column, value in (minimums or {}).items():
+            if value is not None:
+                filter_expression = f"{filter_expression} AND {minimum_column} >= ?"
+                params = params + (value,)
+
+        page = ""
+        if limit is not None or offset > 0:
+            if limit is None:
+                # both backends only accept an offset after a limit
+                limit = -1 if self.backend == "sqlite" else 18446744073709551615
+            page = "LIMIT ? OFFSET ?"
+            params = params + (limit, offset)
+
+        return f"""
+        SELECT {column}
+        FROM {table_name}
+        WHERE {filter_expression}
+        ORDER BY {order_by}
+        {page};
+        """, params
+
+    def upsert_increment_statement(self, table_name: str, keys: dict, deltas: dict, values: dict = None) -> tuple:
+        """
+        Insert a row, or add the bound deltas to the existing row with the same primary key
+        :param table_name: preferred table name
+        :param keys: dictionary of primary key column -> value
+        :param deltas: dictionary of column -> value added to the column
+        :param values: dictionary of column -> value only written when the row is inserted
+        :return: (query, params) pair
+        """
+        if values is None:
+            values = {}
+
+        columns = list(keys) + list(values) + list(deltas)
+        placeholders = ", ".join(["?"] * len(columns))
+
+        if self.backend == "mariadb":
+            updates = ", ".join([f"{column} = {column} + VALUES({column})" for column in deltas])
+            conflict = "ON DUPLICATE KEY UPDATE"
+        else:
+            updates = ", ".join([f"{column} = {column} + excluded.{column}" for column in deltas])
+            conflict = f"ON CONFLICT ({', '.join(keys)}) DO UPDATE SET"
+
+        return f"""
+        INSERT INTO {table_name} ({', '.join(columns)})
+        VALUES ({placeholders})
+        {conflict} {updates};
+        """, tuple(keys.values()) + tuple(values.values()) + tuple(deltas.values())
+
+    @staticmethod
+    def delete_rows_statement(table_name: str, filters: dict) -> tuple:
+        """
+        Delete specified rows from a specified table using bound filter values
+        :param table_name: preferred table name
+        :param filters: dictionary of column -> value to isolate specific rows
+        :return: (query, params) pair
+        """
+        filter_expression, params = QueryData.filter_statement(filters)
+
+        return QueryData.delete_rows(table_name=table_name, filter_expression=filter_expression), params
+
+    @staticmethod
+    def read_using_inner_join_statement(table_columns: str, join_table_1: str, join_table_2: str,
+                                        common_column: str, filters: dict) -> tuple:
+        """
+        Select values from a given pair of tables using inner join and bound filter values
+        :param table_columns: column from which the data is to be retrieved
+        :param join_table_1: preferred table 1 name
+        :param join_table_2: preferred table 2 name
+        :param common_column: column common to both table 1 and table 2
+        :param filters: dictionary of column -> value to isolate specific data
+        :return: (query, params) pair
+        """
+        filter_expression, params = QueryData.filter_statement(filters)
+
+        return QueryData.read_using_inner_join(table_columns=table_columns, join_table_1=join_table_1,
+                                               join_table_2=join_table_2, common_column=common_column,
+                                               table_filter_expression=filter_expression), params
@@ -0,0 +1,66 @@
+"""
+#!/usr/bin/env python3
+compact in-memory progression records
+progression_tracker_OOP_V2/records.py
+"""
+from array import array
+
+
+class ProgressRecords:
+    """
+    Column oriented result set of progression entries, one byte per mark and outcome code.
+    SnapshotBuilder holds the entries of a whole group of users in it and pickles them to its worker processes
+    as four arrays instead of one tuple per entry.
+    """
+
+    __slots__ = ("pass_marks", "defer_marks", "fail_marks", "outcome")
+
+    def __init__(self, rows=()):
+        self.pass_marks = array('B')
+        self.defer_marks = array('B')
+        self.fail_marks = array('B')
+        self.outcome = array('B')
+        self.extend(rows)
+
+    def append(self, row) -> None:
+        """
+        adds an entry
+        :param row: (pass marks, defer marks, fail marks, outcome code) sequence
+        """
+        pass_marks, defer_marks, fail_marks, outcome = row
+        self.pass_marks.append(pass_marks)
+        self.defer_marks.append(defer_marks)
+        self.fail_marks.append(fail_marks)
+        self.outcome.append(outcome)
+
+    def extend(self, rows) -> None:
+        """
+        adds entries
+        :param rows: iterable of (pass marks, defer marks, fail marks, outcome code) sequences
+        """
+        for row in rows:
+            self.append(row)
+
+    @property
+    def nbytes(self) -> int:
+        """bytes held by the columns"""
+        return sum(len(column) * column.itemsize for column in
+                   (self.pass_marks, self.defer_marks, self.fail_marks, self.outcome))
+
+    def __len__(self) -> int:
+        return len(self.outcome)
+
+    def __getitem__(self, index: int) -> tuple:
+        return self.pass_marks[index], self.defer_marks[index], self.fail_marks[index], self.outcome[index]
+
+    def __iter__(self):
+        return zip(self.pass_marks, self.defer_marks, self.fail_marks, self.outcome)
+
+    def __getstate__(self) -> tuple:
+        return self.pass_marks, self.defer_marks, self.fail_marks, self.outcome
+
+    def __setstate__(self, state: tuple) -> None:
+        self.pass_marks, self.defer_marks, self.fail_marks, self.outcome = state
+
+    def __repr__(self) -> str:
+        return f"ProgressRecords({len(self)} entries, {self.nbytes} bytes)"
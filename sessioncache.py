@@ -0,0 +1,53 @@
+"""
+#!/usr/bin/env python3
+in-memory verified password cache
+progression_tracker_OOP_V2/sessioncache.py
+"""
+import hmac
+from ttlcache import TTLCache
+
+
+class SessionCache(TTLCache):
+    """
+    Bounded, short-lived cache of the passwords that recently passed verification, shared by the DataHandler
+    instances of a process, so that the requests of a signed-in user pay the password hash cost once per TTL.
+    Entries are keyed like the identity cache and bound to the stored credential they were verified against,
+    a rehash or password change invalidates them.
+    """
+
+    metric = "session_cache"
+
+    def __init__(self, size: int = 1024, ttl: float = 30.0):
+        super().__init__(size, ttl)
+
+    @staticmethod
+    def password_digest(credential: str, password: str) -> bytes:
+        """
+        keyed digest of a verified password, bound to the credential it was verified against
+        :param credential: stored credential
+        :param password: plaintext password
+        :return: digest bytes
+        """
+        return TTLCache.keyed_digest(f"{credential}\0{password}")
+
+    def check(self, key: tuple, credential: str, password: str) -> bool:
+        """
+        checks a password against the recently verified one, without the password hash
+        :param key: cache key
+        :param credential: stored credential of the user
+        :param password: plaintext password
+        :return: boolean value depending on the password having been verified against the credential within the TTL
+        """
+        digest = self.lookup(key)
+        hit = digest is not None and hmac.compare_digest(digest, SessionCache.password_digest(credential, password))
+        self.record(hit)
+        return hit
+
+    def remember(self, key: tuple, credential: str, password: str) -> None:
+        """
+        records a password that passed verification
+        :param key: cache key
+        :param credential: stored credential the password was verified against
+        :param password: plaintext password
+        """
+        self.put(key, SessionCache.password_digest(credential, password))
@@ -0,0 +1,186 @@
+"""
+#!/usr/bin/env python3
+parallel encrypted data bin regeneration
+progression_tracker_OOP_V2/snapshots.py
+"""
+import os
+import time
+from queries import QueryData
+from handler import DataHandler
+from cryptohandler import CryptoHandler
+from records import ProgressRecords
+from decorators import shared_logger
+
+
+class SnapshotBuilder:
+    """
+    Regenerates the encrypted data bins of many users, fanning the encryption out over a pool of worker processes.
+    Bin keys are derived from the login password, which is only stored hashed, so the bins are encrypted with the
+    derived keys the process still holds in CryptoHandler.key_cache. Run it in the daemon, where the keys of the
+    users who recently signed in stay cached, the bins of the other users are rebuilt on their next cached read.
+    """
+
+    def __init__(self, workers: int = None, group_size: int = 500, database: str = "local"):
+        self.__workers = workers if workers is not None else (os.cpu_count() or 1)
+        self.__group_size = group_size
+        self.__db_con = QueryData(choice=database)
+        self.__built = 0
+        self.__failed = []
+        self.__skipped = []
+        self.__elapsed = 0.0
+        self.logger = shared_logger(name="SnapshotLogger", propagate=False)
+
+    @property
+    def workers(self) -> int:
+        return self.__workers
+
+    @property
+    def built(self) -> int:
+        return self.__built
+
+    @property
+    def failed(self) -> list:
+        """list of (uid, reason) pairs of the data bins that could not be rebuilt"""
+        return self.__failed
+
+    @property
+    def skipped(self) -> list:
+        """uids of the users without a cached key, their data bins are rebuilt on their next cached read"""
+        return self.__skipped
+
+    @property
+    def elapsed(self) -> float:
+        return self.__elapsed
+
+    @property
+    def rate(self) -> float:
+        """rebuilt data bins per second"""
+        if self.__elapsed == 0:
+            return 0.0
+        return self.__built / self.__elapsed
+
+    def read_uids(self, since: float = None) -> list:
+        """
+        reads the uids of the users to rebuild
+        :param since: only users with entries made at or after this time, None for every user
+        :return: list of uids
+        """
+        if since is None:
+            func = QueryData.read_user_data_fields(table_name='user_data', columns='uid')
+        else:
+            func = (QueryData.read_user_specific_field(table_name='user_progression', column='DISTINCT uid',
+                                                       filter_expression="entry_time >= ?"), (since,))
+
+        return [row[0] for row in self.__db_con.execute(func=func, output=True, commit=False)]
+
+    def read_jobs(self, uids: list, keys: dict) -> list:
+        """
+        reads the users and all their progression entries for a group of uids in two queries
+        :param uids: list of uids, all of them with a cached key
+        :param keys: dictionary of uid -> (key, iterations, hash name) from KeyCache.live_keys
+        :return: list of jobs for build_snapshot
+        """
+        users = self.__db_con.execute(func=QueryData.read_user_specific_field_statement(
+            column='uid, name',
+            table_name='user_data',
+            filters={"uid": uids}
+        ),
+            output=True,
+            commit=False
+        )
+        entries = {uid: ProgressRecords() for uid, _ in users}
+
+        sample_data = self.__db_con.execute(func=QueryData.read_user_specific_field_statement(
+            column='uid, pass_marks, defer_marks, fail_marks, outcome',
+            table_name='user_progression',
+            filters={"uid": uids}
+        ),
+            output=True,
+            commit=False
+        )
+        for data in sample_data:
+            entries[data[0]].append(data[1:])
+
+        generated_at = time.time()
+        return [(uid, name, *keys[uid], f"{DataHandler.data_path}{uid}.bin", entries[uid], generated_at)
+                for uid, name in users]
+
+    @staticmethod
+    def build_snapshot(job: tuple) -> tuple:
+        """
+        generates, encrypts and atomically writes the data bin of a single user (runs in a worker process)
+        :param job: (uid, name, key, iterations, hash name, data file, progression entries, generation time) tuple
+        :return: (uid, error) pair, error is None on success
+        """
+        uid, name, key, iterations, hash_name, data_file, entries, generated_at = job
+
+        try:
+            records = [DataHandler.format_header(name, uid, data_file)]
+            records.extend(DataHandler.format_record(*data) for data in entries)
+
+            user = CryptoHandler(availability=True, key=key, logger_name="CryptoHandleLogger(ENC)",
+                                 iterations=iterations, hash_name=hash_name)
+            user.write_records(file_name=data_file, records=records)
+            os.utime(data_file, (generated_at, generated_at))
+            return uid, None
+
+        except Exception as error:
+            return uid, str(error)
+
+    def read_job_groups(self, uids: list, keys: dict):
+        """
+        lazily reads the jobs of the uids in groups of group_size
+        :param uids: list of uids, all of them with a cached key
+        :param keys: dictionary of uid -> (key, iterations, hash name)
+        :return: generator of jobs
+        """
+        for start in range(0, len(uids), self.__group_size):
+            yield from self.read_jobs(uids[start:start + self.__group_size], keys)
+
+    def rebuild(self, uids: list = None, since: float = None) -> int:
+        """
+        rebuilds the data bins of the given users that have a cached key
+        :param uids: list of uids, None to select the users with read_uids
+        :param since: only users with entries made at or after this time, used when uids is None
+        :return: number of rebuilt data bins
+        """
+        if uids is None:
+            uids = self.read_uids(since=since)
+
+        keys = CryptoHandler.key_cache.live_keys()
+        self.__skipped.extend(uid for uid in uids if uid not in keys)
+        uids = [uid for uid in uids if uid in keys]
+
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+        before = time.perf_counter()
+
+        if len(uids) > 0:
+            # spawned workers, forking would copy the locks held by the other threads of a daemon
+            with ProcessPoolExecutor(max_workers=self.__workers,
+                                     mp_context=multiprocessing.get_context("spawn")) as executor:
+                results = executor.map(SnapshotBuilder.build_snapshot, self.read_job_groups(uids, keys),
+                                       chunksize=max(1, min(64, len(uids) // (self.__workers * 4) or 1)))
+                for uid, error in results:
+                    if error is None:
+                        self.__built += 1
+                    else:
+                        self.__failed.append((uid, error))
+                        self.logger.log_warning(f"[{uid}] data bin not rebuilt - {error}")
+
+        self.__elapsed = time.perf_counter() - before
+        if self.__skipped:
+            self.logger.log_info(f"{len(self.__skipped)} users without a cached key skipped.")
+        self.logger.log_info(f"{self.__built} data bins rebuilt with {self.__workers} workers "
+                             f"({self.rate:.1f} bins/sec).")
+        return self.__built
+
+    def close(self) -> None:
+        """returns the database connection to the pool"""
+        self.__db_con.close()
+
+    def __enter__(self) -> "SnapshotBuilder":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
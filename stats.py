@@ -0,0 +1,176 @@
+"""
+#!/usr/bin/env python3
+user progression statistics
+progression_tracker_OOP_V2/stats.py
+"""
+from collections import Counter
+from queries import QueryData
+from handler import DataHandler
+from outcomes import OutcomeTable
+from decorators import shared_logger
+
+
+class ProgressionStats:
+    """
+    Reads cohort statistics from the incrementally maintained progression_summary table.
+    """
+
+    summary_columns = "pass_marks, defer_marks, fail_marks, outcome, entries"
+    group_columns = "pass_marks, defer_marks, fail_marks"
+
+    def __init__(self, database: str = "local"):
+        self.__db_con = QueryData(choice=database)
+        self.logger = shared_logger(name="StatsLogger", propagate=False)
+
+    def read_summary(self) -> list:
+        """
+        reads the materialized summary
+        :return: list of (pass marks, defer marks, fail marks, outcome, entries) tuples
+        """
+        return self.__db_con.execute(func=QueryData.read_user_data_fields(
+            table_name='progression_summary',
+            columns=ProgressionStats.summary_columns
+        ),
+            output=True,
+            commit=False
+        )
+
+    def read_live_summary(self) -> list:
+        """
+        computes the summary directly from user_progression with a single GROUP BY pass
+        :return: list of (pass marks, defer marks, fail marks, outcome, entries) tuples
+        """
+        return self.__db_con.execute(func=QueryData.read_group_counts(
+            table_name='user_progression',
+            group_columns=ProgressionStats.group_columns,
+            columns="MIN(outcome)"
+        ),
+            output=True,
+            commit=False
+        )
+
+    def recompute(self) -> int:
+        """
+        rebuilds the summary and the user_stats totals from user_progression in one transaction,
+        holding off the writers between reading user_progression and rewriting the summary
+        :return: number of summary rows written
+        """
+        with self.__db_con.transaction(immediate=True):
+            if self.__db_con.backend == "mariadb":
+                # every writer updates the user_stats row in the same transaction as its entries
+                self.__db_con.execute(func=QueryData.lock_rows_statement(table_name='user_stats', filters={"id": 1}),
+                                      output=True)
+
+            live_summary = self.read_live_summary()
+            entries = {tuple(row[:4]): row[4] for row in live_summary}
+            counts = self.outcome_counts(live_summary)
+
+            self.__db_con.execute(func=QueryData.delete_rows(
+                table_name='progression_summary',
+                filter_expression="1=1"
+            ))
+            DataHandler.write_progression_summary(self.__db_con, entries)
+            self.__db_con.execute(func=QueryData.update_rows_statement(
+                table_name='user_stats',
+                values={"progress": counts[1], "trailing": counts[2], "retriever": counts[3], "exclude": counts[4]},
+                filters={"id": 1}
+            ))
+
+        self.logger.log_info(f"Progression summary recomputed - {len(entries)} rows.")
+        return len(entries)
+
+    def check_consistency(self) -> list:
+        """
+        compares the materialized summary and user_stats totals against a full recomputation
+        :return: list of mismatch descriptions, empty if the summary is consistent
+        """
+        # read in one transaction, so that entries committed in between do not show up as mismatches
+        with self.__db_con.transaction():
+            stored = {tuple(row[:4]): row[4] for row in self.read_summary() if row[4] != 0}
+            live_summary = self.read_live_summary()
+            totals = self.__db_con.execute(func=QueryData.read_user_specific_field_statement(
+                column="progress, trailing, retriever, exclude",
+                table_name='user_stats',
+                filters={"id": 1}
+            ),
+                output=True,
+                commit=False
+            )
+
+        live = {tuple(row[:4]): row[4] for row in live_summary}
+        mismatches = []
+
+        for key in sorted(set(stored) | set(live), key=str):
+            if stored.get(key, 0) != live.get(key, 0):
+                mismatches.append(f"summary {key}: stored {stored.get(key, 0)}, actual {live.get(key, 0)}")
+
+        for pass_marks, defer_marks, fail_marks, outcome in live:
+            expected = OutcomeTable.outcome(pass_marks, defer_marks, fail_marks)
+            if expected != 0 and expected != outcome:
+                mismatches.append(f"outcome {(pass_marks, defer_marks, fail_marks)}: "
+                                  f"stored {DataHandler.progress_values.get(outcome, outcome)}, "
+                                  f"expected {DataHandler.progress_values[expected]}")
+
+        counts = self.outcome_counts(live_summary)
+        for key, value in DataHandler.progress_values.items():
+            stored_total = totals[0][key - 1] if len(totals) > 0 else 0
+            if stored_total != counts[key]:
+                mismatches.append(f"user_stats {value}: stored {stored_total}, actual {counts[key]}")
+
+        for mismatch in mismatches:
+            self.logger.log_warning(f"Inconsistent statistics - {mismatch}")
+
+        return mismatches
+
+    @staticmethod
+    def outcome_counts(summary: list) -> Counter:
+        """
+        totals the entries of a summary per outcome
+        :param summary: list of summary tuples
+        :return: Counter of outcome key -> entries
+        """
+        counts = Counter({key: 0 for key in DataHandler.progress_values})
+
+        for row in summary:
+            counts[row[3]] += row[4]
+
+        return counts
+
+    def generate_str(self) -> str:
+        """
+        generates a string of cohort statistics from the summary
+        :return: string of outcome counts, percentages and mark distributions
+        """
+        summary = self.read_summary()
+        total = sum(row[4] for row in summary)
+        counts = self.outcome_counts(summary)
+
+        stats = f"""
+        Progression Statistics
+        ----------------------
+        Entries: {total}\n
+        """
+        for key, value in DataHandler.progress_values.items():
+            percentage = counts[key] / total * 100 if total > 0 else 0.0
+            stats = stats + f"\n        {value}: {counts[key]} ({percentage:.2f}%)"
+
+        stats = stats + "\n"
+        for index, label in enumerate(["pass", "defer", "fail"]):
+            distribution = Counter()
+            for row in summary:
+                distribution[row[index]] += row[4]
+
+            marks = " | ".join([f"{mark}:{distribution[mark]}" for mark in sorted(distribution)])
+            stats = stats + f"\n        [{label} marks - {marks}]"
+
+        return stats
+
+    def close(self) -> None:
+        """returns the database connection to the pool"""
+        self.__db_con.close()
+
+    def __enter__(self) -> "ProgressionStats":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
@@ -0,0 +1,38 @@
+"""
+#!/usr/bin/env python3
+shared test fixtures
+progression_tracker_OOP_V2/tests/conftest.py
+"""
+import os
+import sys
+import threading
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """runs a test in a temporary working directory holding its own database, salts and data bins"""
+    from pool import ConnectionPool
+    from keystore import KeyStore
+    from handler import DataHandler
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(DataHandler, "salt_path", f"{tmp_path}/user_keys/")
+    monkeypatch.setattr(DataHandler, "data_path", f"{tmp_path}/user_data/")
+    os.mkdir(DataHandler.salt_path)
+    os.mkdir(DataHandler.data_path)
+
+    yield tmp_path
+
+    # background data bin writes would otherwise open the next test's database from this directory
+    for thread in threading.enumerate():
+        if thread.name.startswith("SnapshotWriter-"):
+            thread.join()
+
+    # the sqlite pool is keyed by the relative database path, its connections belong to this directory
+    ConnectionPool.close_all()
+    KeyStore.close_all()
+    DataHandler.identities.clear()
+    DataHandler.sessions.clear()
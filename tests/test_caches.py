@@ -0,0 +1,67 @@
+"""
+#!/usr/bin/env python3
+process cache tests
+progression_tracker_OOP_V2/tests/test_caches.py
+"""
+import time
+from keycache import KeyCache
+from identitycache import IdentityCache
+from sessioncache import SessionCache
+
+
+def test_least_recently_used_entries_are_evicted():
+    cache = IdentityCache(size=2, ttl=60.0)
+    cache.put(("db", "a"), ("uid-a", "x", None))
+    cache.put(("db", "b"), ("uid-b", "y", None))
+
+    assert cache.get(("db", "a")) == ("uid-a", "x", None)
+    cache.put(("db", "c"), ("uid-c", "z", None))
+
+    assert len(cache) == 2
+    assert cache.get(("db", "b")) is None
+    assert cache.get(("db", "a")) is not None
+    assert (cache.hits, cache.misses) == (2, 1)
+
+
+def test_expired_entries_are_purged_on_put():
+    cache = IdentityCache(size=8, ttl=0.05)
+    cache.put(("db", "a"), ("uid-a", "x", None))
+    cache.put(("db", "b"), ("uid-b", "y", None))
+    time.sleep(0.1)
+
+    cache.put(("db", "c"), ("uid-c", "z", None))
+    assert len(cache) == 1
+    assert cache.get(("db", "a")) is None
+
+
+class RecordingKeyCache(KeyCache):
+    """keeps a reference to the last stored bytearray"""
+
+    def store(self, value: bytes) -> bytearray:
+        self.stored = super().store(value)
+        return self.stored
+
+
+def test_evicted_keys_are_zeroed():
+    cache = RecordingKeyCache(size=1, ttl=60.0)
+    key = KeyCache.cache_key("uid", b"salt", "password", 1000, "SHA512")
+    cache.put(key, b"\x01" * 32)
+    copy = cache.get(key)
+
+    assert copy == b"\x01" * 32
+    assert KeyCache.cache_key("uid", b"salt", "other", 1000, "SHA512") != key
+
+    cache.invalidate(key)
+    assert cache.stored == bytearray(32)
+    assert copy == b"\x01" * 32
+    assert cache.get(key) is None
+
+
+def test_sessions_are_bound_to_the_credential():
+    cache = SessionCache(size=8, ttl=60.0)
+    cache.remember(("db", "a"), "scrypt$14$salt$digest", "password")
+
+    assert cache.check(("db", "a"), "scrypt$14$salt$digest", "password")
+    assert not cache.check(("db", "a"), "scrypt$14$salt$digest", "wrong")
+    assert not cache.check(("db", "a"), "scrypt$15$salt$other", "password")
+    assert (cache.hits, cache.misses) == (1, 2)
@@ -0,0 +1,191 @@
+"""
+#!/usr/bin/env python3
+data bin format tests
+progression_tracker_OOP_V2/tests/test_cryptohandler.py
+"""
+import os
+import sys
+import types
+import struct
+import multiprocessing
+import pytest
+from cryptohandler import CryptoHandler
+
+
+@pytest.fixture
+def key() -> bytes:
+    return os.urandom(32)
+
+
+def reader(key: bytes) -> CryptoHandler:
+    return CryptoHandler(availability=True, key=key, logger_name="TestCryptoLogger")
+
+
+def records(count: int, start: int = 0) -> list:
+    return [f"record {index}\n" for index in range(start, start + count)]
+
+
+def read_all(key: bytes, path: str, **kwargs) -> list:
+    return [record.decode() for record in reader(key).read_records(path, **kwargs)]
+
+
+def append_worker(key: bytes, path: str, worker: int, count: int) -> None:
+    for index in range(count):
+        reader(key).append_records(path, [f"worker {worker} record {index}\n"])
+
+
+def test_write_and_read_records(tmp_path, key):
+    path = str(tmp_path / "records.bin")
+
+    assert reader(key).write_records(path, records(5)) == 5
+    assert reader(key).read_bin_version(path) == 2
+    assert read_all(key, path) == records(5)
+
+
+def test_append_records(tmp_path, key):
+    path = str(tmp_path / "records.bin")
+    reader(key).write_records(path, records(3))
+
+    assert reader(key).append_records(path, records(2, start=3)) == 5
+    assert reader(key).append_records(path, records(1, start=5)) == 6
+    assert read_all(key, path) == records(6)
+
+
+def test_read_last_records(tmp_path, key):
+    path = str(tmp_path / "records.bin")
+    reader(key).write_records(path, records(10))
+
+    assert read_all(key, path, last=3) == records(3, start=7)
+    assert read_all(key, path, last=3, first=1) == records(1) + records(3, start=7)
+    assert read_all(key, path, last=20, first=1) == records(10)
+    assert read_all(key, path, last=0, first=1) == records(1)
+
+
+def test_interrupted_append_is_overwritten(tmp_path, key):
+    path = str(tmp_path / "records.bin")
+    reader(key).write_records(path, records(3))
+
+    # a record written without raising the header count, as left by an append that died midway
+    with open(path, "ab") as file:
+        file.write(struct.pack(CryptoHandler.record_prefix_format, 64) + os.urandom(20))
+
+    assert read_all(key, path) == records(3)
+    assert reader(key).append_records(path, records(2, start=3)) == 5
+    assert read_all(key, path) == records(5)
+
+
+def test_concurrent_appends(tmp_path, key):
+    path = str(tmp_path / "records.bin")
+    reader(key).write_records(path, records(1))
+
+    context = multiprocessing.get_context("fork")
+    workers = [context.Process(target=append_worker, args=(key, path, worker, 50)) for worker in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+        assert worker.exitcode == 0
+
+    appended = read_all(key, path)[1:]
+    assert len(appended) == 200
+    for worker in range(4):
+        assert [record for record in appended if record.startswith(f"worker {worker} ")] == \
+               [f"worker {worker} record {index}\n" for index in range(50)]
+
+
+def test_append_lock_without_fcntl(tmp_path, key, monkeypatch):
+    path = str(tmp_path / "records.bin")
+    reader(key).write_records(path, records(1))
+
+    calls = []
+    msvcrt = types.ModuleType("msvcrt")
+    msvcrt.LK_LOCK, msvcrt.LK_UNLCK = 1, 0
+    msvcrt.locking = lambda fd, mode, size: calls.append((mode, size))
+    monkeypatch.setitem(sys.modules, "fcntl", None)
+    monkeypatch.setitem(sys.modules, "msvcrt", msvcrt)
+
+    assert reader(key).append_records(path, records(1, start=1)) == 2
+    assert calls == [(msvcrt.LK_LOCK, 1), (msvcrt.LK_UNLCK, 1)]
+    assert os.path.exists(f"{path}.lock")
+    assert read_all(key, path) == records(2)
+
+
+def test_truncated_bin(tmp_path, key):
+    path = str(tmp_path / "records.bin")
+    reader(key).write_records(path, records(3))
+    os.truncate(path, os.path.getsize(path) - 10)
+
+    with pytest.raises(ValueError, match="record 2 - bin is truncated"):
+        read_all(key, path)
+    with pytest.raises(ValueError, match="truncated"):
+        reader(key).append_records(path, records(1))
+
+
+def test_tampered_record(tmp_path, key):
+    path = str(tmp_path / "records.bin")
+    reader(key).write_records(path, records(3))
+
+    with open(path, "r+b") as file:
+        file.seek(-1, os.SEEK_END)
+        last = file.read(1)
+        file.seek(-1, os.SEEK_END)
+        file.write(bytes([last[0] ^ 1]))
+
+    with pytest.raises(ValueError, match="record 2 - MAC check failed"):
+        read_all(key, path)
+    assert read_all(key, path, last=0, first=2) == records(2)
+
+
+def test_unknown_hash_id(tmp_path, key):
+    path = str(tmp_path / "records.bin")
+    reader(key).write_records(path, records(3))
+
+    with open(path, "r+b") as file:
+        file.seek(4)
+        file.write(bytes([9]))
+
+    with pytest.raises(ValueError, match="unknown KDF hash id -> 9"):
+        reader(key).read_bin_version(path)
+    with pytest.raises(ValueError, match="unknown KDF hash id -> 9"):
+        reader(key).append_records(path, records(1))
+
+
+def test_blob_bin(tmp_path):
+    path = str(tmp_path / "blob.bin")
+    data = "".join(records(500)).encode()
+    writer = CryptoHandler(availability=False, password="root", logger_name="TestCryptoLogger", iterations=2000,
+                           hash_name="SHA256")
+    writer.assign_salt()
+    writer.generate_key()
+    writer.write_to_bin(path, writer.encrypt(data))
+
+    blob_reader = CryptoHandler(availability=True, password="root", logger_name="TestCryptoLogger")
+    blob_reader.assign_salt(writer.salt)
+    assert blob_reader.read_bin_version(path) == 1
+    assert (blob_reader.hash_name, blob_reader.iterations) == ("SHA256", 2000)
+    blob_reader.generate_key()
+
+    assert b"".join(bytes(block) for block in blob_reader.iter_blob(path, block_size=1024)) == data
+    assert blob_reader.decrypt(blob_reader.read_from_bin(path)) == data
+
+
+def test_headerless_blob_bin(tmp_path):
+    path = str(tmp_path / "legacy.bin")
+    data = "".join(records(10)).encode()
+    writer = CryptoHandler(availability=False, password="root", logger_name="TestCryptoLogger", iterations=1000,
+                           hash_name="SHA1")
+    writer.assign_salt()
+    writer.generate_key()
+    encrypted = writer.encrypt(data)
+    with open(path, "wb") as file:
+        file.write(writer.iv + encrypted)
+
+    blob_reader = CryptoHandler(availability=True, password="root", logger_name="TestCryptoLogger",
+                                iterations=5000, hash_name="SHA512")
+    blob_reader.assign_salt(writer.salt)
+    assert blob_reader.read_bin_version(path) == 0
+    assert (blob_reader.hash_name, blob_reader.iterations) == ("SHA1", 1000)
+    blob_reader.generate_key()
+
+    assert b"".join(bytes(block) for block in blob_reader.iter_blob(path)) == data
+    assert blob_reader.decrypt(blob_reader.read_from_bin(path)) == data
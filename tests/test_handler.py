@@ -0,0 +1,90 @@
+"""
+#!/usr/bin/env python3
+DataHandler data bin tests
+progression_tracker_OOP_V2/tests/test_handler.py
+"""
+import os
+import time
+from handler import DataHandler
+
+
+def add_marks(name: str, marks: list) -> None:
+    for pass_marks, defer_marks, fail_marks in marks:
+        with DataHandler(name=name, pass_marks=pass_marks, defer_marks=defer_marks, fail_marks=fail_marks,
+                         password="root") as user:
+            assert len(user.data_entry()) == 5
+
+
+def test_damaged_bin_falls_back_to_the_database(workdir):
+    add_marks("alice", [(120, 0, 0), (100, 20, 0), (40, 40, 40)])
+
+    with DataHandler(name="alice", password="root") as user:
+        expected = user.get_progress()
+        user.wait_for_snapshot()
+        user.dump_to_bin(user.generate_records(), time.time())
+        data_file = f"{DataHandler.data_path}{user.read_user_record()[0]}.bin"
+
+    with open(data_file, "r+b") as file:
+        file.seek(-1, os.SEEK_END)
+        last = file.read(1)
+        file.seek(-1, os.SEEK_END)
+        file.write(bytes([last[0] ^ 1]))
+
+    with DataHandler(name="alice", password="root") as user:
+        assert user.get_progress(use_snapshot=True) == expected
+        assert user.get_progress(use_snapshot=True, last=1) == user.get_progress(last=1)
+        user.wait_for_snapshot()
+
+    # the damaged bin was rewritten from the database
+    with DataHandler(name="alice", password="root") as user:
+        assert user.load_from_bin() == expected
+
+
+def damage_header(data_file: str) -> None:
+    """records an unknown KDF hash id in the header of a data bin"""
+    with open(data_file, "r+b") as file:
+        file.seek(4)
+        file.write(bytes([9]))
+
+
+def test_damaged_header_falls_back_to_the_database(workdir):
+    add_marks("carol", [(120, 0, 0), (100, 20, 0)])
+
+    with DataHandler(name="carol", password="root") as user:
+        expected = user.get_progress()
+        user.wait_for_snapshot()
+        user.dump_to_bin(user.generate_records(), time.time())
+        data_file = f"{DataHandler.data_path}{user.read_user_record()[0]}.bin"
+
+    damage_header(data_file)
+    with DataHandler(name="carol", password="root") as user:
+        assert user.get_progress(use_snapshot=True) == expected
+        user.wait_for_snapshot()
+        assert user.load_from_bin() == expected
+
+    damage_header(data_file)
+    add_marks("carol", [(40, 40, 40)])
+    with DataHandler(name="carol", password="root") as user:
+        expected = user.get_progress()
+        assert expected.endswith(DataHandler.format_record(40, 40, 40, 3))
+        assert user.get_progress(use_snapshot=True) == expected
+
+
+def test_paginated_reads_leave_the_bin_alone(workdir):
+    add_marks("bob", [(120, 0, 0), (100, 20, 0), (40, 40, 40)])
+
+    with DataHandler(name="bob", password="root") as user:
+        data_file = f"{DataHandler.data_path}{user.read_user_record()[0]}.bin"
+        user.get_progress(use_snapshot=True, limit=2)
+        user.get_progress(use_snapshot=True, offset=1)
+        user.get_progress(use_snapshot=True, since=0.0)
+        user.wait_for_snapshot()
+        assert not os.path.exists(data_file)
+
+        assert user.get_progress(limit=1, offset=1) == \
+            DataHandler.format_header("bob", user.read_user_record()[0], data_file) + \
+            DataHandler.format_record(100, 20, 0, 2)
+
+        user.get_progress(use_snapshot=True)
+        user.wait_for_snapshot()
+        assert os.path.exists(data_file)
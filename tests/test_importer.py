@@ -0,0 +1,71 @@
+"""
+#!/usr/bin/env python3
+bulk marks import tests
+progression_tracker_OOP_V2/tests/test_importer.py
+"""
+from queries import QueryData
+from handler import DataHandler
+from importer import MarksImporter
+
+
+def read_stats() -> list:
+    with QueryData() as db_con:
+        return db_con.execute(func=QueryData.read_user_data_fields(
+            table_name='user_stats', columns='progress, trailing, retriever, exclude'), output=True)
+
+
+def test_import_rejects_bad_rows_and_updates_the_stats(workdir):
+    with DataHandler(name="alice", password="root") as user:
+        assert user.authentication
+
+    path = workdir / "marks.csv"
+    path.write_text("name,pass_marks,defer_marks,fail_marks\n"
+                    "alice,120,0,0\n"
+                    "alice,100,20,0\n"
+                    "bob,120,0,0\n"
+                    "alice,100,0,0\n"
+                    "alice,12.5,0,0\n"
+                    "alice,,0,0\n"
+                    "alice,140,0,0\n"
+                    "alice,0,0,120\n")
+
+    with MarksImporter(file_path=str(path), batch_size=3) as importer:
+        assert importer.import_file() == 3
+
+    assert sorted(importer.rejected) == [
+        (4, "unknown user [bob]"),
+        (5, "invalid marks (100, 0, 0)"),
+        (6, "marks should be integers"),
+        (7, "missing field(s): pass_marks"),
+        (8, "marks should be between 0 and 120")
+    ]
+    assert read_stats() == [(1, 1, 0, 1)]
+
+    with DataHandler(name="alice", password="root") as user:
+        assert user.count_entries() == 3
+
+
+def test_failed_batch_leaves_no_entries_or_stats(workdir, monkeypatch):
+    with DataHandler(name="alice", password="root") as user:
+        assert user.authentication
+
+    path = workdir / "marks.jsonl"
+    path.write_text('{"name": "alice", "pass_marks": 120, "defer_marks": 0, "fail_marks": 0}\n'
+                    '{"name": "alice", "pass_marks": 0, "defer_marks": 0, "fail_marks": 120}\n')
+    write_progression_summary = DataHandler.write_progression_summary
+
+    def failing_summary(db_con, entries, commit=True):
+        if (0, 0, 120, 4) in entries:
+            raise Exception("disk full")
+        write_progression_summary(db_con, entries, commit)
+
+    monkeypatch.setattr(DataHandler, "write_progression_summary", failing_summary)
+
+    with MarksImporter(file_path=str(path), batch_size=1) as importer:
+        assert importer.import_file() == 1
+
+    assert importer.rejected == [(2, "batch failed - disk full")]
+    assert read_stats() == [(1, 0, 0, 0)]
+
+    with DataHandler(name="alice", password="root") as user:
+        assert user.count_entries() == 1
@@ -0,0 +1,51 @@
+"""
+#!/usr/bin/env python3
+salt keystore tests
+progression_tracker_OOP_V2/tests/test_keystore.py
+"""
+import os
+import glob
+from handler import DataHandler
+from keystore import KeyStore
+from cryptohandler import CryptoHandler
+
+
+def test_legacy_salt_bins_are_imported_once(tmp_path):
+    for uid, salt in (("uid-a", b"a" * 32), ("uid-b", b"b" * 32)):
+        (tmp_path / f"{uid}.bin").write_bytes(salt)
+
+    store = KeyStore(str(tmp_path))
+    try:
+        assert len(store) == 2
+        assert store.get("uid-a") == (b"a" * 32, None, None)
+        assert store.get("uid-c") is None
+        # the salt bins are left in place for older versions sharing the directory
+        assert (tmp_path / "uid-a.bin").exists()
+
+        store.put("uid-a", b"c" * 32, "sha256", 1000)
+        assert store.import_bins() == 2
+        assert store.get("uid-a") == (b"c" * 32, "sha256", 1000)
+    finally:
+        store.close()
+
+
+def test_data_bin_of_a_legacy_user_stays_readable(workdir):
+    with DataHandler(name="alice", pass_marks=120, defer_marks=0, fail_marks=0, password="root") as user:
+        assert len(user.data_entry()) == 5
+        user.get_progress(use_snapshot=True)
+        user.wait_for_snapshot()
+        uid = user.read_user_record()[0]
+        expected = user.get_progress()
+
+    # downgrade the salt directory to the legacy layout of one <uid>.bin salt file per user
+    salt = KeyStore.shared(DataHandler.salt_path).get(uid)[0]
+    KeyStore.close_all()
+    for path in glob.glob(f"{DataHandler.salt_path}{KeyStore.file_name}*"):
+        os.remove(path)
+    with open(f"{DataHandler.salt_path}{uid}.bin", 'wb') as file:
+        file.write(salt)
+    CryptoHandler.key_cache.clear()
+
+    with DataHandler(name="alice", password="root") as user:
+        assert user.load_from_bin() == expected
+    assert KeyStore.shared(DataHandler.salt_path).get(uid) == (salt, None, None)
@@ -0,0 +1,162 @@
+"""
+#!/usr/bin/env python3
+schema migration tests
+progression_tracker_OOP_V2/tests/test_migrations.py
+"""
+import sys
+import types
+import sqlite3
+import pytest
+from pool import ConnectionPool
+from queries import QueryData
+
+
+def create_baseline_database(path: str, users: list, entries: list) -> None:
+    """
+    creates a database with the original (version 0) schema
+    :param path: path of the sqlite database file
+    :param users: list of (uid, name, password) rows
+    :param entries: list of (uid, pass, defer, fail, outcome) rows, marks stored as text
+    """
+    connect = sqlite3.connect(path)
+    connect.execute(QueryData.default_user_setup())
+    connect.execute(QueryData.default_user_progression_setup())
+    connect.execute(QueryData.default_user_statistics_setup())
+    connect.executemany(QueryData.create_rows_query(table_name='user_data', column_count=3), users)
+    connect.executemany(QueryData.create_rows_query(table_name='user_progression', column_count=5), entries)
+    connect.commit()
+    connect.close()
+
+
+def test_baseline_database_migrates(tmp_path):
+    path = str(tmp_path / "baseline.db")
+    create_baseline_database(path, users=[("uid-a", "alice", "a"), ("uid-b", "bob", "b")], entries=[
+        ("uid-a", "120", "0", "0", "Progress"),
+        ("uid-a", "100", "20", "0", "Trailing"),
+        ("uid-b", "0", "0", "120", "Exclude")
+    ])
+
+    db_con = QueryData(local_database=path)
+    try:
+        assert db_con.schema_version() == len(QueryData.migrations)
+        assert sorted(db_con.execute(func=QueryData.read_user_data_fields(
+            table_name='user_data', columns='uid, name, password'), output=True)) == [
+            ("uid-a", "alice", "a"), ("uid-b", "bob", "b")]
+        assert db_con.read_user("alice") == ("uid-a", "a")
+
+        entries = db_con.execute(func=QueryData.read_user_data_fields(
+            table_name='user_progression', columns='uid, pass_marks, defer_marks, fail_marks, outcome'),
+            output=True)
+        assert entries == [("uid-a", 120, 0, 0, 1), ("uid-a", 100, 20, 0, 2), ("uid-b", 0, 0, 120, 4)]
+
+        assert db_con.execute(func=QueryData.read_user_data_fields(
+            table_name='user_stats', columns='progress, trailing, retriever, exclude'), output=True) == [
+            (1, 1, 0, 1)]
+        assert sorted(db_con.execute(func=QueryData.read_user_data_fields(
+            table_name='progression_summary', columns='pass_marks, defer_marks, fail_marks, outcome, entries'),
+            output=True)) == [(0, 0, 120, 4, 1), (100, 20, 0, 2, 1), (120, 0, 0, 1, 1)]
+    finally:
+        db_con.close()
+
+
+def test_duplicate_users_block_the_migration(tmp_path):
+    path = str(tmp_path / "duplicates.db")
+    users = [("uid-a", "alice", "a"), ("uid-c", "alice", "c"), ("uid-b", "bob", "b")]
+    create_baseline_database(path, users=users, entries=[("uid-c", "120", "0", "0", "Progress")])
+
+    with pytest.raises(Exception, match="2 rows conflict"):
+        QueryData(local_database=path)
+
+    connect = sqlite3.connect(path)
+    try:
+        # nothing was dropped, the database is left at the original schema
+        assert connect.execute("SELECT uid, name, password FROM user_data ORDER BY rowid;").fetchall() == users
+        assert connect.execute("SELECT COUNT(*) FROM user_progression;").fetchone()[0] == 1
+        assert connect.execute("SELECT COUNT(*) FROM schema_version;").fetchone()[0] == 0
+    finally:
+        connect.close()
+
+
+class FakeServer:
+    """MariaDB server whose DDL statements commit implicitly and fail when applied twice"""
+
+    def __init__(self, fail: str):
+        self.fail = fail
+        self.applied = []
+        self.schema_version = []
+
+    def execute(self, query: str) -> list:
+        statement = " ".join(query.split())
+
+        if statement.startswith("SELECT step FROM schema_version"):
+            return [row[1:] for row in self.schema_version]
+        if statement.startswith("SELECT * FROM schema_version"):
+            return list(self.schema_version)
+        if statement.startswith("DELETE FROM schema_version"):
+            self.schema_version = []
+        elif statement.startswith("INSERT INTO schema_version"):
+            self.schema_version = [tuple(int(value) for value in statement[statement.index("(") + 1:-2].split(","))]
+        elif (statement.startswith("ALTER TABLE") or statement.startswith("UPDATE")) \
+                and "IF NOT EXISTS" not in statement:
+            if statement in self.applied:
+                raise Exception(f"already applied - {statement}")
+            if self.fail is not None and self.fail in statement:
+                self.fail = None
+                raise Exception("lost connection")
+            self.applied.append(statement)
+        return []
+
+
+class FakeCursor:
+    def __init__(self, server: FakeServer):
+        self.server = server
+        self.rows = []
+
+    def execute(self, query: str, *args) -> None:
+        self.rows = self.server.execute(query)
+
+    def fetchall(self) -> list:
+        return self.rows
+
+    def close(self) -> None:
+        pass
+
+
+class FakeConnection:
+    def __init__(self, server: FakeServer):
+        self.server = server
+
+    def cursor(self, **kwargs) -> FakeCursor:
+        return FakeCursor(self.server)
+
+    def ping(self) -> None:
+        pass
+
+    def commit(self) -> None:
+        pass
+
+    def rollback(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+def test_interrupted_mariadb_migration_resumes(monkeypatch):
+    server = FakeServer(fail="ALTER TABLE `user_progression` MODIFY `uid`")
+    driver = types.ModuleType("mariadb")
+    driver.connect = lambda **kwargs: FakeConnection(server)
+    monkeypatch.setitem(sys.modules, "mariadb", driver)
+
+    try:
+        with pytest.raises(Exception, match="lost connection"):
+            QueryData(choice="foreign", host="migrations")
+        # the first ALTER of migration 1 is committed and recorded
+        assert server.schema_version == [(0, 1)]
+
+        db_con = QueryData(choice="foreign", host="migrations")
+        db_con.close()
+        assert server.schema_version == [(len(QueryData.migrations), 0)]
+        assert len(server.applied) == len(set(server.applied))
+    finally:
+        ConnectionPool.close_all()
@@ -0,0 +1,89 @@
+"""
+#!/usr/bin/env python3
+connection pool tests
+progression_tracker_OOP_V2/tests/test_pool.py
+"""
+import sys
+import types
+import pytest
+from pool import ConnectionPool, PoolTimeoutError
+from queries import QueryData
+
+
+class FakeCursor:
+    def execute(self, *args) -> None:
+        pass
+
+    def fetchall(self) -> list:
+        return []
+
+    def close(self) -> None:
+        pass
+
+
+class FakeConnection:
+    def cursor(self, **kwargs) -> FakeCursor:
+        return FakeCursor()
+
+    def ping(self) -> None:
+        pass
+
+    def commit(self) -> None:
+        pass
+
+    def rollback(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+@pytest.fixture
+def mariadb_driver(monkeypatch):
+    """installs a driver whose server accepts every connection"""
+    driver = types.ModuleType("mariadb")
+    driver.connect = lambda **kwargs: FakeConnection()
+    monkeypatch.setitem(sys.modules, "mariadb", driver)
+    yield driver
+    ConnectionPool.close_all()
+
+
+def test_checkout_times_out_when_the_pool_is_exhausted(mariadb_driver):
+    pool = ConnectionPool(backend="mariadb", size=1, timeout=0.05, host="test")
+    pooled = pool.acquire()
+
+    with pytest.raises(PoolTimeoutError, match="no connection available within 0.05 seconds"):
+        pool.acquire()
+
+    pool.release(pooled)
+    assert pool.acquire() is pooled
+    assert pool.created == 1
+
+
+def test_exhausted_pool_does_not_fall_back_to_sqlite(mariadb_driver, workdir, monkeypatch):
+    monkeypatch.setattr(QueryData, "pool_size", 1)
+    monkeypatch.setattr(QueryData, "pool_timeout", 0.05)
+
+    first = QueryData(choice="foreign")
+    try:
+        assert first.backend == "mariadb"
+        with pytest.raises(PoolTimeoutError):
+            QueryData(choice="foreign")
+    finally:
+        first.close()
+
+    second = QueryData(choice="foreign")
+    assert second.backend == "mariadb"
+    second.close()
+
+
+def test_unreachable_server_falls_back_to_sqlite(mariadb_driver, workdir):
+    def refuse(**kwargs):
+        raise ConnectionError("connection refused")
+
+    mariadb_driver.connect = refuse
+    db_con = QueryData(choice="foreign", host="unreachable")
+    try:
+        assert db_con.backend == "sqlite"
+    finally:
+        db_con.close()
@@ -0,0 +1,53 @@
+"""
+#!/usr/bin/env python3
+data bin regeneration tests
+progression_tracker_OOP_V2/tests/test_snapshots.py
+"""
+import os
+import pytest
+from handler import DataHandler
+from cryptohandler import CryptoHandler
+from snapshots import SnapshotBuilder
+
+
+@pytest.fixture
+def key_cache():
+    CryptoHandler.key_cache.clear()
+    yield CryptoHandler.key_cache
+    CryptoHandler.key_cache.clear()
+
+
+def sign_in(name: str, marks: list) -> tuple:
+    """
+    adds entries for a user and reads them through the data bin, which derives and caches the user's key
+    :return: (uid, progress report) pair
+    """
+    for pass_marks, defer_marks, fail_marks in marks:
+        with DataHandler(name=name, pass_marks=pass_marks, defer_marks=defer_marks, fail_marks=fail_marks,
+                         password="root") as user:
+            user.data_entry()
+
+    with DataHandler(name=name, password="root") as user:
+        user.get_progress(use_snapshot=True)
+        user.wait_for_snapshot()
+        return user.read_user_record()[0], user.get_progress()
+
+
+def test_rebuilds_the_bins_of_users_with_a_cached_key(workdir, key_cache):
+    alice, _ = sign_in("alice", [(120, 0, 0)])
+    key_cache.clear()
+    bob, expected = sign_in("bob", [(100, 20, 0), (40, 40, 40)])
+
+    for uid in (alice, bob):
+        os.remove(f"{DataHandler.data_path}{uid}.bin")
+
+    with SnapshotBuilder(workers=2) as builder:
+        assert builder.rebuild() == 1
+        assert builder.skipped == [alice]
+        assert builder.failed == []
+
+    assert not os.path.exists(f"{DataHandler.data_path}{alice}.bin")
+    key_cache.clear()
+    with DataHandler(name="bob", password="root") as user:
+        assert user.check_snapshot()
+        assert user.load_from_bin() == expected
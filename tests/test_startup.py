@@ -0,0 +1,18 @@
+"""
+#!/usr/bin/env python3
+CLI startup cost tests
+progression_tracker_OOP_V2/tests/test_startup.py
+"""
+from benchmark import check_startup
+
+
+def test_cli_startup_imports_no_database_driver_or_cipher():
+    # the time target is left to the benchmark, a loaded test machine would make it flaky
+    assert check_startup(target_ms=10_000) == []
+
+
+def test_check_startup_reports_eager_imports_and_slow_startups():
+    failures = check_startup(target_ms=0, module="queries", lazy_modules=("sqlite3",))
+
+    assert "sqlite3 imported at startup" in failures
+    assert failures[-1].startswith("import queries took ")
@@ -0,0 +1,71 @@
+"""
+#!/usr/bin/env python3
+progression statistics tests
+progression_tracker_OOP_V2/tests/test_stats.py
+"""
+import time
+import sqlite3
+import operations
+from queries import QueryData
+from handler import DataHandler
+from importer import MarksImporter
+from stats import ProgressionStats
+
+
+def add_marks(name: str, marks: list) -> None:
+    for pass_marks, defer_marks, fail_marks in marks:
+        with DataHandler(name=name, pass_marks=pass_marks, defer_marks=defer_marks, fail_marks=fail_marks,
+                         password="root") as user:
+            assert len(user.data_entry()) == 5
+
+
+def test_check_after_add_and_import(workdir):
+    add_marks("alice", [(120, 0, 0), (100, 20, 0)])
+    path = workdir / "marks.csv"
+    path.write_text("name,pass_marks,defer_marks,fail_marks\nalice,120,0,0\nalice,40,40,40\nalice,0,0,120\n")
+    with MarksImporter(file_path=str(path)) as importer:
+        assert importer.import_file() == 3
+
+    output = operations.get_stats(check=True)
+    assert "Entries: 5" in output
+    assert "Progress: 2 (40.00%)" in output
+    assert output.endswith("Summary is consistent !\n")
+
+
+def test_recompute_repairs_the_summary(workdir):
+    add_marks("alice", [(120, 0, 0), (100, 20, 0)])
+    with QueryData() as db_con:
+        DataHandler.write_progression_stats(db_con, progress=5)
+
+    with ProgressionStats() as stats:
+        assert stats.check_consistency() == ["user_stats Progress: stored 6, actual 1"]
+        assert stats.recompute() == 2
+        assert stats.check_consistency() == []
+
+
+def test_recompute_holds_off_writers(workdir):
+    add_marks("alice", [(120, 0, 0)])
+    blocked = []
+
+    with ProgressionStats() as stats:
+        read_live_summary = stats.read_live_summary
+
+        def racing_read() -> list:
+            # another process commits an entry between the read and the rewrite of the summary
+            other = sqlite3.connect(QueryData.local_db["database"], timeout=0)
+            try:
+                other.execute("INSERT INTO user_progression VALUES (?, ?, ?, ?, ?, ?);",
+                              ("uid-other", 0, 0, 120, 4, time.time()))
+                other.commit()
+            except sqlite3.OperationalError as error:
+                blocked.append(str(error))
+            finally:
+                other.close()
+            return read_live_summary()
+
+        stats.read_live_summary = racing_read
+        stats.recompute()
+        del stats.read_live_summary
+
+        assert blocked == ["database is locked"]
+        assert stats.check_consistency() == []
@@ -0,0 +1,53 @@
+"""
+#!/usr/bin/env python3
+QueryData unit of work tests
+progression_tracker_OOP_V2/tests/test_transactions.py
+"""
+import pytest
+from queries import QueryData
+
+
+def add_user(db_con: QueryData, name: str) -> None:
+    db_con.execute(func=QueryData.create_row_statement(table_name='user_data',
+                                                       data_list=[f"uid-{name}", name, "x"]))
+
+
+def user_names(db_con: QueryData) -> list:
+    return sorted(row[0] for row in db_con.execute(func=QueryData.read_user_data_fields(
+        table_name='user_data', columns='name'), output=True))
+
+
+def test_savepoint_rollback_inside_an_outer_commit(workdir):
+    with QueryData() as db_con:
+        with db_con.transaction():
+            add_user(db_con, "a")
+            with pytest.raises(ValueError):
+                with db_con.transaction():
+                    add_user(db_con, "b")
+                    raise ValueError("inner unit of work fails")
+            with db_con.transaction():
+                add_user(db_con, "c")
+
+        assert not db_con.in_transaction
+        assert user_names(db_con) == ["a", "c"]
+
+
+def test_outer_rollback_undoes_every_query_on_the_connection(workdir):
+    with QueryData() as db_con, QueryData() as other:
+        assert other.connect is db_con.connect
+
+        with pytest.raises(ValueError):
+            with db_con.transaction():
+                add_user(db_con, "f")
+                # commit=True on another QueryData of the thread joins the open unit of work
+                add_user(other, "g")
+                assert other.in_transaction
+                with other.transaction():
+                    add_user(other, "h")
+                raise ValueError("outer unit of work fails")
+
+        assert user_names(db_con) == []
+
+        with db_con.transaction():
+            add_user(other, "i")
+        assert user_names(other) == ["i"]
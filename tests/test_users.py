@@ -0,0 +1,73 @@
+"""
+#!/usr/bin/env python3
+user lookup and authentication tests
+progression_tracker_OOP_V2/tests/test_users.py
+"""
+from queries import QueryData
+from handler import DataHandler
+from passwords import PasswordHasher
+
+
+def test_sign_in_reads_the_user_once_through_the_name_index(workdir, monkeypatch):
+    with DataHandler(name="alice", password="root") as user:
+        assert user.authentication
+    DataHandler.identities.clear()
+
+    lookups = []
+    read_user = QueryData.read_user
+
+    def counted_read_user(self, name: str) -> tuple:
+        lookups.append(name)
+        return read_user(self, name)
+
+    monkeypatch.setattr(QueryData, "read_user", counted_read_user)
+
+    with DataHandler(name="alice", pass_marks=120, defer_marks=0, fail_marks=0, password="root") as user:
+        assert len(user.data_entry()) == 5
+    assert lookups == ["alice"]
+
+    with QueryData() as db_con:
+        assert db_con.read_user("bob") is None
+        query = QueryData.read_first_match(table_name='user_data', column='uid, password', filter_column='name')
+        plan = db_con.execute(func=f"EXPLAIN QUERY PLAN {query}", params=("alice",), output=True)
+        assert "idx_user_data_name" in " ".join(str(row) for row in plan)
+
+
+def stored_credential(name: str) -> str:
+    with QueryData() as db_con:
+        return db_con.read_user(name)[1]
+
+
+def test_plaintext_credential_is_rehashed_on_sign_in(workdir):
+    with DataHandler(name="alice", password="root") as user:
+        uid = user.read_user_record()[0]
+    with QueryData() as db_con:
+        db_con.execute(func=QueryData.update_rows_statement(table_name='user_data', values={"password": "root"},
+                                                            filters={"uid": uid}))
+    DataHandler.identities.clear()
+    DataHandler.sessions.clear()
+
+    with DataHandler(name="alice", password="wrong") as user:
+        assert not user.authentication
+    assert stored_credential("alice") == "root"
+
+    with DataHandler(name="alice", password="root") as user:
+        assert user.authentication
+    credential = stored_credential("alice")
+    assert PasswordHasher.is_hashed(credential)
+    assert PasswordHasher.verify("root", credential) == (True, False)
+
+
+def test_wrong_password_is_rejected_after_a_verified_sign_in(workdir):
+    with DataHandler(name="alice", password="root") as user:
+        assert user.authentication
+
+    # the verified-session cache is warm, a different password must still be checked against the hash
+    with DataHandler(name="alice", pass_marks=120, defer_marks=0, fail_marks=0, password="wrong") as user:
+        assert not user.authentication
+        # valid marks, refused for the password
+        assert user.data_entry() == [True]
+
+    with DataHandler(name="alice", password="root") as user:
+        assert user.authentication
+        assert user.count_entries() == 0
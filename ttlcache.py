@@ -0,0 +1,190 @@
+"""
+#!/usr/bin/env python3
+bounded in-memory cache with expiring entries
+progression_tracker_OOP_V2/ttlcache.py
+"""
+import os
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from metrics import Metrics
+
+
+class TTLCache:
+    """
+    Bounded, TTL-evicting, least recently used cache shared by the threads of a process.
+    Subclasses only decide what is stored, through the store, export and release hooks, and set metric to count
+    their hits and misses as <metric>_hits and <metric>_misses.
+    Expired entries are dropped when they are read, and all of them at most once per TTL when an entry is added.
+    """
+
+    metric = None
+
+    # per process secret so that cached password digests are useless outside the process
+    __secret = os.urandom(32)
+
+    def __init__(self, size: int, ttl: float):
+        self.__size = size
+        self.__ttl = ttl
+        self.__entries = OrderedDict()
+        self.__lock = threading.Lock()
+        self.__hits = 0
+        self.__misses = 0
+        self.__purged = time.monotonic()
+
+    @property
+    def size(self) -> int:
+        return self.__size
+
+    @property
+    def ttl(self) -> float:
+        return self.__ttl
+
+    @property
+    def hits(self) -> int:
+        return self.__hits
+
+    @property
+    def misses(self) -> int:
+        return self.__misses
+
+    @staticmethod
+    def keyed_digest(data) -> bytes:
+        """
+        digest of secret material that is only meaningful within this process
+        :param data: bytes or string to digest
+        :return: digest bytes
+        """
+        if isinstance(data, str):
+            data = data.encode()
+        return hashlib.blake2b(data, key=TTLCache.__secret, digest_size=32).digest()
+
+    def store(self, value):
+        """
+        converts a value into the form it is cached in
+        :param value: value passed to put
+        :return: cached value
+        """
+        return value
+
+    def export(self, value):
+        """
+        called with the lock held to hand a cached value out of the cache
+        :param value: cached value
+        :return: value safe to use after the lock is released
+        """
+        return value
+
+    def release(self, value) -> None:
+        """
+        called with the lock held whenever a cached value leaves the cache
+        :param value: cached value
+        """
+
+    def lookup(self, key: tuple):
+        """
+        returns a cached value without counting a hit or a miss
+        :param key: cache key
+        :return: cached value, None if absent or expired
+        """
+        with self.__lock:
+            entry = self.__entries.get(key)
+
+            if entry is None:
+                return None
+
+            if entry[1] < time.monotonic():
+                self.__evict(key)
+                return None
+
+            self.__entries.move_to_end(key)
+            return self.export(entry[0])
+
+    def record(self, hit: bool) -> None:
+        """
+        counts a hit or a miss
+        :param hit: boolean value depending on the lookup having been served from the cache
+        """
+        if hit:
+            self.__hits += 1
+        else:
+            self.__misses += 1
+
+        if self.metric is not None:
+            Metrics.count(f"{self.metric}_{'hits' if hit else 'misses'}")
+
+    def get(self, key: tuple):
+        """
+        returns a cached value
+        :param key: cache key
+        :return: cached value, None on a miss or if the entry expired
+        """
+        value = self.lookup(key)
+        self.record(value is not None)
+        return value
+
+    def put(self, key: tuple, value) -> None:
+        """
+        caches a value, evicting the least recently used entries beyond the cache size
+        :param key: cache key
+        :param value: value to cache
+        """
+        now = time.monotonic()
+
+        with self.__lock:
+            if key in self.__entries:
+                self.__evict(key)
+
+            self.__entries[key] = (self.store(value), now + self.__ttl)
+
+            while len(self.__entries) > self.__size:
+                self.__evict(next(iter(self.__entries)))
+
+        if now - self.__purged >= self.__ttl:
+            self.purge_expired()
+
+    def items(self) -> list:
+        """
+        lists the unexpired entries, least recently used first, without counting or refreshing them
+        :return: list of (key, value) pairs
+        """
+        now = time.monotonic()
+        with self.__lock:
+            return [(key, self.export(entry[0])) for key, entry in self.__entries.items() if entry[1] >= now]
+
+    def invalidate(self, key: tuple) -> None:
+        """
+        forgets a cached value
+        :param key: cache key
+        """
+        with self.__lock:
+            if key in self.__entries:
+                self.__evict(key)
+
+    def purge_expired(self) -> int:
+        """
+        evicts every expired entry
+        :return: number of evicted entries
+        """
+        now = time.monotonic()
+        with self.__lock:
+            self.__purged = now
+            expired = [key for key, entry in self.__entries.items() if entry[1] < now]
+            for key in expired:
+                self.__evict(key)
+        return len(expired)
+
+    def clear(self) -> None:
+        """evicts every cached entry"""
+        with self.__lock:
+            for key in list(self.__entries):
+                self.__evict(key)
+
+    def __evict(self, key: tuple) -> None:
+        """removes an entry from the cache, the caller must hold the lock"""
+        value, _ = self.__entries.pop(key)
+        self.release(value)
+
+    def __len__(self) -> int:
+        return len(self.__entries)
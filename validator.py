@@ -3,7 +3,7 @@
 backend data validation
 progression_tracker_OOP_V2/validator.py
 """
-from python_datalogger import DataLogger
+from decorators import shared_logger
 
 
 class DataValidator:
@@ -20,7 +20,7 @@ class DataValidator:
         self.__fail_marks = fail_marks
         self.__validity = False
         self.__marks_list = [self.__pass_marks, self.__defer_marks, self.__fail_marks]
-        self.logger = DataLogger(name="ValidationLogger", propagate=True)
+        self.logger = shared_logger(name="ValidationLogger", propagate=True)
 
         if self.validate_type():
             if self.validate_range():